@@ -0,0 +1,37 @@
+"""Native asyncio ICMP sweep of a loopback /16 against a sample of the per-host ping subprocess.
+Needs an unprivileged ICMP datagram socket (ping_group_range) or root for a raw one.
+
+Run from the project root:  python benchmarks/bench_icmp.py [cidr] [subprocess-sample]
+"""
+import resource
+import sys
+import time
+from itertools import islice
+
+from netops.core.scanner.icmp import iter_targets, native_available, ping_sweep
+
+def cpu() -> float:
+    self_, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return self_.ru_utime + self_.ru_stime + children.ru_utime + children.ru_stime
+
+def main():
+    cidr = sys.argv[1] if len(sys.argv) > 1 else "127.0.0.0/16"
+    sample = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    if not native_available():
+        sys.exit("ICMP sockets not permitted here")
+    c0, t0 = cpu(), time.perf_counter()
+    res = ping_sweep([cidr], timeout=1.0, native=True)
+    wall, used = time.perf_counter() - t0, cpu() - c0
+    print(f"native      {len(res):,} hosts  {sum(r['up'] for r in res):,} up  {wall:.2f}s wall  {used:.2f}s CPU "
+          f"({len(res) / wall:,.0f} hosts/s)")
+    if not sample:
+        return
+    hosts = list(islice(iter_targets([cidr]), sample))
+    c0, t0 = cpu(), time.perf_counter()
+    res = ping_sweep(hosts, timeout=1.0, native=False)
+    wall, used = time.perf_counter() - t0, cpu() - c0
+    print(f"subprocess  {len(hosts):,} hosts  {sum(r['up'] for r in res):,} up  {wall:.2f}s wall  {used:.2f}s CPU ({len(hosts) / wall:,.0f} hosts/s, "
+          f"{used / len(hosts) * 1e3:.2f} ms CPU/host)")
+
+if __name__ == "__main__":
+    main()
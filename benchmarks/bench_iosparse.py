@@ -0,0 +1,47 @@
+"""parse_acls over a synthetic IOS config (numbered and named extended ACLs, wildcards
+including non-contiguous ones, object-groups) and the Engine.set_rules that follows.
+
+Run from the project root:  python benchmarks/bench_iosparse.py [lines]
+"""
+import random
+import sys
+import time
+
+from netops.core.firewall import Engine
+from netops.core.iosparse import parse_acls
+
+def make_config(n: int, rnd: random.Random) -> list[str]:
+    lines = ["object-group network SERVERS"]
+    lines += [f" host 192.0.2.{i}" for i in range(1, 9)]
+    lines += ["object-group service WEB", " tcp eq www 443", " udp range 8000 8010"]
+    lines.append("ip access-list extended EDGE")
+    while len(lines) < n:
+        src = rnd.choice(("any", f"host 10.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}",
+                          f"10.{rnd.randrange(256)}.{rnd.randrange(256)}.0 0.0.0.255",
+                          f"10.{rnd.randrange(256)}.0.{rnd.randrange(256)} 0.0.255.0"))
+        dst = rnd.choice(("any", f"172.16.{rnd.randrange(256)}.0 0.0.0.15", "object-group SERVERS"))
+        ports = rnd.choice(("", " eq 22", " range 1000 2000", " gt 1023", " eq www 443"))
+        action = rnd.choice(("permit", "deny"))
+        if len(lines) < n // 2:
+            if rnd.random() < 0.05:
+                lines.append(f" {len(lines) * 10} {action} object-group WEB {src} {dst}")
+            else:
+                lines.append(f" {len(lines) * 10} {action} {rnd.choice(('tcp', 'udp'))} {src} {dst}{ports}")
+        else:
+            lines.append(f"access-list {100 + rnd.randrange(100)} {action} tcp {src} {dst}{ports} log")
+    return lines
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lines = make_config(n, random.Random(1))
+    res = parse_acls(lines)
+    print(f"{res['lines']:,} lines  {res['entries']:,} entries  {res['rules']:,} rules  "
+          f"{len(res['acls'])} ACLs  invalid {res['invalid']}  parsed in {res['seconds']:.2f}s "
+          f"({res['lines'] / res['seconds']:,.0f} lines/s)")
+    eng = Engine()
+    t0 = time.perf_counter()
+    eng.set_rules(res["acls"]["EDGE"])
+    print(f"set_rules(EDGE, {len(eng.rules):,} rules) {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
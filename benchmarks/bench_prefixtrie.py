@@ -0,0 +1,39 @@
+"""PrefixTrie build time and lookup throughput (single, string batch, NumPy batch).
+
+Run from the project root:  python benchmarks/bench_prefixtrie.py [prefix_count]
+"""
+import random
+import sys
+import time
+
+from netops.core.prefixtrie import HAVE_NUMPY, PrefixTrie
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rnd = random.Random(1)
+    cidrs = [f"{rnd.randrange(1, 224)}.{rnd.randrange(256)}.{rnd.randrange(256)}.0/{rnd.choice((16, 20, 24, 28))}"
+             for _ in range(n)]
+    t0 = time.perf_counter()
+    trie = PrefixTrie.from_prefixes(cidrs)
+    print(f"build {len(trie):,} prefixes  {time.perf_counter() - t0:8.3f}s")
+
+    addrs = [f"{rnd.randrange(1, 224)}.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}"
+             for _ in range(200_000)]
+    t0 = time.perf_counter()
+    for a in addrs[:50_000]:
+        trie.lookup(a)
+    print(f"lookup()          {50_000 / (time.perf_counter() - t0):>12,.0f} /s")
+    trie.lookup_many(addrs[:1])  # build the flattened table outside the timing
+    t0 = time.perf_counter()
+    trie.lookup_many(addrs)
+    print(f"lookup_many()     {len(addrs) / (time.perf_counter() - t0):>12,.0f} /s")
+    if HAVE_NUMPY:
+        import numpy as np
+        arr = np.random.default_rng(1).integers(0, 2**32, size=5_000_000, dtype=np.uint32)
+        trie.lookup_indices(arr[:1])
+        t0 = time.perf_counter()
+        trie.lookup_indices(arr)
+        print(f"lookup_indices()  {len(arr) / (time.perf_counter() - t0):>12,.0f} /s (NumPy)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Sharded ICMP sweep of a loopback range with 1..N worker processes, with per-shard stats.
+Needs ICMP sockets (see bench_icmp.py); scaling is bounded by the cores available.
+
+Run from the project root:  python benchmarks/bench_shard.py [cidr] [max-workers]
+"""
+import os
+import sys
+import time
+
+from netops.core.scanner.icmp import native_available
+from netops.core.scanner.shard import ShardedSweep
+
+def main():
+    cidr = sys.argv[1] if len(sys.argv) > 1 else "127.0.0.0/14"
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    if not native_available():
+        sys.exit("ICMP sockets not permitted here")
+    workers = 1
+    while workers <= max_workers:
+        sweep = ShardedSweep([cidr], workers=workers, timeout=1.0, native=True)
+        t0 = time.perf_counter()
+        n = up = 0
+        for r in sweep:
+            n += 1
+            up += r["up"]
+        wall = time.perf_counter() - t0
+        print(f"{workers:>2} workers  {n:,} hosts  {up:,} up  {wall:.2f}s  ({n / wall:,.0f} hosts/s)")
+        for st in sweep.shard_stats:
+            print(f"    shard {st['shard']}: {st['chunks']} chunks  {st['hosts']:,} hosts  {st['seconds']:.2f}s busy  "
+                  f"({st['pps']:,.0f} hosts/s)")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Rows/second for describe_cidr vs describe_many (python and numpy backends).
+
+Run from the project root:  python benchmarks/bench_subnetting.py [rows]
+"""
+import random
+import sys
+import time
+
+from netops.core import subnetting
+
+def make_cidrs(n: int, seed: int = 1) -> list[str]:
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if rnd.random() < 0.05:
+            out.append(f"2001:db8:{rnd.randrange(65536):x}::{rnd.randrange(65536):x}/{rnd.randrange(32, 129)}")
+        else:
+            out.append(f"{rnd.randrange(1, 224)}.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}/{rnd.randrange(8, 33)}")
+    return out
+
+def bench(label: str, fn, rows: int):
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {rows:>9} rows  {dt:8.3f}s  {rows / dt:>12,.0f} rows/s")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    v4 = [c for c in make_cidrs(rows) if ":" not in c]
+    mixed = make_cidrs(rows)
+    bench("describe_cidr (loop)", lambda: [subnetting.describe_cidr(c) for c in v4], len(v4))
+    for backend in ("python", "numpy"):
+        if backend == "numpy" and not subnetting.HAVE_NUMPY:
+            print("numpy not installed; skipping numpy backend")
+            continue
+        bench(f"describe_many[{backend}] v4", lambda: subnetting.describe_many(v4, backend=backend), len(v4))
+        bench(f"describe_many[{backend}] mixed", lambda: subnetting.describe_many(mixed, backend=backend), len(mixed))
+
+if __name__ == "__main__":
+    main()
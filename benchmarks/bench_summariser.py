@@ -0,0 +1,33 @@
+"""summarise_report on random IPv4 /24s (with duplicates and overlaps) vs ipaddress.collapse_addresses.
+
+Run from the project root:  python benchmarks/bench_summariser.py [counts...]
+"""
+import random
+import sys
+import time
+from ipaddress import collapse_addresses, ip_network
+
+from netops.core.summariser import summarise_report
+
+def make_prefixes(n: int, seed: int = 1) -> list[str]:
+    rnd = random.Random(seed)
+    return [f"{rnd.randrange(1, 224)}.{rnd.randrange(256)}.{rnd.randrange(256)}.0/{rnd.choice((22, 24, 24, 24))}"
+            for _ in range(n)]
+
+def main():
+    counts = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for n in counts:
+        cidrs = make_prefixes(n)
+        t0 = time.perf_counter()
+        rep = summarise_report(cidrs, max_prefixes=1000)
+        dt = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        old = [str(c) for c in collapse_addresses(ip_network(c, strict=False) for c in cidrs)]
+        dt_old = time.perf_counter() - t0
+        assert old == rep["summary"]
+        print(f"{n:>9} prefixes  {dt:8.3f}s (ipaddress {dt_old:8.3f}s)  summary={len(rep['summary'])} "
+              f"dups={rep['duplicates']} overlaps={rep['overlaps']} "
+              f"aggregate=1000 extra={rep['aggregate']['extra_addresses']:,}")
+
+if __name__ == "__main__":
+    main()
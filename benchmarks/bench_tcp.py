@@ -0,0 +1,21 @@
+"""Built-in TCP connect scan of loopback hosts (closed ports answer with an RST) at several concurrencies.
+
+Run from the project root:  python benchmarks/bench_tcp.py [cidr] [ports]
+"""
+import sys
+
+from netops.core.scanner.tcp import tcp_scan
+
+def main():
+    cidr = sys.argv[1] if len(sys.argv) > 1 else "127.0.0.0/26"
+    ports = sys.argv[2] if len(sys.argv) > 2 else "1-1000"
+    for concurrency in (100, 1000, 5000):
+        res = tcp_scan([cidr], ports=ports, concurrency=concurrency)
+        if not res["ok"]:
+            sys.exit(res["error"])
+        st = res["stats"]
+        print(f"concurrency {st['concurrency']:>5}  {st['probes']:,} probes  {st['open']} open  "
+              f"{st['seconds']:.2f}s  ({st['pps']:,.0f} probes/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""allocate_vlsm throughput for 10k, 100k and 1M demands, plus a /48 carved into 65,536 /64s.
+
+Run from the project root:  python benchmarks/bench_vlsm.py [counts...]
+"""
+import random
+import sys
+import time
+
+from netops.core.vlsm import allocate_vlsm
+
+def make_demands(n: int, seed: int = 1) -> list[dict]:
+    rnd = random.Random(seed)
+    return [{"name": f"net{i}", "hosts": rnd.choice((2, 6, 14, 30))} for i in range(n)]
+
+def main():
+    counts = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for n in counts:
+        demands = make_demands(n)
+        t0 = time.perf_counter()
+        plan = allocate_vlsm("10.0.0.0/8", demands)
+        dt = time.perf_counter() - t0
+        print(f"{n:>9} demands in 10.0.0.0/8  {dt:8.3f}s  {n / dt:>10,.0f} demands/s  "
+              f"ok={plan['ok']} gaps={len(plan['gaps'])}")
+    demands = [{"name": f"lan{i}", "prefix": 64} for i in range(65_536)]
+    t0 = time.perf_counter()
+    plan = allocate_vlsm("2001:db8:abcd::/48", demands)
+    dt = time.perf_counter() - t0
+    print(f"    65536 x /64 in 2001:db8:abcd::/48  {dt:8.3f}s  ok={plan['ok']} gaps={len(plan['gaps'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from time import perf_counter_ns
+
+# idle timeouts in seconds, per protocol name; "other" covers everything not listed
+DEFAULT_TIMEOUTS = {"tcp": 3600.0, "udp": 30.0, "icmp": 30.0, "icmpv6": 30.0, "other": 600.0}
+
+class ConnTrack:
+    """
+    Connection-tracking table for the stateful firewall mode: a hash map from a flow key
+    (the same for both directions of a flow) to the rule that admitted it and its expiry.
+    Entries are kept in least-recently-seen order, so a full table evicts the flow that has
+    been idle longest; expired entries are dropped when they are looked up or reach the front.
+    """
+
+    def __init__(self, max_size: int = 65536, timeouts: dict[str, float] | None = None):
+        if max_size < 1:
+            raise ValueError("Connection table size must be >= 1")
+        self.max_size = max_size
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self._table: OrderedDict[tuple, list] = OrderedDict()  # key -> [expires, timeout, rule]
+        self.hits = self.misses = self.inserts = self.evictions = self.expired = 0
+        self._lookup_ns = 0
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def timeout(self, proto: str) -> float:
+        return self.timeouts.get(proto, self.timeouts["other"])
+
+    def lookup(self, key: tuple, now: float) -> int:
+        """Rule index that admitted the flow (refreshing its timer), or -1."""
+        t0 = perf_counter_ns()
+        entry = self._table.get(key)
+        if entry is not None:
+            if entry[0] >= now:
+                entry[0] = now + entry[1]
+                self._table.move_to_end(key)
+                self.hits += 1
+                self._lookup_ns += perf_counter_ns() - t0
+                return entry[2]
+            del self._table[key]
+            self.expired += 1
+        self.misses += 1
+        self._lookup_ns += perf_counter_ns() - t0
+        return -1
+
+    def add(self, key: tuple, rule: int, timeout: float, now: float):
+        table = self._table
+        while len(table) >= self.max_size:
+            _, oldest = table.popitem(last=False)
+            if oldest[0] < now:
+                self.expired += 1
+            else:
+                self.evictions += 1
+        table[key] = [now + timeout, timeout, rule]
+        self.inserts += 1
+
+    def clear(self):
+        self._table.clear()
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"size": len(self._table), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                "inserts": self.inserts, "evictions": self.evictions, "expired": self.expired,
+                "lookup_ns_avg": self._lookup_ns / lookups if lookups else 0.0}
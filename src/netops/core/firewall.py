@@ -1,42 +1,734 @@
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left
 from dataclasses import dataclass
+from functools import lru_cache
 from ipaddress import ip_network, ip_address
+from itertools import islice
+from socket import inet_pton, AF_INET, AF_INET6
+
+from .conntrack import ConnTrack
+from .pcap import PROTO_NAMES, five_tuple, iter_pcap
+
+try:
+    import numpy as np  # type: ignore
+    HAVE_NUMPY = True
+except Exception:
+    HAVE_NUMPY = False
 
 @dataclass
 class Rule:
     action: str  # "allow" or "deny"
-    src: str     # CIDR
-    dst: str     # CIDR
-    proto: str   # "tcp" | "udp" | "any"
-    port: int | None  # None -> any
+    src: str     # CIDR, or "address wildcard" (IPv4, e.g. "10.0.0.0 0.0.255.0") for non-contiguous masks
+    dst: str     # same forms as src
+    proto: str | list[str]  # "tcp" | "udp" | "any", a list of names or "tcp,udp"
+    port: int | tuple[int, int] | None  # destination port or (first, last) range; None -> any
     comment: str = ""
+    sport: int | tuple[int, int] | None = None  # source port or range; None -> any
 
 @dataclass
 class Packet:
     src: str
     dst: str
     proto: str
-    port: int | None
+    port: int | None   # destination port
+    sport: int | None = None
+
+ANY_PROTO = -1     # rule protocol mask matching every protocol
+_OTHER_PROTO = 1   # protocol bit of packets whose protocol no rule names
+_MAX_PROTOS = 62   # named protocols per rule set, so masks fit NumPy int64 columns
+_ANY_PORT = (-1, sys.maxsize)  # a packet without a port is compared as -1
+
+def addr_int(text: str) -> tuple[int, int]:
+    """(version, integer) for an IP address string. Raises ValueError."""
+    try:
+        return 4, int.from_bytes(inet_pton(AF_INET, text), "big")
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(inet_pton(AF_INET6, text), "big")
+    except OSError:
+        ip = ip_address(text)  # scoped addresses and other unusual spellings
+        return ip.version, int(ip)
+
+def compile_network(cidr: str) -> tuple[int, int, int]:
+    """
+    (version, network, mask) integers for a rule CIDR (host bits ignored) or an IPv4
+    "address wildcard" pair, whose mask may be non-contiguous. Raises ValueError.
+    """
+    if " " in cidr.strip():
+        addr, wildcard = cidr.split()
+        av, a = addr_int(addr)
+        wv, w = addr_int(wildcard)
+        if av != 4 or wv != 4:
+            raise ValueError(f"Invalid address/wildcard {cidr!r}")
+        mask = 0xFFFFFFFF ^ w
+        return 4, a & mask, mask
+    net = ip_network(cidr, strict=False)
+    return net.version, int(net.network_address), int(net.netmask)
+
+def _prefixlen(mask: int, bits: int) -> int:
+    """Prefix length of a contiguous mask; for a non-contiguous one, its leading one bits."""
+    return bits - (((1 << bits) - 1) ^ mask).bit_length()
+
+def _contiguous(mask: int, bits: int) -> bool:
+    host = ((1 << bits) - 1) ^ mask
+    return not host & (host + 1)
+
+def port_range(port) -> tuple[int, int]:
+    """(first, last) for a rule port: None (any), an int or a (first, last) pair. Raises ValueError."""
+    if port is None:
+        return _ANY_PORT
+    lo, hi = (port, port) if isinstance(port, int) else tuple(port)
+    if not 0 <= lo <= hi <= 65535:
+        raise ValueError(f"Invalid port range {port!r}")
+    return lo, hi
+
+def proto_names(proto) -> list[str]:
+    """Protocol names of a rule: one name, a list, or a comma/space separated string."""
+    names = proto.replace(",", " ").split() if isinstance(proto, str) else list(proto)
+    return [n.strip().lower() for n in names if n.strip()] or ["any"]
+
+def compile_rules(rules: list[Rule]) -> tuple[list[tuple], dict[str, int]]:
+    """
+    Compile rules to (src_version, src_net, src_mask, dst_version, dst_net, dst_mask,
+    proto_mask, port_lo, port_hi, sport_lo, sport_hi, action) tuples plus the protocol bit of
+    every named protocol. A packet's protocol bit is ANDed with the mask; ANY_PROTO has all bits.
+    Raises ValueError for an unparsable CIDR, port range or too many distinct protocols.
+    """
+    protos: dict[str, int] = {}
+    compiled = []
+    # large imported policies repeat the same addresses, protocols and ports many times
+    nets: dict[str, tuple[int, int, int]] = {}
+    masks: dict[object, int] = {}
+    for r in rules:
+        src = nets.get(r.src) or nets.setdefault(r.src, compile_network(r.src))
+        dst = nets.get(r.dst) or nets.setdefault(r.dst, compile_network(r.dst))
+        key = r.proto if isinstance(r.proto, str) else tuple(r.proto)
+        mask = masks.get(key)
+        if mask is None:
+            mask = 0
+            for name in proto_names(r.proto):
+                if name == "any":
+                    mask = ANY_PROTO
+                    break
+                if name not in protos:
+                    if len(protos) == _MAX_PROTOS:
+                        raise ValueError(f"More than {_MAX_PROTOS} distinct protocols")
+                    protos[name] = _OTHER_PROTO << (len(protos) + 1)
+                mask |= protos[name]
+            masks[key] = mask
+        compiled.append((*src, *dst, mask, *port_range(r.port), *port_range(r.sport), r.action))
+    return compiled, protos
+
+_PORT_BITS = 17  # port dimension of the decision tree: port + 1, so "no port" (-1) maps to 0
+
+def _rule_matches(r: tuple, sv: int, s: int, dv: int, d: int, proto: int, port: int, sport: int) -> bool:
+    return (s & r[2] == r[1] and d & r[5] == r[4] and r[0] == sv and r[3] == dv
+            and r[6] & proto and r[7] <= port <= r[8] and r[9] <= sport <= r[10])
+
+class DecisionTree:
+    """
+    HiCuts-style decision trees over compiled rules. Rules are split by address family pair and,
+    as in EffiCuts, by which address dimensions are wide (shorter than a quarter of the address
+    bits); each group gets its own tree that only cuts its narrow dimensions and the destination
+    port (protocol and source port are checked in the leaves), so
+    wildcard rules are not copied into every slice of the other dimension. Internal nodes cut
+    one dimension of their box into equal power-of-two slices; leaves hold at most 'binth' rule
+    indices in priority order (more only when cutting no longer separates them), so a lookup is
+    a few short walks plus small first-match scans, and the lowest matching index wins.
+    A leaf stops at the first rule that covers its whole box; spfac bounds replication per cut.
+    """
+
+    def __init__(self, compiled: list[tuple], binth: int = 8, spfac: float = 4.0, max_cuts: int = 64,
+                 max_depth: int = 40):
+        t0 = time.perf_counter()
+        self._compiled = compiled
+        self.binth, self.spfac, self.max_depth = binth, spfac, max_depth
+        self._max_k = max_cuts.bit_length() - 1
+        self._leaves: dict[tuple, list[int]] = {}
+        self._internal = 0
+        groups: dict[tuple, list[int]] = {}
+        for idx, r in enumerate(compiled):
+            sbits, dbits = (32 if v == 4 else 128 for v in (r[0], r[3]))
+            wide = (_prefixlen(r[2], sbits) < sbits // 4, _prefixlen(r[5], dbits) < dbits // 4)
+            groups.setdefault((r[0], r[3], wide), []).append(idx)
+        self._roots: dict[tuple[int, int], list] = {}
+        for (sv, dv, wide), ids in sorted(groups.items(), key=lambda kv: kv[1][0]):
+            dims = [d for d, w in enumerate(wide) if not w] + [2]
+            self._roots.setdefault((sv, dv), []).append(self._build((sv, dv), ids, dims))
+        self.stats = {
+            "classifier": "tree",
+            "rules": len(compiled),
+            "build_seconds": time.perf_counter() - t0,
+            "trees": len(groups),
+            "internal_nodes": self._internal,
+            "leaves": len(self._leaves),
+            "rule_refs": sum(len(leaf) for leaf in self._leaves.values()),
+            "max_leaf": max((len(leaf) for leaf in self._leaves.values()), default=0),
+            "memory_bytes": self._memory(),
+        }
+
+    @staticmethod
+    def _port_key(port: int) -> int:
+        return min(max(port + 1, 0), (1 << _PORT_BITS) - 1)
+
+    def _build(self, fams: tuple[int, int], ids: list[int], dims: list[int]):
+        sbits, dbits = (32 if v == 4 else 128 for v in fams)
+        widths = (sbits, dbits, _PORT_BITS)
+        boxes = {}
+        whole = {idx for idx in ids if _contiguous(self._compiled[idx][2], sbits)
+                 and _contiguous(self._compiled[idx][5], dbits)}
+        for idx in ids:
+            r = self._compiled[idx]
+            boxes[idx] = (r[1], r[1] | (~r[2] & ((1 << sbits) - 1)), r[4], r[4] | (~r[5] & ((1 << dbits) - 1)),
+                          self._port_key(r[7]), self._port_key(min(r[8], 1 << _PORT_BITS)))
+        root = [None]
+        # (rule ids, box as (lo, hi) per dimension, depth, parent slot list, slot index)
+        stack = [(ids, tuple((0, (1 << w) - 1) for w in widths), 0, root, 0)]
+        while stack:
+            ids, box, depth, slots, slot = stack.pop()
+            kept = []
+            for idx in ids:
+                kept.append(idx)
+                b = boxes[idx]
+                r = self._compiled[idx]
+                # a non-contiguous mask matches only part of its [net, net | ~mask] box
+                if (r[6] == ANY_PROTO and r[9:11] == _ANY_PORT and idx in whole
+                        and all(b[2 * d] <= box[d][0] and b[2 * d + 1] >= box[d][1] for d in range(3))):
+                    break  # covers the whole box: later rules can never win here
+            ids = kept
+            split = None
+            if len(ids) > self.binth and depth < self.max_depth:
+                split = self._split(ids, box, boxes, dims)
+            if split is None:
+                slots[slot] = self._leaves.setdefault(tuple(ids), ids)
+                continue
+            dim, shift, children_ids = split
+            lo = box[dim][0]
+            children = [None] * len(children_ids)
+            slots[slot] = (dim, lo, shift, children)
+            self._internal += 1
+            for c, cids in enumerate(children_ids):
+                cbox = list(box)
+                cbox[dim] = (lo + (c << shift), lo + ((c + 1) << shift) - 1)
+                stack.append((cids, tuple(cbox), depth + 1, children, c))
+        return root[0]
+
+    def _split(self, ids: list[int], box: tuple, boxes: dict, dims: list[int]):
+        """
+        (dimension, slice shift, rule ids per slice) for the allowed dimension with the most
+        distinct rule ranges, cut as finely as spfac allows; None if no cut separates the rules.
+        """
+        best, best_distinct = None, 1
+        for d in dims:
+            lo, hi = box[d]
+            if lo == hi:
+                continue
+            distinct = len({(max(lo, boxes[i][2 * d]), min(hi, boxes[i][2 * d + 1])) for i in ids})
+            if distinct > best_distinct:
+                best, best_distinct = d, distinct
+        if best is None:
+            return None
+        lo, hi = box[best]
+        wbits = (hi - lo + 1).bit_length() - 1
+        spans = [(max(lo, boxes[i][2 * best]) - lo, min(hi, boxes[i][2 * best + 1]) - lo) for i in ids]
+        k = 1
+        while k < min(self._max_k, wbits):
+            shift = wbits - (k + 1)
+            total = sum((b >> shift) - (a >> shift) + 1 for a, b in spans)
+            if total + (1 << (k + 1)) > self.spfac * len(ids):
+                break
+            k += 1
+        shift = wbits - k
+        children_ids = [[] for _ in range(1 << k)]
+        for idx, (a, b) in zip(ids, spans):
+            for c in range(a >> shift, (b >> shift) + 1):
+                children_ids[c].append(idx)
+        filled = [len(c) for c in children_ids if c]
+        if len(filled) > 1 and min(filled) == len(ids):
+            return None  # every rule spans every occupied slice: cutting would only replicate
+        return best, shift, children_ids
+
+    def _memory(self) -> int:
+        seen, total = set(), sys.getsizeof(self._roots)
+        stack = [root for roots in self._roots.values() for root in roots]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            total += sys.getsizeof(node)
+            if type(node) is tuple:
+                total += sys.getsizeof(node[3])
+                stack.extend(node[3])
+        return total
+
+    def match(self, sv: int, s: int, dv: int, d: int, proto: int, port: int, sport: int = -1) -> int:
+        """Index of the first matching rule, -1 if none."""
+        best = -1
+        key = (s, d, self._port_key(port))
+        compiled = self._compiled
+        for node in self._roots.get((sv, dv), ()):
+            while type(node) is tuple:
+                dim, lo, shift, children = node
+                node = children[(key[dim] - lo) >> shift]
+            for idx in node:
+                if best >= 0 and idx > best:
+                    break
+                if _rule_matches(compiled[idx], sv, s, dv, d, proto, port, sport):
+                    best = idx
+                    break
+        return best
+
+CLASSIFIERS = ("linear", "tree")
 
 class Engine:
-    def __init__(self):
+    def __init__(self, classifier: str = "linear", cache_size: int = 0, conntrack_size: int = 0):
+        if classifier not in CLASSIFIERS:
+            raise ValueError(f"Unknown classifier {classifier!r}")
+        self.classifier = classifier
         self.rules: list[Rule] = []
+        # Rules compiled to plain tuples:
+        # (src_version, src_net, src_mask, dst_version, dst_net, dst_mask, proto_mask,
+        #  port_lo, port_hi, sport_lo, sport_hi, action)
+        self._compiled: list[tuple] = []
+        self._protos: dict[str, int] = {}
+        self._tree: DecisionTree | None = None
+        self.classifier_stats: dict = {"classifier": classifier, "rules": 0, "build_seconds": 0.0}
+        self.conntrack: ConnTrack | None = None
+        self.set_cache(cache_size)
+        self.set_conntrack(conntrack_size)
+
+    def set_cache(self, size: int):
+        """
+        Keep the last `size` (packet tuple -> matched rule) results in an LRU verdict cache;
+        0 disables it. Repeated flows then skip the rule walk. Clears the cache and its stats.
+        """
+        if size < 0:
+            raise ValueError("Cache size must be >= 0")
+        self.cache_size = size
+        self._match = lru_cache(maxsize=size)(self._first_match) if size else self._first_match
+
+    @property
+    def cache_stats(self) -> dict:
+        """{"size", "capacity", "hits", "misses", "hit_rate"} of the verdict cache (all 0 when disabled)."""
+        if not self.cache_size:
+            return {"size": 0, "capacity": 0, "hits": 0, "misses": 0, "hit_rate": 0.0}
+        info = self._match.cache_info()
+        lookups = info.hits + info.misses
+        return {"size": info.currsize, "capacity": info.maxsize, "hits": info.hits, "misses": info.misses,
+                "hit_rate": info.hits / lookups if lookups else 0.0}
+
+    def set_conntrack(self, max_size: int, timeouts: dict[str, float] | None = None):
+        """
+        Enable stateful mode with a connection table of at most max_size flows (0 disables it).
+        A packet allowed by a rule opens a flow; later packets of that flow in either direction,
+        replies included, are allowed without walking the rules until the flow idles past its
+        protocol's timeout (seconds, see conntrack.DEFAULT_TIMEOUTS). Starts an empty table.
+        """
+        if max_size < 0:
+            raise ValueError("Connection table size must be >= 0")
+        if max_size:
+            self.conntrack = ConnTrack(max_size, timeouts if timeouts is not None else
+                                       (self.conntrack.timeouts if self.conntrack else None))
+        else:
+            self.conntrack = None
+
+    @property
+    def conntrack_stats(self) -> dict:
+        """ConnTrack.stats ({"size", "max_size", "hits", "misses", "inserts", "evictions", "expired",
+        "lookup_ns_avg"}), all 0 when stateful mode is off."""
+        if self.conntrack is None:
+            return {"size": 0, "max_size": 0, "hits": 0, "misses": 0, "inserts": 0, "evictions": 0,
+                    "expired": 0, "lookup_ns_avg": 0.0}
+        return self.conntrack.stats
 
     def set_rules(self, rules: list[Rule]):
+        """
+        Install a rule list, compiling it once for evaluate(). Raises ValueError for an unparsable
+        CIDR or port range. Clears the verdict cache and the connection table.
+        """
+        t0 = time.perf_counter()
+        compiled, protos = compile_rules(rules)
         self.rules = rules
+        self._compiled = compiled
+        self._protos = protos
+        self._build_classifier(time.perf_counter() - t0)
+        self.set_cache(self.cache_size)  # cached verdicts belong to the old policy
+        if self.conntrack is not None:
+            self.conntrack.clear()  # so do the rule indices of tracked flows
+
+    def set_classifier(self, classifier: str):
+        """Switch between "linear" first-match search and the "tree" decision tree for the current rules."""
+        if classifier not in CLASSIFIERS:
+            raise ValueError(f"Unknown classifier {classifier!r}")
+        self.classifier = classifier
+        self._build_classifier(0.0)
+
+    def _build_classifier(self, compile_seconds: float):
+        if self.classifier == "tree":
+            self._tree = DecisionTree(self._compiled)
+            self.classifier_stats = dict(self._tree.stats, compile_seconds=compile_seconds)
+        else:
+            self._tree = None
+            self.classifier_stats = {
+                "classifier": "linear",
+                "rules": len(self._compiled),
+                "build_seconds": compile_seconds,
+                "memory_bytes": sys.getsizeof(self._compiled) + sum(sys.getsizeof(r) for r in self._compiled),
+            }
+
+    def _first_match(self, sv: int, s: int, dv: int, d: int, proto: int, port: int, sport: int = -1) -> int:
+        """Index of the first compiled rule matching an already-parsed packet, -1 if none."""
+        if self._tree is not None:
+            return self._tree.match(sv, s, dv, d, proto, port, sport)
+        for idx, (rsv, sn, sm, rdv, dn, dm, pm, lo, hi, slo, shi, _) in enumerate(self._compiled):
+            if (s & sm == sn and d & dm == dn and rsv == sv and rdv == dv
+                    and pm & proto and lo <= port <= hi and slo <= sport <= shi):
+                return idx
+        return -1
+
+    def _stateful_match(self, sv: int, s: int, dv: int, d: int, proto: int, port: int, sport: int,
+                        now: float, name: str) -> int:
+        """
+        _match() behind the connection table: tracked flows skip the rule walk, allowed ones are
+        tracked. Flows are keyed and timed out by the packet's protocol name, not its rule-set
+        bit, which every protocol no rule names shares.
+        """
+        fwd, rev = (sv, s, dv, d, name, sport, port), (dv, d, sv, s, name, port, sport)
+        key = fwd if fwd <= rev else rev  # one key for both directions
+        ct = self.conntrack
+        idx = ct.lookup(key, now)
+        if idx >= 0:
+            return idx
+        idx = self._match(sv, s, dv, d, proto, port, sport)
+        if idx >= 0 and self._compiled[idx][-1] == "allow":
+            ct.add(key, idx, ct.timeout(name), now)
+        return idx
+
+    def evaluate(self, pkt: Packet, now: float | None = None) -> tuple[str, int | None]:
+        """
+        Return (verdict, matched_rule_index). Default implicit deny. In stateful mode a packet of
+        a tracked flow reports the rule that opened the flow; now (seconds, default
+        time.monotonic()) drives the flow timeouts.
+        """
+        sv, s = addr_int(pkt.src)
+        dv, d = addr_int(pkt.dst)
+        port = -1 if pkt.port is None else pkt.port
+        sport = -1 if pkt.sport is None else pkt.sport
+        proto = self._protos.get(pkt.proto, _OTHER_PROTO)
+        if self.conntrack is not None:
+            idx = self._stateful_match(sv, s, dv, d, proto, port, sport, time.monotonic() if now is None else now,
+                                       pkt.proto.lower())
+        else:
+            idx = self._match(sv, s, dv, d, proto, port, sport)
+        if idx < 0:
+            return "deny", None
+        return self._compiled[idx][-1], idx
+
+    def _columns(self, src, dst, proto, port, sport) -> tuple:
+        """Normalise columnar input to (src_ver, src, dst_ver, dst, proto_bit, port, sport) sequences."""
+        cols = []
+        for addrs in (src, dst):
+            if HAVE_NUMPY and isinstance(addrs, np.ndarray) and addrs.dtype.kind in "iu":
+                # integer arrays are IPv4 addresses
+                cols += [np.full(len(addrs), 4, dtype=np.uint8), addrs.astype(np.uint32, copy=False)]
+            else:
+                parsed = [addr_int(a) if isinstance(a, str) else (4, int(a)) for a in addrs]
+                cols += [[v for v, _ in parsed], [x for _, x in parsed]]
+        protos = self._protos
+        if HAVE_NUMPY and isinstance(proto, np.ndarray):
+            names, inverse = np.unique(proto, return_inverse=True)
+            cols.append(np.array([protos.get(p, _OTHER_PROTO) for p in names.tolist()], dtype=np.int64)[inverse])
+        else:
+            cols.append([protos.get(p, _OTHER_PROTO) for p in proto])
+        if sport is None:
+            sport = [None] * len(cols[0])
+        for ports in (port, sport):
+            if HAVE_NUMPY and isinstance(ports, np.ndarray) and ports.dtype.kind in "iu":
+                cols.append(ports.astype(np.int64))
+            else:
+                cols.append([-1 if p is None else int(p) for p in ports])
+        return tuple(cols)
+
+    def evaluate_many(self, src, dst, proto, port, sport=None):
+        """
+        Classify a batch given as columns: src/dst address strings (or IPv4 integer arrays),
+        proto strings, destination ports and optional source ports (None or -1 for none). With
+        NumPy, IPv4 packets are matched rule by rule over the still-unmatched rows (bypassing the
+        verdict cache, which would only slow a vectorised batch down); anything involving IPv6
+        goes through evaluate's loop and its cache. With the "tree" classifier or stateful mode
+        enabled, rows are looked up one at a time (in order) instead.
+        Returns (verdicts, matched) arrays (lists without NumPy); matched is -1 for implicit deny.
+        First-match results are identical to evaluate().
+        """
+        cols = self._columns(src, dst, proto, port, sport)
+        if not HAVE_NUMPY or self._tree is not None or self.conntrack is not None:
+            rows = zip(*(c.tolist() if HAVE_NUMPY and isinstance(c, np.ndarray) else c for c in cols))
+            if self.conntrack is not None:
+                match, now = self._stateful_match, time.monotonic()
+                names = [p.lower() for p in (proto.tolist() if HAVE_NUMPY and isinstance(proto, np.ndarray) else proto)]
+                matched = [match(*row, now, name) for row, name in zip(rows, names)]
+            else:
+                match = self._match
+                matched = [match(*row) for row in rows]
+            verdicts = [self._compiled[i][-1] if i >= 0 else "deny" for i in matched]
+            if HAVE_NUMPY:
+                return np.array(verdicts), np.array(matched, dtype=np.int64)
+            return verdicts, matched
+
+        sv, s, dv, d, pc, pt, st = cols
+        sv, dv = np.asarray(sv, dtype=np.uint8), np.asarray(dv, dtype=np.uint8)
+        pc, pt, st = (np.asarray(c, dtype=np.int64) for c in (pc, pt, st))
+        n = len(sv)
+        matched = np.full(n, -1, dtype=np.int64)
+        v4 = (sv == 4) & (dv == 4)
+        for i in np.flatnonzero(~v4).tolist():
+            matched[i] = self._match(int(sv[i]), int(s[i]), int(dv[i]), int(d[i]), int(pc[i]), int(pt[i]),
+                                           int(st[i]))
+
+        # Pending rows as compacted columns; shrink them whenever a rule claims some rows.
+        rows = np.flatnonzero(v4)
+        ps = np.array([s[i] for i in rows.tolist()] if isinstance(s, list) else s[rows], dtype=np.uint32)
+        pd = np.array([d[i] for i in rows.tolist()] if isinstance(d, list) else d[rows], dtype=np.uint32)
+        pp, pport, psport = pc[rows], pt[rows], st[rows]
+        for idx, (rsv, sn, sm, rdv, dn, dm, pm, lo, hi, slo, shi, _) in enumerate(self._compiled):
+            if not len(rows):
+                break
+            if rsv != 4 or rdv != 4:
+                continue
+            hit = ((ps & np.uint32(sm)) == np.uint32(sn)) & ((pd & np.uint32(dm)) == np.uint32(dn))
+            if pm != ANY_PROTO:
+                hit &= (pp & pm) != 0
+            if lo > -1 or hi < _ANY_PORT[1]:
+                hit &= (pport >= lo) & (pport <= hi)
+            if slo > -1 or shi < _ANY_PORT[1]:
+                hit &= (psport >= slo) & (psport <= shi)
+            if hit.any():
+                matched[rows[hit]] = idx
+                keep = ~hit
+                rows, ps, pd, pp, pport, psport = (rows[keep], ps[keep], pd[keep], pp[keep], pport[keep],
+                                                   psport[keep])
+
+        actions = np.array(["deny"] + [r[-1] for r in self._compiled])
+        return actions[matched + 1], matched
+
+    def evaluate_stream(self, packets, chunk: int = 65536):
+        """
+        evaluate_many over an iterator of (src, dst, proto, port) or (src, dst, proto, port, sport)
+        tuples, chunk rows at a time. Yields one (verdicts, matched) pair per chunk.
+        """
+        it = iter(packets)
+        while True:
+            rows = list(islice(it, chunk))
+            if not rows:
+                return
+            yield self.evaluate_many(*zip(*rows))
+
+def replay_pcap(engine: Engine, path: str, progress=None, cancel=None, batch: int = 4096) -> dict:
+    """
+    Stream a pcap/pcapng capture through engine record by record (memory stays flat whatever
+    the file size). The 5-tuple is read straight from the frame bytes and matched against the
+    rules. Counts per-rule hits and wire bytes plus implicit denies; non-IP frames are counted
+    as skipped. progress(bytes_read, file_size) is called every batch packets and a CancelToken
+    stops the replay between batches. Uses the engine's verdict cache; in stateful mode the
+    connection table starts empty and flow timeouts follow the capture timestamps.
+    Returns {"ok", "error", "cancelled", "packets", "evaluated", "skipped", "bytes", "hits",
+    "hit_bytes", "implicit_deny", "implicit_deny_bytes", "allowed", "denied", "seconds", "pps",
+    "cache", "conntrack"} where "cache"/"conntrack" are the engine's stats afterwards.
+    """
+    t0 = time.perf_counter()
+    n_rules = len(engine._compiled)
+    out = {"ok": True, "error": None, "cancelled": False, "packets": 0, "evaluated": 0, "skipped": 0,
+           "bytes": 0, "hits": [0] * n_rules, "hit_bytes": [0] * n_rules, "implicit_deny": 0,
+           "implicit_deny_bytes": 0, "allowed": 0, "denied": 0, "seconds": 0.0, "pps": 0.0,
+           "cache": engine.cache_stats, "conntrack": engine.conntrack_stats}
+    try:
+        total = os.path.getsize(path)
+    except OSError as e:
+        return dict(out, ok=False, error=str(e))
+    protos = engine._protos
+    names = [PROTO_NAMES.get(n, str(n)) for n in range(256)]
+    codes = [protos.get(name, _OTHER_PROTO) for name in names]
+    stateful = engine.conntrack is not None
+    if stateful:
+        engine.set_conntrack(engine.conntrack.max_size)
+    match = engine._stateful_match if stateful else engine._match
+    hits, hit_bytes = out["hits"], out["hit_bytes"]
+    packets = evaluated = nbytes = deny = deny_bytes = 0
+    read = 24
+    try:
+        for ts, wire, linktype, data in iter_pcap(path):
+            packets += 1
+            nbytes += wire
+            read += 16 + len(data)
+            if not packets % batch:
+                if cancel is not None and cancel.is_cancelled():
+                    out.update(ok=False, error="Cancelled", cancelled=True)
+                    break
+                if progress is not None:
+                    progress(min(read, total), total)
+            t = five_tuple(linktype, data)
+            if t is None:
+                continue
+            evaluated += 1
+            version, s, d, proto, sport, dport = t
+            args = (version, s, version, d, codes[proto], -1 if dport is None else dport,
+                    -1 if sport is None else sport)
+            idx = match(*args, ts, names[proto]) if stateful else match(*args)
+            if idx < 0:
+                deny += 1
+                deny_bytes += wire
+            else:
+                hits[idx] += 1
+                hit_bytes[idx] += wire
+    except (OSError, ValueError, struct.error) as e:  # struct.error: truncated or malformed blocks
+        out.update(ok=False, error=str(e))
+    allowed = sum(h for h, r in zip(hits, engine._compiled) if r[-1] == "allow")
+    seconds = time.perf_counter() - t0
+    out.update(packets=packets, evaluated=evaluated, skipped=packets - evaluated, bytes=nbytes,
+               implicit_deny=deny, implicit_deny_bytes=deny_bytes, allowed=allowed,
+               denied=evaluated - allowed, seconds=seconds, pps=packets / seconds if seconds else 0.0,
+               cache=engine.cache_stats, conntrack=engine.conntrack_stats)
+    if progress is not None and out["ok"]:
+        progress(total, total)
+    return out
+
+class _PrefixIndex:
+    """(network, prefixlen) -> value map that lists every stored prefix nested with a query prefix."""
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.items: dict[tuple[int, int], object] = {}
+
+    def finalize(self):
+        self.plens = sorted({p for _, p in self.items})
+        self.masks = {p: ((1 << self.bits) - 1) ^ ((1 << (self.bits - p)) - 1) for p in self.plens}
+        self.starts = sorted(self.items)
+
+    def estimate(self, net: int, plen: int) -> int:
+        """Cheap upper bound on how many keys related() yields."""
+        last = net | ((1 << (self.bits - plen)) - 1)
+        return (bisect_left(self.plens, plen + 1) + bisect_left(self.starts, (last + 1, 0))
+                - bisect_left(self.starts, (net, plen + 1)))
+
+    def related(self, net: int, plen: int):
+        """Stored keys containing (or equal to) net/plen, then those inside it."""
+        items = self.items
+        for p in self.plens:
+            if p > plen:
+                break
+            key = (net & self.masks[p], p)
+            if key in items:
+                yield key
+        starts = self.starts
+        i = bisect_left(starts, (net, plen + 1))
+        last = net | ((1 << (self.bits - plen)) - 1)
+        while i < len(starts) and starts[i][0] <= last:
+            yield starts[i]
+            i += 1
+
+ANALYSIS_KINDS = ("shadowed", "redundant", "generalized", "correlated")
+
+def _mask_subset(a: tuple, b: tuple) -> bool:
+    """Whether compiled rule a's src and dst address sets lie inside b's (any masks)."""
+    return (not b[2] & ~a[2] and a[1] & b[2] == b[1]) and (not b[5] & ~a[5] and a[4] & b[5] == b[4])
+
+def analyze_rules(rules: list[Rule]) -> dict:
+    """
+    Find rules that conflict with an earlier rule over the (src, dst, proto, port, sport) space:
+      shadowed    - fully covered by an earlier rule with a different action (never matches)
+      redundant   - fully covered by an earlier rule with the same action (never matches)
+      generalized - a superset of an earlier rule with a different action
+      correlated  - partially overlaps an earlier rule with a different action
+    Prefixes are nested or disjoint, so only rules whose src and dst prefixes are nested with
+    each other are compared (found through prefix indexes, not a pairwise scan). Non-contiguous
+    wildcard masks are indexed under their leading prefix and compared bit by bit. Each finding is
+    {"rule", "earlier", "count"}: the earliest such earlier rule and how many there are.
+    Returns {"ok", "error", "rules", "seconds", "shadowed", "redundant", "generalized", "correlated"}.
+    """
+    t0 = time.perf_counter()
+    out = {"ok": True, "error": None, "rules": len(rules), "seconds": 0.0, **{k: [] for k in ANALYSIS_KINDS}}
+    try:
+        compiled, _ = compile_rules(rules)
+    except ValueError as e:
+        return dict(out, ok=False, error=str(e))
+
+    # family pair -> outer prefix -> inner prefix -> rule indices (ascending), once keyed
+    # src-then-dst and once dst-then-src; each rule walks whichever has fewer related keys
+    by_src: dict[tuple[int, int], _PrefixIndex] = {}
+    by_dst: dict[tuple[int, int], _PrefixIndex] = {}
+    keys, irregular = [], []
+    for idx, r in enumerate(compiled):
+        sbits, dbits = (32 if v == 4 else 128 for v in (r[0], r[3]))
+        splen, dplen = _prefixlen(r[2], sbits), _prefixlen(r[5], dbits)
+        skey = (r[1] >> (sbits - splen) << (sbits - splen), splen)
+        dkey = (r[4] >> (dbits - dplen) << (dbits - dplen), dplen)
+        keys.append((skey, dkey))
+        irregular.append(not (_contiguous(r[2], sbits) and _contiguous(r[5], dbits)))
+        outer = by_src.setdefault((r[0], r[3]), _PrefixIndex(sbits))
+        outer.items.setdefault(skey, _PrefixIndex(dbits)).items.setdefault(dkey, []).append(idx)
+        outer = by_dst.setdefault((r[0], r[3]), _PrefixIndex(dbits))
+        outer.items.setdefault(dkey, _PrefixIndex(sbits)).items.setdefault(skey, []).append(idx)
+    for index in (*by_src.values(), *by_dst.values()):
+        index.finalize()
+        for inner in index.items.values():
+            inner.finalize()
 
-    def evaluate(self, pkt: Packet) -> tuple[str, int | None]:
-        """Return (verdict, matched_rule_index). Default implicit deny."""
-        ps = ip_address(pkt.src)
-        pd = ip_address(pkt.dst)
-        for idx, r in enumerate(self.rules):
-            ns = ip_network(r.src, strict=False)
-            nd = ip_network(r.dst, strict=False)
-            if ps in ns and pd in nd:
-                # proto
-                if r.proto != "any" and pkt.proto != r.proto:
-                    continue
-                # port
-                if r.port is not None and pkt.port != r.port:
-                    continue
-                return r.action, idx
-        return "deny", None
+    for j, rj in enumerate(compiled):
+        first, second = keys[j]
+        outer = by_src[(rj[0], rj[3])]
+        alt = by_dst[(rj[0], rj[3])]
+        if alt.estimate(*second) < outer.estimate(*first):
+            outer, first, second = alt, second, first
+        pj, loj, hij, sloj, shij, actj = rj[6:]
+        cover = general = correl = None
+        n_cover = n_general = n_correl = 0
+        for okey in outer.related(*first):
+            o_sub, o_sup = first[1] >= okey[1], first[1] <= okey[1]
+            inner = outer.items[okey]
+            for ikey in inner.related(*second):
+                sub_net = o_sub and second[1] >= ikey[1]
+                sup_net = o_sup and second[1] <= ikey[1]
+                for i in inner.items[ikey]:
+                    if i >= j:
+                        break
+                    ri = compiled[i]
+                    pi, loi, hii, sloi, shii, acti = ri[6:]
+                    if not pi & pj or hij < loi or hii < loj or shij < sloi or shii < sloj:
+                        continue
+                    sub, sup = sub_net, sup_net
+                    if irregular[i] or irregular[j]:
+                        if (ri[1] ^ rj[1]) & ri[2] & rj[2] or (ri[4] ^ rj[4]) & ri[5] & rj[5]:
+                            continue  # disjoint
+                        sub, sup = _mask_subset(rj, ri), _mask_subset(ri, rj)
+                    if (sub and not pj & ~pi and loi <= loj and hij <= hii
+                            and sloi <= sloj and shij <= shii):
+                        n_cover += 1
+                        if cover is None or i < cover:
+                            cover = i
+                        continue
+                    if acti == actj:
+                        continue
+                    if (sup and not pi & ~pj and loj <= loi and hii <= hij
+                            and sloj <= sloi and shii <= shij):
+                        n_general += 1
+                        if general is None or i < general:
+                            general = i
+                    else:
+                        n_correl += 1
+                        if correl is None or i < correl:
+                            correl = i
+        if cover is not None:
+            kind = "redundant" if compiled[cover][-1] == actj else "shadowed"
+            out[kind].append({"rule": j, "earlier": cover, "count": n_cover})
+            continue
+        if general is not None:
+            out["generalized"].append({"rule": j, "earlier": general, "count": n_general})
+        if correl is not None:
+            out["correlated"].append({"rule": j, "earlier": correl, "count": n_correl})
+    out["seconds"] = time.perf_counter() - t0
+    return out
@@ -0,0 +1,344 @@
+import time
+
+from .firewall import Rule, addr_int
+from .pcap import PROTO_NAMES
+from .subnetting import int_to_addr, interval_to_cidrs
+
+_EXAMPLES = 50  # invalid lines kept as examples in parse results
+
+# IOS protocol keywords; canonical names follow pcap.PROTO_NAMES so replayed packets match
+_PROTO_NUMBERS = {"icmp": 1, "igmp": 2, "ipinip": 4, "tcp": 6, "udp": 17, "gre": 47, "esp": 50, "ahp": 51,
+                  "icmpv6": 58, "eigrp": 88, "ospf": 89, "nos": 94, "pim": 103, "pcp": 108, "sctp": 132}
+PORT_NAMES = {
+    "bgp": 179, "biff": 512, "bootpc": 68, "bootps": 67, "chargen": 19, "cmd": 514, "daytime": 13,
+    "discard": 9, "dnsix": 195, "domain": 53, "echo": 7, "exec": 512, "finger": 79, "ftp": 21,
+    "ftp-data": 20, "gopher": 70, "hostname": 101, "http": 80, "https": 443, "ident": 113, "imap": 143,
+    "irc": 194, "isakmp": 500, "kerberos": 88, "klogin": 543, "kshell": 544, "ldap": 389, "login": 513,
+    "lpd": 515, "mobile-ip": 434, "nameserver": 42, "netbios-dgm": 138, "netbios-ns": 137,
+    "netbios-ss": 139, "nntp": 119, "non500-isakmp": 4500, "ntp": 123, "pim-auto-rp": 496, "pop2": 109,
+    "pop3": 110, "rip": 520, "smtp": 25, "snmp": 161, "snmptrap": 162, "sunrpc": 111, "syslog": 514,
+    "tacacs": 49, "talk": 517, "telnet": 23, "tftp": 69, "time": 37, "uucp": 540, "who": 513,
+    "whois": 43, "www": 80, "xdmcp": 177,
+}
+_ANY = {4: "0.0.0.0/0", 6: "::/0"}
+# the only trailing keywords that do not narrow what an entry matches; anything else (ICMP
+# type/code, established, TCP flags, dscp, precedence, tos, ttl, time-range, fragments, ...)
+# cannot be expressed by Rule, and dropping it would widen the entry
+_TRAILING_OK = {"log", "log-input"}
+
+def _check_trailing(words: list[str], i: int):
+    while i < len(words):
+        token = words[i].lower()
+        if token == "sequence" and i + 1 < len(words) and words[i + 1].isdigit():
+            i += 2  # IPv6 entries may carry their sequence number last
+            continue
+        if token not in _TRAILING_OK:
+            raise ValueError(f"{words[i]!r} matching is not supported; entry skipped")
+        i += 1
+
+def _proto(token: str):
+    """Canonical protocol name (or list, for tcp-udp) of an IOS protocol keyword or number."""
+    token = token.lower()
+    if token in ("ip", "ipv6"):
+        return "any"
+    if token == "tcp-udp":
+        return ["tcp", "udp"]
+    num = int(token) if token.isdigit() else _PROTO_NUMBERS.get(token)
+    if num is None or not 0 <= num <= 255:
+        raise ValueError(f"Unknown protocol {token!r}")
+    return "any" if num == 0 else PROTO_NAMES.get(num, str(num))
+
+def _port(token: str) -> int:
+    num = int(token) if token.isdigit() else PORT_NAMES.get(token.lower())
+    if num is None or not 0 <= num <= 65535:
+        raise ValueError(f"Unknown port {token!r}")
+    return num
+
+def _wildcard(addr: str, wildcard: str) -> str:
+    """Rule address for an IPv4 address/wildcard pair: a CIDR when the wildcard is contiguous."""
+    av, a = addr_int(addr)
+    wv, w = addr_int(wildcard)
+    if av != 4 or wv != 4:
+        raise ValueError(f"Invalid address/wildcard {addr} {wildcard}")
+    if w & (w + 1):
+        return f"{int_to_addr(a & ~w & 0xFFFFFFFF)} {int_to_addr(w)}"
+    return f"{int_to_addr(a & ~w & 0xFFFFFFFF)}/{32 - w.bit_length()}"
+
+class AclParser:
+    """
+    Line-at-a-time parser for Cisco IOS access lists. Handles numbered (access-list N ...) and
+    named (ip/ipv6 access-list standard|extended NAME) standard and extended ACLs with
+    any/host/address-wildcard (non-contiguous included)/prefix addresses, eq/neq/lt/gt/range
+    ports and network, service and protocol object-groups (IOS members, plus ASA-style
+    network-object/port-object/protocol-object lines).
+    Each entry becomes one Rule per combination of its addresses, protocols and port ranges,
+    in order; remarks and unrelated config lines are skipped. Object-groups must be defined
+    before the entries that use them, as in a running-config. Entries with any trailing
+    qualifier besides log/log-input (ICMP type/code, established and TCP flags, dscp,
+    precedence, tos, ttl, time-range, fragments, ...) are reported as invalid rather than
+    loaded without it.
+    """
+
+    def __init__(self):
+        self.acls: dict[str, list[Rule]] = {}
+        self.types: dict[str, str] = {}
+        self.groups: dict[str, tuple[str, list]] = {}  # name -> (kind, members)
+        self.lines = self.entries = self.invalid = 0
+        self.invalid_examples: list[dict] = []
+        self._mode = None  # ("acl", name, kind, version) or ("group", name, kind, members, header proto)
+        self._addr_cache: dict[tuple, list[str]] = {}
+
+    def feed(self, line: str):
+        self.lines += 1
+        text = line.rstrip()
+        if not text or text.lstrip().startswith("!"):
+            return
+        try:
+            if text[0] in " \t":
+                body = text.strip()
+                if self._mode is None:
+                    return
+                if self._mode[0] == "acl":
+                    self._named_entry(body)
+                else:
+                    self._group_member(body)
+                return
+            self._mode = None
+            words = text.split()
+            head = words[0].lower()
+            if head == "access-list":
+                self._numbered(words)
+            elif head in ("ip", "ipv6") and len(words) >= 3 and words[1].lower() == "access-list":
+                self._named_header(words)
+            elif head == "object-group" and len(words) >= 3:
+                kind = words[1].lower()
+                members: list = []
+                self.groups[words[2]] = (kind, members)
+                self._mode = ("group", words[2], kind, members, words[3].lower() if len(words) > 3 else None)
+        except (ValueError, IndexError) as e:
+            self.invalid += 1
+            if len(self.invalid_examples) < _EXAMPLES:
+                error = "Incomplete line" if isinstance(e, IndexError) else str(e)
+                self.invalid_examples.append({"line": self.lines, "text": text.strip(), "error": error})
+
+    def _numbered(self, words: list[str]):
+        name = words[1]
+        if words[2].lower() in ("remark", "dynamic"):
+            return
+        num = int(name) if name.isdigit() else -1
+        kind = "standard" if 1 <= num <= 99 or 1300 <= num <= 1999 else "extended"
+        self.types.setdefault(name, kind)
+        self._entry(name, kind, 4, words[2:], " ".join(words))
+
+    def _named_header(self, words: list[str]):
+        version = 6 if words[0].lower() == "ipv6" else 4
+        if version == 4:
+            kind, name = words[2].lower(), words[3]
+            if kind not in ("standard", "extended"):
+                raise ValueError(f"Unknown access-list type {kind!r}")
+        else:
+            kind, name = "extended", words[2]
+        self.types.setdefault(name, kind if version == 4 else "ipv6")
+        self.acls.setdefault(name, [])
+        self._mode = ("acl", name, kind, version)
+
+    def _named_entry(self, body: str):
+        _, name, kind, version = self._mode
+        words = body.split()
+        if words[0].isdigit() or words[0].lower() == "sequence":
+            words = words[2:] if words[0].lower() == "sequence" else words[1:]
+        if not words or words[0].lower() in ("remark", "exit", "statistics"):
+            return
+        self._entry(name, kind, version, words, body)
+
+    def _entry(self, name: str, kind: str, version: int, words: list[str], text: str):
+        action = words[0].lower()
+        if action not in ("permit", "deny"):
+            raise ValueError(f"Unknown action {words[0]!r}")
+        action = "allow" if action == "permit" else "deny"
+        if kind == "standard":
+            srcs, i = self._address(words, 1, version, single=True)
+            _check_trailing(words, i)
+            services = [("any", [None], [None])]
+            dsts = [_ANY[version]]
+        else:
+            token = words[1].lower()
+            if token == "object-group":
+                services = self._group(words[2], "service")
+                i = 3
+            else:
+                services = [(_proto(words[1]), None, None)]
+                i = 2
+            srcs, i = self._address(words, i, version)
+            sports, i = self._ports(words, i)
+            dsts, i = self._address(words, i, version)
+            dports, i = self._ports(words, i)
+            _check_trailing(words, i)
+            services = [(p, sp if sp is not None else sports, dp if dp is not None else dports)
+                        for p, sp, dp in services]
+        rules = self.acls.setdefault(name, [])
+        self.entries += 1
+        for proto, sports, dports in services:
+            for src in srcs:
+                for dst in dsts:
+                    for sport in sports:
+                        for dport in dports:
+                            rules.append(Rule(action, src, dst, proto, dport, text, sport))
+
+    def _address(self, words: list[str], i: int, version: int, single: bool = False) -> tuple[list[str], int]:
+        """Rule addresses for the address spec at words[i] and the index after it."""
+        token = words[i].lower()
+        if token in ("any", "any4", "any6"):
+            return [_ANY[version]], i + 1
+        if token == "host":
+            key = ("host", words[i + 1])
+            i += 2
+        elif token in ("object-group", "addrgroup"):
+            return [a for m in self._group(words[i + 1], "network") for a in m], i + 2
+        elif "/" in token:
+            key = ("prefix", words[i])
+            i += 1
+        elif version == 4 and i + 1 < len(words) and words[i + 1][:1].isdigit():
+            key = ("wildcard", words[i], words[i + 1])
+            i += 2
+        elif single:
+            key = ("host", words[i])  # standard ACL: a bare address is a host
+            i += 1
+        else:
+            raise ValueError(f"Invalid address {words[i]!r}")
+        hit = self._addr_cache.get(key)
+        if hit is None:
+            if key[0] == "host":
+                v, a = addr_int(key[1])
+                hit = [f"{int_to_addr(a, v)}/{32 if v == 4 else 128}"]
+            elif key[0] == "prefix":
+                hit = [key[1]]
+            else:
+                hit = [_wildcard(key[1], key[2])]
+            self._addr_cache[key] = hit
+        return hit, i
+
+    def _ports(self, words: list[str], i: int) -> tuple[list, int]:
+        """Port ranges ([None] for any) for an optional port spec at words[i] and the index after it."""
+        if i >= len(words):
+            return [None], i
+        op = words[i].lower()
+        if op == "eq":
+            ports = [_port(words[i + 1])]
+            i += 2
+            while i < len(words) and (words[i].isdigit() or words[i].lower() in PORT_NAMES):
+                ports.append(_port(words[i]))  # IOS accepts up to ten ports after eq
+                i += 1
+            return ports, i
+        if op == "neq":
+            p = _port(words[i + 1])
+            return [r for r in ((0, p - 1), (p + 1, 65535)) if r[0] <= r[1]], i + 2
+        if op == "lt":
+            p = _port(words[i + 1])
+            if p == 0:
+                raise ValueError("lt 0 matches no port")
+            return [(0, p - 1)], i + 2
+        if op == "gt":
+            p = _port(words[i + 1])
+            if p == 65535:
+                raise ValueError("gt 65535 matches no port")
+            return [(p + 1, 65535)], i + 2
+        if op == "range":
+            return [(_port(words[i + 1]), _port(words[i + 2]))], i + 3
+        if op == "object-group" and i + 1 < len(words) and self.groups.get(words[i + 1], ("",))[0] == "service":
+            return [dp for _, _, dports in self._group(words[i + 1], "service") for dp in dports], i + 2
+        return [None], i
+
+    def _group(self, name: str, kind: str) -> list:
+        group = self.groups.get(name)
+        if group is None:
+            raise ValueError(f"Unknown object-group {name!r}")
+        if group[0] != kind and not (kind == "service" and group[0] == "protocol"):
+            raise ValueError(f"object-group {name!r} is {group[0]}, not {kind}")
+        return group[1]
+
+    def _group_member(self, body: str):
+        _, name, kind, members, group_proto = self._mode
+        words = body.split()
+        head = words[0].lower()
+        if head in ("description", "exit"):
+            return
+        if head == "group-object":
+            nested = self._group(words[1], kind)
+            members.extend(nested)
+            return
+        if kind == "network":
+            if head == "network-object":  # ASA: network-object host A | A MASK | object NAME
+                words = words[1:]
+                head = words[0].lower()
+            if head == "range":
+                first, last = addr_int(words[1])[1], addr_int(words[2])[1]
+                members.append([f"{int_to_addr(base)}/{plen}" for base, plen in interval_to_cidrs(first, last)])
+            elif head == "host" or len(words) == 1 or "/" in head:
+                members.append(self._address(words, 0, 6 if ":" in body else 4, single=True)[0])
+            else:
+                # members are written with a netmask; turn it into a wildcard
+                w = 0xFFFFFFFF ^ addr_int(words[1])[1]
+                members.append([_wildcard(words[0], int_to_addr(w))])
+        elif kind == "protocol":
+            if head == "protocol-object":
+                words = words[1:]
+            members.append((_proto(words[0]), None, None))  # ports come from the entry
+        elif kind == "service":
+            if head == "port-object":
+                # ASA port group: ports only, protocol from the group header
+                proto = _proto(group_proto) if group_proto else "any"
+                ports, i = self._ports(words, 1)
+                _check_trailing(words, i)
+                members.append((proto, [None], ports))
+                return
+            if head == "service-object":
+                words = words[1:]
+            proto = _proto(words[0])
+            i, sports = 1, [None]
+            if i < len(words) and words[i].lower() == "source":
+                sports, i = self._ports(words, i + 1)
+            if i < len(words) and words[i].lower() == "destination":
+                i += 1
+            dports, i = self._ports(words, i)
+            _check_trailing(words, i)
+            members.append((proto, sports, dports))
+        else:
+            raise ValueError(f"Unsupported object-group type {kind!r}")
+
+    def result(self, seconds: float = 0.0) -> dict:
+        return {
+            "ok": True,
+            "error": None,
+            "acls": self.acls,
+            "types": self.types,
+            "object_groups": len(self.groups),
+            "lines": self.lines,
+            "entries": self.entries,
+            "rules": sum(len(r) for r in self.acls.values()),
+            "invalid": self.invalid,
+            "invalid_examples": self.invalid_examples,
+            "seconds": seconds,
+        }
+
+def parse_acls(lines) -> dict:
+    """
+    Parse IOS configuration lines (any iterable, e.g. an open file) into Rule lists.
+    Returns {"ok", "error", "acls" (name -> list[Rule], ready for Engine.set_rules), "types"
+    (name -> standard/extended/ipv6), "object_groups", "lines", "entries", "rules", "invalid",
+    "invalid_examples" ({"line", "text", "error"}), "seconds"}.
+    """
+    t0 = time.perf_counter()
+    parser = AclParser()
+    feed = parser.feed
+    for line in lines:
+        feed(line)
+    return parser.result(time.perf_counter() - t0)
+
+def parse_acl_file(path: str) -> dict:
+    """parse_acls over a config file, streamed."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace", buffering=1 << 20) as f:
+            return parse_acls(f)
+    except OSError as e:
+        return {"ok": False, "error": str(e), "acls": {}, "types": {}, "lines": 0, "rules": 0}
@@ -0,0 +1,175 @@
+import struct
+
+# link-layer header types (https://www.tcpdump.org/linktypes.html)
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+_RAW_ALIASES = (LINKTYPE_RAW, 12, 14)  # DLT_RAW differs between platforms
+
+PROTO_NAMES = {1: "icmp", 6: "tcp", 17: "udp", 58: "icmpv6", 132: "sctp"}
+_PORT_PROTOS = (6, 17, 132)
+_VLAN_TYPES = (0x8100, 0x88A8, 0x9100)
+_IPV6_EXT = (0, 43, 60, 51)  # hop-by-hop, routing, destination options, AH (fragment handled apart)
+
+_PCAP_MAGIC = {0xA1B2C3D4: 1e-6, 0xA1B23C4D: 1e-9}
+_PCAPNG_SHB = 0x0A0D0D0A
+
+def iter_pcap(path: str, buffering: int = 1 << 20):
+    """
+    Stream (timestamp, wire_length, linktype, frame bytes) from a pcap or pcapng file,
+    one record at a time, so memory use does not depend on the capture size.
+    Raises ValueError for a file that is neither format.
+    """
+    with open(path, "rb", buffering=buffering) as f:
+        head = f.read(4)
+        if len(head) < 4:
+            raise ValueError("File too short to be a capture")
+        if struct.unpack("<I", head)[0] == _PCAPNG_SHB:
+            yield from _iter_pcapng(f, head)
+        else:
+            yield from _iter_classic(f, head)
+
+def _iter_classic(f, head: bytes):
+    for order in "<>":
+        magic = struct.unpack(order + "I", head)[0]
+        if magic in _PCAP_MAGIC:
+            break
+    else:
+        raise ValueError("Not a pcap or pcapng file")
+    scale = _PCAP_MAGIC[magic]
+    rest = f.read(20)
+    if len(rest) < 20:
+        raise ValueError("Truncated pcap header")
+    linktype = struct.unpack(order + "I", rest[16:20])[0] & 0x0FFFFFFF
+    rec = struct.Struct(order + "IIII")
+    read = f.read
+    while True:
+        hdr = read(16)
+        if len(hdr) < 16:
+            return
+        sec, frac, incl, orig = rec.unpack(hdr)
+        data = read(incl)
+        if len(data) < incl:
+            return  # truncated final record
+        yield sec + frac * scale, orig, linktype, data
+
+def _iter_pcapng(f, head: bytes):
+    order = "<"
+    interfaces: list[tuple[int, float]] = []  # (linktype, seconds per timestamp unit)
+    block = head
+    while True:
+        if block is None:
+            block = f.read(4)
+        if len(block) < 4:
+            return
+        rest = f.read(4)
+        if len(rest) < 4:
+            return
+        btype = struct.unpack(order + "I", block)[0]
+        if btype == _PCAPNG_SHB:
+            # byte order is only known once the byte-order magic is read
+            bom = f.read(4)
+            if len(bom) < 4:
+                return
+            order = "<" if struct.unpack("<I", bom)[0] == 0x1A2B3C4D else ">"
+            blen = struct.unpack(order + "I", rest)[0]
+            if blen < 12 or blen % 4:
+                return  # corrupt length; a negative read would slurp the rest of the file
+            body = bom + f.read(blen - 12)
+            interfaces = []
+        else:
+            blen = struct.unpack(order + "I", rest)[0]
+            if blen < 12 or blen % 4:
+                return
+            body = f.read(blen - 8)
+        block = None
+        if len(body) < blen - 8:
+            return
+        body = body[:-4]  # trailing copy of the block length
+        if btype == 1:  # interface description
+            linktype = struct.unpack_from(order + "H", body, 0)[0]
+            interfaces.append((linktype, _tsresol(body[8:], order)))
+        elif btype == 6:  # enhanced packet
+            iface, hi, lo, caplen, orig = struct.unpack_from(order + "IIIII", body, 0)
+            if iface < len(interfaces):
+                linktype, unit = interfaces[iface]
+                yield ((hi << 32) | lo) * unit, orig, linktype, body[20:20 + caplen]
+        elif btype == 3 and interfaces:  # simple packet
+            orig = struct.unpack_from(order + "I", body, 0)[0]
+            linktype, _ = interfaces[0]
+            yield 0.0, orig, linktype, body[4:4 + orig]
+        elif btype == 2:  # obsolete packet block
+            iface, _, hi, lo, caplen, orig = struct.unpack_from(order + "HHIIII", body, 0)
+            if iface < len(interfaces):
+                linktype, unit = interfaces[iface]
+                yield ((hi << 32) | lo) * unit, orig, linktype, body[20:20 + caplen]
+
+def _tsresol(options: bytes, order: str) -> float:
+    """Seconds per timestamp unit from an interface block's options (if_tsresol, default 1e-6)."""
+    pos = 0
+    while pos + 4 <= len(options):
+        code, length = struct.unpack_from(order + "HH", options, pos)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            v = options[pos + 4]
+            return 2.0 ** -(v & 0x7F) if v & 0x80 else 10.0 ** -v
+        pos += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+def five_tuple(linktype: int, data: bytes):
+    """
+    (version, src int, dst int, ip proto number, sport, dport) read straight from the frame
+    bytes, or None for non-IP or truncated frames. Ports are None for protocols without them
+    and for non-first fragments.
+    """
+    try:
+        if linktype == LINKTYPE_ETHERNET:
+            etype = (data[12] << 8) | data[13]
+            off = 14
+            while etype in _VLAN_TYPES:
+                etype = (data[off + 2] << 8) | data[off + 3]
+                off += 4
+        elif linktype == LINKTYPE_LINUX_SLL:
+            etype, off = (data[14] << 8) | data[15], 16
+        elif linktype == LINKTYPE_LINUX_SLL2:
+            etype, off = (data[0] << 8) | data[1], 20
+        elif linktype in _RAW_ALIASES:
+            etype, off = (0x0800 if data[0] >> 4 == 4 else 0x86DD), 0
+        elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+            family = data[0] | data[3]  # host byte order, either end
+            etype, off = (0x0800 if family == 2 else 0x86DD if family in (10, 24, 28, 30) else 0), 4
+        else:
+            return None
+        if etype == 0x0800:
+            ihl = (data[off] & 0x0F) * 4
+            proto = data[off + 9]
+            src = int.from_bytes(data[off + 12:off + 16], "big")
+            dst = int.from_bytes(data[off + 16:off + 20], "big")
+            first_fragment = not ((data[off + 6] & 0x1F) | data[off + 7])
+            version, l4 = 4, off + ihl
+        elif etype == 0x86DD:
+            proto = data[off + 6]
+            src = int.from_bytes(data[off + 8:off + 24], "big")
+            dst = int.from_bytes(data[off + 24:off + 40], "big")
+            version, l4, first_fragment = 6, off + 40, True
+            while proto in _IPV6_EXT or proto == 44:
+                if proto == 44:
+                    first_fragment = not (((data[l4 + 2] << 8) | data[l4 + 3]) & 0xFFF8)
+                    proto, l4 = data[l4], l4 + 8
+                elif proto == 51:
+                    proto, l4 = data[l4], l4 + (data[l4 + 1] + 2) * 4
+                else:
+                    proto, l4 = data[l4], l4 + (data[l4 + 1] + 1) * 8
+        else:
+            return None
+    except IndexError:
+        return None
+    sport = dport = None
+    if proto in _PORT_PROTOS and first_fragment and len(data) >= l4 + 4:
+        sport = (data[l4] << 8) | data[l4 + 1]
+        dport = (data[l4 + 2] << 8) | data[l4 + 3]
+    return version, src, dst, proto, sport, dport
@@ -0,0 +1,280 @@
+from bisect import bisect_right
+from socket import inet_aton
+
+from .subnetting import int_to_addr, parse_cidr_int
+
+try:
+    import numpy as np  # type: ignore
+    HAVE_NUMPY = True
+except Exception:
+    HAVE_NUMPY = False
+
+_BITS = {4: 32, 6: 128}
+
+class _Node:
+    __slots__ = ("key", "plen", "entry", "child")
+
+    def __init__(self, key: int, plen: int, entry: int = -1):
+        self.key = key        # network address, host bits zero
+        self.plen = plen
+        self.entry = entry    # index into PrefixTrie.entries, -1 for pure branch nodes
+        self.child = [None, None]
+
+def _parse_addr(addr) -> tuple[int, int]:
+    """(version, int) for an address string or (IPv4) int."""
+    if isinstance(addr, int):
+        return 4, addr
+    if addr.count(".") == 3 and ":" not in addr:
+        try:
+            return 4, int.from_bytes(inet_aton(addr), "big")
+        except OSError:
+            pass
+    version, value, _ = parse_cidr_int(addr)
+    return version, value
+
+class PrefixTrie:
+    """
+    Patricia (path-compressed binary) trie of IPv4 and IPv6 prefixes, one per family.
+    Exact, longest-prefix-match, covering and covered queries walk at most one node per
+    prefix bit. Batch lookups go through a flattened table of disjoint address ranges
+    (built lazily, NumPy searchsorted for IPv4 arrays, bisect otherwise).
+    Each stored prefix has an entry index; entries[i] is its (cidr, value).
+    """
+
+    def __init__(self):
+        self._roots: dict[int, _Node | None] = {4: None, 6: None}
+        self.entries: list[tuple[str, object]] = []
+        self._tables: dict[int, tuple] = {}   # flattened lookup tables, dropped on insert
+        self._arrays: dict[int, tuple] = {}
+
+    @classmethod
+    def from_prefixes(cls, cidrs, values=None) -> "PrefixTrie":
+        """Load CIDR strings (e.g. summarise() output); the value defaults to the prefix itself."""
+        trie = cls()
+        if values is None:
+            for c in cidrs:
+                trie.insert(c)
+        else:
+            for c, v in zip(cidrs, values):
+                trie.insert(c, v)
+        return trie
+
+    @classmethod
+    def from_plan(cls, plan) -> "PrefixTrie":
+        """Load the blocks of an allocate_vlsm()/plan_pools() result or a VlsmPlan, keyed to their names."""
+        if not isinstance(plan, dict):
+            plan = plan.result()
+        trie = cls()
+        for b in plan["blocks"]:
+            trie.insert(b["cidr"], b["name"])
+        return trie
+
+    @classmethod
+    def from_rules(cls, rules, field: str = "dst") -> "PrefixTrie":
+        """
+        Index firewall Rule objects by their src or dst prefix; values are lists of rule indices in order.
+        An "address wildcard" with a non-contiguous mask is indexed under its leading prefix (the
+        mask's leading one bits), which covers every address it matches but not only those: rules
+        found through such a prefix still need their own match check.
+        """
+        from .firewall import compile_network
+        trie = cls()
+        for idx, r in enumerate(rules):
+            cidr = getattr(r, field)
+            if " " in cidr.strip():
+                version, net, mask = compile_network(cidr)
+                bits = _BITS[version]
+                plen = bits - (((1 << bits) - 1) ^ mask).bit_length()
+                cidr = f"{int_to_addr(net >> (bits - plen) << (bits - plen), version)}/{plen}"
+            hit = trie.get(cidr)
+            if hit is None:
+                trie.insert(cidr, [idx])
+            else:
+                hit.append(idx)
+        return trie
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, cidr: str) -> bool:
+        return self._find(cidr) is not None
+
+    def __iter__(self):
+        """(cidr, value) pairs in address order, IPv4 first, shorter prefixes before their subnets."""
+        for version in (4, 6):
+            for node in self._walk(self._roots[version]):
+                yield self.entries[node.entry]
+
+    def _walk(self, node):
+        stack = [node] if node else []
+        while stack:
+            node = stack.pop()
+            if node.entry >= 0:
+                yield node
+            stack.extend(c for c in node.child[::-1] if c is not None)
+
+    @staticmethod
+    def _key(cidr: str) -> tuple[int, int, int, int]:
+        version, value, plen = parse_cidr_int(cidr)
+        bits = _BITS[version]
+        return version, bits, value >> (bits - plen) << (bits - plen), plen
+
+    def insert(self, cidr: str, value=None):
+        """Add a prefix (host bits are ignored) or replace its value. value defaults to the prefix."""
+        version, bits, key, plen = self._key(cidr)
+        text = f"{int_to_addr(key, version)}/{plen}"
+        value = text if value is None else value
+        self._tables.pop(version, None)
+        self._arrays.pop(version, None)
+        parent, side = None, 0
+        node = self._roots[version]
+        while node is not None:
+            diff = key ^ node.key
+            common = min(bits - diff.bit_length() if diff else bits, plen, node.plen)
+            if common < node.plen:
+                # the new prefix branches off (or sits) above this node
+                if common == plen:
+                    mid = _Node(key, plen, len(self.entries))
+                    self.entries.append((text, value))
+                else:
+                    mid = _Node(key >> (bits - common) << (bits - common), common)
+                    leaf = _Node(key, plen, len(self.entries))
+                    self.entries.append((text, value))
+                    mid.child[(key >> (bits - 1 - common)) & 1] = leaf
+                mid.child[(node.key >> (bits - 1 - common)) & 1] = node
+                self._link(version, parent, side, mid)
+                return
+            if node.plen == plen:
+                if node.entry < 0:
+                    node.entry = len(self.entries)
+                    self.entries.append((text, value))
+                else:
+                    self.entries[node.entry] = (text, value)
+                return
+            parent, side = node, (key >> (bits - 1 - node.plen)) & 1
+            node = node.child[side]
+        self._link(version, parent, side, _Node(key, plen, len(self.entries)))
+        self.entries.append((text, value))
+
+    def _link(self, version: int, parent, side: int, node: _Node):
+        if parent is None:
+            self._roots[version] = node
+        else:
+            parent.child[side] = node
+
+    def _find(self, cidr: str):
+        version, bits, key, plen = self._key(cidr)
+        node = self._roots[version]
+        while node is not None and node.plen <= plen:
+            if (key ^ node.key) >> (bits - node.plen):
+                return None
+            if node.plen == plen:
+                return node if node.entry >= 0 else None
+            node = node.child[(key >> (bits - 1 - node.plen)) & 1]
+        return None
+
+    def get(self, cidr: str, default=None):
+        """Value stored for exactly this prefix."""
+        node = self._find(cidr)
+        return default if node is None else self.entries[node.entry][1]
+
+    def covering(self, cidr: str) -> list[tuple[str, object]]:
+        """Stored prefixes containing cidr (an address counts as a host prefix), least specific first."""
+        version, bits, key, plen = self._key(cidr)
+        out = []
+        node = self._roots[version]
+        while node is not None and node.plen <= plen:
+            if (key ^ node.key) >> (bits - node.plen):
+                break
+            if node.entry >= 0:
+                out.append(self.entries[node.entry])
+            if node.plen == bits:
+                break
+            node = node.child[(key >> (bits - 1 - node.plen)) & 1]
+        return out
+
+    def lookup(self, addr: str) -> tuple[str, object] | None:
+        """Longest-prefix match for an address (or prefix): (cidr, value) or None."""
+        hits = self.covering(addr)
+        return hits[-1] if hits else None
+
+    def covered(self, cidr: str) -> list[tuple[str, object]]:
+        """Stored prefixes inside cidr (including cidr itself), in address order."""
+        version, bits, key, plen = self._key(cidr)
+        node = self._roots[version]
+        while node is not None and node.plen < plen:
+            if (key ^ node.key) >> (bits - node.plen):
+                return []
+            node = node.child[(key >> (bits - 1 - node.plen)) & 1]
+        if node is None or (key ^ node.key) >> (bits - plen):
+            return []
+        return [self.entries[n.entry] for n in self._walk(node)]
+
+    def _table(self, version: int) -> tuple:
+        """Disjoint ranges as (sorted starts, entry index owning each range or -1)."""
+        table = self._tables.get(version)
+        if table is not None:
+            return table
+        bits = _BITS[version]
+        starts, owners = [0], [-1]
+
+        def emit(start: int, owner: int):
+            if starts[-1] == start:
+                owners[-1] = owner
+                if len(owners) > 1 and owners[-2] == owner:
+                    starts.pop()
+                    owners.pop()
+            elif owners[-1] != owner:
+                starts.append(start)
+                owners.append(owner)
+
+        # pre-order visits each prefix before its subnets; the stack holds the enclosing prefixes
+        stack: list[tuple[int, int]] = []
+        for node in self._walk(self._roots[version]):
+            while stack and stack[-1][0] < node.key:
+                end = stack.pop()[0]
+                emit(end + 1, stack[-1][1] if stack else -1)
+            emit(node.key, node.entry)
+            stack.append((node.key | ((1 << (bits - node.plen)) - 1), node.entry))
+        while stack:
+            end = stack.pop()[0]
+            if end + 1 < 1 << bits:
+                emit(end + 1, stack[-1][1] if stack else -1)
+        table = self._tables[version] = (starts, owners)
+        return table
+
+    def lookup_indices(self, addrs, version: int = 4):
+        """
+        Longest-prefix match for many addresses of one family, as entry indices (-1 = no match).
+        An integer NumPy array of IPv4 addresses is matched in one vectorised searchsorted and
+        returns an array; any other iterable (address strings or ints) returns a list.
+        """
+        starts, owners = self._table(version)
+        if HAVE_NUMPY and isinstance(addrs, np.ndarray) and version == 4:
+            arrays = self._arrays.get(version)
+            if arrays is None:
+                arrays = self._arrays[version] = (np.array(starts, dtype=np.uint32),
+                                                  np.array(owners, dtype=np.int64))
+            pos = np.searchsorted(arrays[0], addrs.astype(np.uint32, copy=False), side="right") - 1
+            return arrays[1][pos]
+        out = []
+        for a in addrs:
+            if not isinstance(a, int):
+                v, a = _parse_addr(a)
+                if v != version:
+                    out.append(-1)
+                    continue
+            out.append(owners[bisect_right(starts, a) - 1])
+        return out
+
+    def lookup_many(self, addrs) -> list[tuple[str, object] | None]:
+        """lookup() for many address strings (families may be mixed)."""
+        entries = self.entries
+        tables = {v: self._table(v) for v in (4, 6)}
+        out = []
+        for a in addrs:
+            version, value = _parse_addr(a)
+            starts, owners = tables[version]
+            idx = owners[bisect_right(starts, value) - 1]
+            out.append(entries[idx] if idx >= 0 else None)
+        return out
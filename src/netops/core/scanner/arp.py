@@ -1,25 +1,86 @@
-from ipaddress import ip_network
+import time
+from ipaddress import ip_address, ip_network
+
+from ...utils.threads import throttle
+from .icmp import count_targets
 try:
-    from scapy.all import ARP, Ether, srp, conf  # type: ignore
+    from scapy.all import ARP, AsyncSniffer, Ether, sendp, conf  # type: ignore
     HAVE_SCAPY = True
 except Exception:
     HAVE_SCAPY = False
 
-def arp_scan(cidr: str, timeout: float = 2.0) -> dict:
+_BATCH_PREFIX = 20  # unpaced scans sendp() one /20 (4096 requests) at a time and check cancel in between
+
+def _sniff_arp(net, timeout: float, limiter, progress, cancel) -> tuple[list[dict], bool]:
+    # srp() waits out its timeout after every call and can't be interrupted; here the requests
+    # go out while one sniffer collects the replies, and the timeout is waited once at the end
+    found = {}
+
+    def on_reply(p):
+        if p[ARP].op == 2 and ip_address(p[ARP].psrc) in net:
+            found.setdefault(p[ARP].psrc, p[ARP].hwsrc)
+
+    def cancelled():
+        return cancel is not None and cancel.is_cancelled()
+
+    sniffer = AsyncSniffer(store=False, prn=on_reply, lfilter=lambda p: ARP in p)  # type: ignore
+    sniffer.start()
+    try:
+        if limiter is not None:
+            _send_paced(net, limiter, progress, cancelled)
+        else:
+            _send_batches(net, progress, cancelled)
+        deadline = time.monotonic() + timeout
+        while not cancelled() and time.monotonic() < deadline:
+            time.sleep(0.1)
+    finally:
+        sniffer.stop()
+    return [{"ip": ip, "mac": mac} for ip, mac in found.items()], cancelled()
+
+def _send_paced(net, limiter, progress, cancelled):
+    # every request on its own, waiting for its token, on one layer-2 socket
+    total = count_targets([str(net)])
+    sock = conf.L2socket()  # type: ignore
+    try:
+        for done, ip in enumerate(map(str, net.hosts()), 1):
+            if cancelled():
+                return
+            limiter.acquire(ip)
+            sock.send(Ether(dst="ff:ff:ff:ff:ff:ff")/ARP(pdst=ip))  # type: ignore
+            if progress is not None:
+                progress(done, total)
+    finally:
+        sock.close()
+
+def _send_batches(net, progress, cancelled):
+    sent = 0
+    batches = net.subnets(new_prefix=_BATCH_PREFIX) if net.version == 4 and net.prefixlen < _BATCH_PREFIX else [net]
+    for batch in batches:
+        if cancelled():
+            return
+        sendp(Ether(dst="ff:ff:ff:ff:ff:ff")/ARP(pdst=str(batch)))  # type: ignore
+        sent += batch.num_addresses
+        if progress is not None:
+            progress(sent, net.num_addresses)
+
+def arp_scan(cidr: str, timeout: float = 2.0, limiter=None, progress=None, cancel=None) -> dict:
     """
-    Returns {"ok": bool, "error": str|None, "hosts": [{"ip": "...", "mac": "..."}]}
+    Returns {"ok": bool, "error": str|None, "cancelled": bool, "hosts": [{"ip": "...", "mac": "..."}]}
+    With a limiter (a netops.utils.ratelimit.RateLimiter) that has a rate set, requests are
+    sent one by one at its pace; otherwise sendp() sends them in batches of up to a /20. Either
+    way a sniffer collects the replies until `timeout` after the last request, and a cancel
+    takes effect within 0.1 s (between batches while sending). progress(sent, total) is called
+    at most every 0.2 s; a cancelled scan returns the hosts found so far.
     """
     if not HAVE_SCAPY:
-        return {"ok": False, "error": "Scapy not installed. pip install scapy; requires Npcap on Windows.", "hosts": []}
+        return {"ok": False, "error": "Scapy not installed. pip install scapy; requires Npcap on Windows.", "cancelled": False, "hosts": []}
     try:
         # Validate
-        ip_network(cidr, strict=False)
+        net = ip_network(cidr, strict=False)
         conf.verb = 0
-        pkt = Ether(dst="ff:ff:ff:ff:ff:ff")/ARP(pdst=cidr)  # type: ignore
-        ans, _ = srp(pkt, timeout=timeout)  # type: ignore
-        hosts = []
-        for snd, rcv in ans:
-            hosts.append({"ip": rcv.psrc, "mac": rcv.hwsrc})
-        return {"ok": True, "error": None, "hosts": hosts}
+        progress = throttle(progress)
+        paced = limiter is not None and (limiter.rate or limiter.subnet_rate)
+        hosts, cancelled = _sniff_arp(net, timeout, limiter if paced else None, progress, cancel)
+        return {"ok": True, "error": None, "cancelled": cancelled, "hosts": hosts}
     except Exception as e:
-        return {"ok": False, "error": str(e), "hosts": []}
+        return {"ok": False, "error": str(e), "cancelled": False, "hosts": []}
@@ -1,8 +1,27 @@
 import platform
 import subprocess
 import ipaddress
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import re
+import asyncio
+import collections
+import ctypes
+import os
+import queue
+import socket
+import struct
+import sys
+import threading
+from time import perf_counter_ns
+
+from ...utils.threads import throttle
+
+ECHO_REQUEST = {4: 8, 6: 128}
+ECHO_REPLY = {4: 0, 6: 129}
+_MAX_IN_FLIGHT = 60000  # sequence numbers are 16 bits and must stay unique among pending probes
+_RCVBUF = 4 << 20
+_SO_ATTACH_FILTER = 26  # Linux
+_TICK = 0.1  # how often a waiting sweep looks at its cancel token
 
 def _ping_once(host: str, timeout: float = 1.0) -> dict:
     system = platform.system().lower()
@@ -24,27 +43,465 @@ def _ping_once(host: str, timeout: float = 1.0) -> dict:
     except Exception:
         return {"host": host, "up": False, "rtt_ms": None}
 
-def expand_targets(targets: list[str]) -> list[str]:
-    ips = []
+def checksum(data: bytes) -> int:
+    """RFC 1071 Internet checksum."""
+    if len(data) % 2:
+        data += b"\0"
+    s = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    s = (s >> 16) + (s & 0xFFFF)
+    s += s >> 16
+    return ~s & 0xFFFF
+
+def echo_request(version: int, ident: int, seq: int, payload: bytes = b"") -> bytes:
+    """ICMP / ICMPv6 echo request. The ICMPv6 checksum covers a pseudo-header, so the kernel fills it in."""
+    header = struct.pack("!BBHHH", ECHO_REQUEST[version], 0, 0, ident, seq)
+    if version == 6:
+        return header + payload
+    return struct.pack("!BBHHH", ECHO_REQUEST[version], 0, checksum(header + payload), ident, seq) + payload
+
+def open_icmp_socket(version: int = 4) -> tuple[socket.socket, bool]:
+    """
+    Non-blocking ICMP socket, returned with a flag telling whether it is raw.
+    The unprivileged datagram kind (Linux ping_group_range, macOS) is tried first and a raw
+    socket second; OSError/PermissionError propagates when neither is allowed.
+    """
+    family, proto = (socket.AF_INET, socket.IPPROTO_ICMP) if version == 4 else (socket.AF_INET6, socket.IPPROTO_ICMPV6)
+    try:
+        sock, raw = socket.socket(family, socket.SOCK_DGRAM, proto), False
+    except OSError:
+        sock, raw = socket.socket(family, socket.SOCK_RAW, proto), True
+    sock.setblocking(False)
+    try:  # a sweep can have thousands of replies queued between two reads
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _RCVBUF)
+    except OSError:
+        pass
+    return sock, raw
+
+def _attach_ident_filter(sock: socket.socket, version: int, ident: int):
+    """
+    Every raw ICMP socket gets a copy of every ICMP packet the host receives. A classic BPF
+    program keeps only echo packets carrying our identifier, so that concurrent sweeps (shards
+    in other processes) don't each parse all the others' replies. Best effort: Linux only.
+    """
+    if not sys.platform.startswith("linux"):
+        return
+    load_ident = [(0xB1, 0, 0, 0), (0x48, 0, 0, 4)] if version == 4 else [(0x28, 0, 0, 4)]  # ldxb 4*([0]&0xf); ldh [x+4] / ldh [4]
+    insns = load_ident + [(0x15, 0, 1, ident), (0x06, 0, 0, 0xFFFFFFFF), (0x06, 0, 0, 0)]   # jeq ident; ret all; ret 0
+    prog = ctypes.create_string_buffer(b"".join(struct.pack("HBBI", *i) for i in insns))
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, _SO_ATTACH_FILTER,
+                        struct.pack("HL", len(insns), ctypes.addressof(prog)))
+    except OSError:
+        pass
+
+def native_available(version: int = 4) -> bool:
+    try:
+        open_icmp_socket(version)[0].close()
+        return True
+    except OSError:
+        return False
+
+class NativePinger:
+    """
+    Sends ICMP echo requests for many hosts over one socket per address family and matches
+    the replies by identifier and sequence number on an asyncio event loop.
+
+    With a datagram socket the kernel rewrites the identifier and hands each socket only its
+    own replies, so the identifier is checked for raw sockets only. Every probe also carries a
+    random token in its payload, which keeps replies to other ping processes out. RTTs come from
+    perf_counter_ns taken when the request leaves and when the reply is read. An optional
+    RateLimiter paces the requests.
+    """
+
+    def __init__(self, timeout: float = 1.0, max_in_flight: int = 1024, limiter=None):
+        self.timeout_ns = int(timeout * 1e9)
+        self.max_in_flight = max(1, min(max_in_flight, _MAX_IN_FLIGHT))
+        self.limiter = limiter
+        self.ident = int.from_bytes(os.urandom(2), "big")
+        self.token = os.urandom(8)
+        self._socks: dict[int, tuple[socket.socket, bool]] = {}
+        self._pending: dict[tuple[int, int], tuple[str, str, int, int]] = {}  # (version, seq) -> (host, addr, t0, index)
+        self._deadlines: collections.deque = collections.deque()  # (deadline, version, seq, t0), in send order
+        self._seq = 0
+
+    def _socket(self, version: int) -> tuple[socket.socket, bool]:
+        if version not in self._socks:
+            sock, raw = open_icmp_socket(version)
+            if raw:
+                _attach_ident_filter(sock, version, self.ident)
+            self._socks[version] = (sock, raw)
+            self._loop.add_reader(sock.fileno(), self._on_readable, version)
+        return self._socks[version]
+
+    def open(self, versions=(4,)):
+        """Opens the sockets up front so permission problems surface before any probe is sent."""
+        self._loop = asyncio.get_running_loop()
+        for v in versions:
+            self._socket(v)
+
+    def close(self):
+        for sock, _ in self._socks.values():
+            self._loop.remove_reader(sock.fileno())
+            sock.close()
+        self._socks.clear()
+
+    def release(self):
+        """Frees one in-flight slot; called by the consumer when probe() runs with auto_release=False."""
+        self._slots.release()
+
+    def _finish(self, index: int, host: str, up: bool, rtt_ms: float | None):
+        if self._auto_release:
+            self._slots.release()
+        self._emit(index, {"host": host, "up": up, "rtt_ms": rtt_ms})
+        if self._sending_done and not self._pending:
+            self._idle.set()
+
+    def _on_readable(self, version: int):
+        sock, raw = self._socks[version]
+        reply_type = ECHO_REPLY[version]
+        while True:
+            try:
+                data, addr = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            now = perf_counter_ns()
+            if version == 4 and data and data[0] >> 4 == 4:  # raw IPv4 (and macOS datagram) sockets include the IP header
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 16 or data[0] != reply_type or data[8:16] != self.token:
+                continue
+            ident, seq = struct.unpack_from("!HH", data, 4)
+            if raw and ident != self.ident:
+                continue
+            probe = self._pending.get((version, seq))
+            if probe is None or probe[1] != addr[0]:
+                continue
+            del self._pending[(version, seq)]
+            self._finish(probe[3], probe[0], True, (now - probe[2]) / 1e6)
+
+    async def _expire(self):
+        deadlines, pending = self._deadlines, self._pending
+        while True:
+            now = perf_counter_ns()
+            while deadlines and deadlines[0][0] <= now:
+                _, version, seq, t0 = deadlines.popleft()
+                probe = pending.get((version, seq))
+                if probe is not None and probe[2] == t0:
+                    del pending[(version, seq)]
+                    self._finish(probe[3], probe[0], False, None)
+            wait = (deadlines[0][0] - now) / 1e9 if deadlines else self.timeout_ns / 1e9
+            await asyncio.sleep(max(wait, 0.001))
+
+    async def _send(self, sock: socket.socket, packet: bytes, addr: tuple):
+        while True:
+            try:
+                sock.sendto(packet, addr)
+                return
+            except (BlockingIOError, InterruptedError):
+                writable = self._loop.create_future()
+                self._loop.add_writer(sock.fileno(), lambda: writable.done() or writable.set_result(None))
+                try:
+                    await writable
+                finally:
+                    self._loop.remove_writer(sock.fileno())
+
+    async def _resolve(self, host: str) -> tuple[int, str] | None:
+        try:
+            ip = ipaddress.ip_address(host)
+        except ValueError:
+            try:
+                infos = await self._loop.getaddrinfo(host, None, type=socket.SOCK_RAW)
+                ip = ipaddress.ip_address(infos[0][4][0].split("%")[0])
+            except (OSError, ValueError, IndexError):
+                return None
+        return ip.version, str(ip)
+
+    async def probe(self, hosts, emit, auto_release: bool = True):
+        """
+        Pings every host in the iterable, calling emit(index, result) as each one answers or
+        times out. At most max_in_flight probes are outstanding; with auto_release=False a slot
+        stays taken after its result is emitted until release() is called, which lets a slow
+        consumer hold the sender back.
+        """
+        if not hasattr(self, "_loop"):
+            self.open()
+        self._emit = emit
+        self._auto_release = auto_release
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._idle = asyncio.Event()
+        self._sending_done = False
+        expirer = asyncio.ensure_future(self._expire())
+        try:
+            for index, host in enumerate(hosts):
+                if not index & 15:  # nothing below suspends while slots are free; let replies be read and timed
+                    await asyncio.sleep(0)
+                await self._slots.acquire()
+                target = await self._resolve(host)
+                if target is None:
+                    self._finish(index, host, False, None)
+                    continue
+                version, addr = target
+                try:
+                    sock, _ = self._socket(version)
+                except OSError:
+                    self._finish(index, host, False, None)
+                    continue
+                if self.limiter is not None:
+                    await self.limiter.acquire_async(addr)
+                seq = self._seq = (self._seq + 1) & 0xFFFF
+                packet = echo_request(version, self.ident, seq, self.token)
+                t0 = perf_counter_ns()
+                self._pending[(version, seq)] = (host, addr, t0, index)
+                self._deadlines.append((t0 + self.timeout_ns, version, seq, t0))
+                try:
+                    await self._send(sock, packet, (addr, 0))
+                except OSError:  # unreachable network, no route, ...
+                    if self._pending.pop((version, seq), None) is not None:
+                        self._finish(index, host, False, None)
+            self._sending_done = True
+            if self._pending:
+                await self._idle.wait()
+        finally:
+            expirer.cancel()
+
+class _NativeStream:
+    """
+    Runs a NativePinger on a private event loop in a helper thread (so replies keep being read
+    and timed while the consumer is busy) and hands (index, result) pairs over a queue. A slot is
+    only given back when the consumer calls release(), so in-flight probes plus queued and
+    buffered results never exceed the window.
+    """
+
+    _DONE = object()
+
+    def __init__(self, hosts, timeout: float, window: int, limiter=None):
+        self._results: queue.SimpleQueue = queue.SimpleQueue()
+        self._pinger = NativePinger(timeout, window, limiter)
+        self._loop = asyncio.SelectorEventLoop()  # add_reader is not available on the Windows proactor loop
+        self._task = None
+        self._thread = threading.Thread(target=self._run, args=(hosts,), daemon=True)
+        self._thread.start()
+        started = self._results.get()
+        if started is not None:  # the sockets could not be opened
+            self._thread.join()
+            raise started
+
+    def _run(self, hosts):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main(hosts))
+        finally:
+            self._loop.close()
+
+    async def _main(self, hosts):
+        try:
+            self._pinger.open()
+        except OSError as e:
+            self._results.put(e)
+            return
+        self._results.put(None)
+        self._task = asyncio.current_task()
+        try:
+            await self._pinger.probe(hosts, lambda i, r: self._results.put((i, r)), auto_release=False)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:  # e.g. a malformed target from the host iterator
+            self._results.put(e)
+        finally:
+            self._pinger.close()
+            self._results.put(self._DONE)
+
+    def __iter__(self):
+        # yields None when nothing arrived for _TICK seconds, so the consumer can check for cancellation
+        while True:
+            try:
+                item = self._results.get(timeout=_TICK)
+            except queue.Empty:
+                yield None
+                continue
+            if item is self._DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def release(self):
+        try:
+            self._loop.call_soon_threadsafe(self._pinger.release)
+        except RuntimeError:  # loop already closed
+            pass
+
+    def close(self):
+        if self._thread.is_alive():
+            try:
+                self._loop.call_soon_threadsafe(lambda: self._task and self._task.cancel())
+            except RuntimeError:
+                pass
+            self._thread.join()
+
+class _SubprocessStream:
+    """The same (index, result) stream from _ping_once calls on a thread pool."""
+
+    def __init__(self, hosts, timeout: float, window: int, max_workers: int, limiter=None):
+        self._hosts = enumerate(hosts)
+        self._timeout = timeout
+        self._limiter = limiter
+        self._credits = max(1, window)
+        self._max_workers = max_workers
+        self._ex = None
+
+    def __iter__(self):
+        running = {}
+        self._ex = ThreadPoolExecutor(max_workers=self._max_workers)
+        try:
+            while True:
+                while self._credits > 0:
+                    item = next(self._hosts, None)
+                    if item is None:
+                        break
+                    running[self._ex.submit(self._ping, item[1])] = item[0]
+                    self._credits -= 1
+                if not running:
+                    return
+                done, _ = wait(running, timeout=_TICK, return_when=FIRST_COMPLETED)
+                if not done:
+                    yield None
+                for f in done:
+                    yield running.pop(f), f.result()
+        finally:
+            self.close()
+
+    def _ping(self, host: str) -> dict:
+        if self._limiter is not None:
+            self._limiter.acquire(host)
+        return _ping_once(host, self._timeout)
+
+    def release(self):
+        self._credits += 1
+
+    def close(self):
+        # queued pings are dropped; the ones already running end within their timeout
+        if self._ex is not None:
+            self._ex.shutdown(wait=False, cancel_futures=True)
+
+def _host_range(net) -> tuple[int, int]:
+    """First and last integer of net.hosts() without building it."""
+    first, last = int(net.network_address), int(net.broadcast_address)
+    if net.max_prefixlen - net.prefixlen < 2:  # /31, /32, /127, /128: every address is a host
+        return first, last
+    return (first + 1, last - 1) if net.version == 4 else (first + 1, last)
+
+def iter_targets(targets: list[str]):
+    """Lazily yields the host strings of expand_targets, walking each CIDR as a range of integers."""
     for t in targets:
         t = t.strip()
         if not t:
             continue
         if "/" in t:
             net = ipaddress.ip_network(t, strict=False)
-            for ip in net.hosts():
-                ips.append(str(ip))
+            first, last = _host_range(net)
+            if net.version == 4:
+                ntoa, pack = socket.inet_ntoa, struct.Struct("!I").pack
+                for i in range(first, last + 1):
+                    yield ntoa(pack(i))
+            else:
+                for i in range(first, last + 1):
+                    yield str(ipaddress.IPv6Address(i))
         else:
-            ips.append(t)
-    return ips
-
-def ping_sweep(targets: list[str], timeout: float = 1.0, max_workers: int = 64):
-    ips = expand_targets(targets)
-    results = []
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futs = [ex.submit(_ping_once, ip, timeout) for ip in ips]
-        for f in as_completed(futs):
-            results.append(f.result())
+            yield t
+
+def count_targets(targets: list[str]) -> int:
+    n = 0
+    for t in targets:
+        t = t.strip()
+        if not t:
+            continue
+        if "/" in t:
+            first, last = _host_range(ipaddress.ip_network(t, strict=False))
+            n += last - first + 1
+        else:
+            n += 1
+    return n
+
+def expand_targets(targets: list[str]) -> list[str]:
+    return list(iter_targets(targets))
+
+def iter_ping_sweep(targets: list[str], timeout: float = 1.0, max_in_flight: int = 1024, ordered: bool = False,
+                    native: bool | None = None, max_workers: int = 64, limiter=None, progress=None, cancel=None):
+    """
+    Generator over ping results ({"host","up","rtt_ms"}), yielded as probes complete.
+    Targets are expanded lazily and at most max_in_flight probes (plus results waiting to be
+    consumed) are outstanding, so memory stays flat whatever the size of the sweep. With
+    ordered=True results come out in target order, held back in a reorder buffer that the same
+    window bounds. The native asyncio engine is used when ICMP sockets can be opened
+    (native=None) and the per-host ping subprocess otherwise; native=False forces the
+    subprocess path and native=True raises OSError instead of falling back. Every probe draws
+    from limiter (a netops.utils.ratelimit.RateLimiter) when one is given.
+    progress(done, total) is called at most every 0.2 s. Once the CancelToken is set the
+    generator stops within 0.1 s, closing its socket or thread pool; pings already handed to a
+    subprocess finish within their timeout.
+    """
+    total = count_targets(targets) if progress is not None else 0
+    return sweep_hosts(iter_targets(targets), timeout, max_in_flight, ordered, native, max_workers, limiter,
+                       progress, cancel, total)
+
+def sweep_hosts(hosts, timeout: float = 1.0, max_in_flight: int = 1024, ordered: bool = False,
+                native: bool | None = None, max_workers: int = 64, limiter=None, progress=None, cancel=None,
+                total: int = 0):
+    """iter_ping_sweep over an iterable of host strings rather than target expressions."""
+    it = _sweep_indexed(hosts, timeout, max_in_flight, ordered, native, max_workers, limiter, progress, cancel, total)
+    try:
+        for _, r in it:
+            yield r
+    finally:
+        it.close()
+
+def _sweep_indexed(hosts, timeout: float, max_in_flight: int, ordered: bool, native: bool | None,
+                   max_workers: int, limiter, progress=None, cancel=None, total: int = 0):
+    # sweep_hosts yielding (position in hosts, result)
+    progress = throttle(progress)
+    stream = None
+    if native is not False:
+        try:
+            stream = _NativeStream(hosts, timeout, max_in_flight, limiter)
+        except OSError:
+            if native:
+                raise
+    if stream is None:
+        stream = _SubprocessStream(hosts, timeout, max_in_flight, max_workers, limiter)
+    done = 0
+    try:
+        held, nxt = {}, 0
+        for item in stream:
+            if cancel is not None and cancel.is_cancelled():
+                return
+            if item is None:
+                continue
+            if not ordered:
+                yield item
+                stream.release()
+                done += 1
+            else:
+                held[item[0]] = item[1]
+                while nxt in held:
+                    yield nxt, held.pop(nxt)
+                    nxt += 1
+                    stream.release()
+                done = nxt
+            if progress is not None:
+                progress(done, max(total, done))
+    finally:
+        stream.close()
+
+def ping_sweep(targets: list[str], timeout: float = 1.0, max_workers: int = 64,
+               native: bool | None = None, max_in_flight: int = 1024, limiter=None, progress=None, cancel=None):
+    """
+    Pings every target and returns the results sorted by IP; engines, progress and cancel as
+    in iter_ping_sweep. A cancelled sweep returns the results gathered so far.
+    """
+    results = list(iter_ping_sweep(targets, timeout, max_in_flight, native=native, max_workers=max_workers,
+                                   limiter=limiter, progress=progress, cancel=cancel))
     # Sort by IP
     def ip_key(r):
         try:
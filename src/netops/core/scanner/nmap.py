@@ -1,8 +1,64 @@
-import shutil, subprocess, xml.etree.ElementTree as ET
+import re, shutil, subprocess, threading, time, xml.etree.ElementTree as ET
+
+from ...utils.threads import throttle
+
+# with --stats-every, nmap interleaves these elements with its XML output
+_TASK_PROGRESS = re.compile(r'<taskprogress task="([^"]*)"[^>]*percent="([\d.]+)"')
 
 def has_nmap() -> bool:
     return shutil.which("nmap") is not None
 
+def _run(args: list[str], timeout: float, progress, cancel, phases: int = 1) -> tuple[int, str, str, bool]:
+    """
+    Runs nmap, killing it when cancel is set. Its task reports feed progress(percent, 100):
+    each task's percent restarts at 0, so tasks are placed, in the order they first appear,
+    as shares of the expected number of phases, and the overall value never goes down.
+    """
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    out, err = [], []
+    tasks: list[str] = []
+    best = 0.0
+
+    def pump(stream, sink, watch):
+        nonlocal best
+        for line in stream:
+            sink.append(line)
+            if watch:
+                m = _TASK_PROGRESS.search(line)
+                if m:
+                    task, pct = m.group(1), min(float(m.group(2)), 100.0)
+                    if task not in tasks:
+                        tasks.append(task)
+                    # later host groups repeat earlier tasks; those never move the gauge back
+                    overall = (tasks.index(task) + pct / 100) * 100 / max(phases, len(tasks))
+                    if overall > best:
+                        best = overall
+                        progress(best, 100)
+
+    readers = [threading.Thread(target=pump, args=(proc.stdout, out, progress is not None), daemon=True),
+               threading.Thread(target=pump, args=(proc.stderr, err, False), daemon=True)]
+    for t in readers:
+        t.start()
+    deadline = time.monotonic() + timeout
+    cancelled = False
+    try:
+        while True:
+            try:
+                proc.wait(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_cancelled():
+                    cancelled = True
+                    proc.kill()
+                elif time.monotonic() > deadline:
+                    proc.kill()
+                    proc.wait()
+                    raise subprocess.TimeoutExpired(args, timeout)
+    finally:
+        for t in readers:
+            t.join()
+    return proc.returncode, "".join(out), "".join(err), cancelled
+
 def run_nmap_xml(
     targets: list[str],
     scan_type: str = "syn",       # "syn", "connect", "udp"
@@ -12,12 +68,15 @@ def run_nmap_xml(
     top_ports: int | None = 200,
     ports: str | None = None,     # e.g., "22,80,443" or "1-1024"
     timing: str = "T3",           # T0..T5
+    max_rate: float | None = None, # --max-rate (packets per second)
+    progress=None,                # progress(percent, 100) over all nmap phases, never decreasing
+    cancel=None,                  # CancelToken; kills nmap when set
 ):
     """
     Build an nmap command and parse XML output.
     """
     if not has_nmap():
-        return {"ok": False, "error": "nmap not found in PATH.", "hosts": []}
+        return {"ok": False, "error": "nmap not found in PATH.", "cancelled": False, "hosts": []}
 
     args = ["nmap", "-oX", "-"]  # XML to stdout
 
@@ -40,21 +99,30 @@ def run_nmap_xml(
     if timing.upper() in ("T0","T1","T2","T3","T4","T5"):
         args.append("-" + timing.upper())
 
+    if max_rate:
+        args += ["--max-rate", f"{max_rate:g}"]
+
     # ports
     if ports:
         args += ["-p", ports]
     elif top_ports:
         args += ["--top-ports", str(top_ports)]
 
+    if progress is not None:
+        args += ["--stats-every", "1s"]
+
     args += targets
 
     try:
-        proc = subprocess.run(args, capture_output=True, text=True, timeout=1200)
-        if proc.returncode != 0:
-            return {"ok": False, "error": proc.stderr.strip() or "nmap error", "hosts": []}
-        return {"ok": True, "error": None, "hosts": parse_nmap_xml(proc.stdout), "cmd": " ".join(args)}
+        phases = (0 if no_ping else 1) + 1 + bool(service_version) + bool(os_detect)  # ping, ports, -sV, -O
+        returncode, stdout, stderr, cancelled = _run(args, 1200, throttle(progress), cancel, phases)
+        if cancelled:
+            return {"ok": False, "error": "Cancelled", "cancelled": True, "hosts": [], "cmd": " ".join(args)}
+        if returncode != 0:
+            return {"ok": False, "error": stderr.strip() or "nmap error", "cancelled": False, "hosts": [], "cmd": " ".join(args)}
+        return {"ok": True, "error": None, "cancelled": False, "hosts": parse_nmap_xml(stdout), "cmd": " ".join(args)}
     except Exception as e:
-        return {"ok": False, "error": str(e), "hosts": [], "cmd": " ".join(args)}
+        return {"ok": False, "error": str(e), "cancelled": False, "hosts": [], "cmd": " ".join(args)}
 
 def parse_nmap_xml(xml_text: str):
     hosts = []
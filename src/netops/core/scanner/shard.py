@@ -0,0 +1,261 @@
+import ipaddress
+import itertools
+import math
+import multiprocessing
+import os
+import socket
+import struct
+import time
+from multiprocessing.connection import wait
+
+from . import icmp
+from ...utils.ratelimit import RateLimiter
+from ...utils.threads import throttle
+
+# worker -> parent messages: a header, then for _DATA a run of records
+_HDR = struct.Struct("<IB")        # chunk id, kind
+_REC = struct.Struct("<If")        # offset in chunk, rtt ms (NaN: down, -1: up without an RTT)
+_DONE_BODY = struct.Struct("<IId")  # hosts, up, seconds busy
+_DATA, _DONE, _ERROR = 0, 1, 2
+_PACK_V4 = struct.Struct("!I").pack
+
+def _chunks(targets: list[str], chunk_size: int):
+    """
+    Splits the targets into jobs (chunk id, version, first, count) covering integer ranges of
+    at most chunk_size hosts, aligned to multiples of chunk_size (so with a chunk_size that is a
+    multiple of 256 no /24 straddles two chunks), with names and single addresses batched as
+    (id, 0, [hosts], n). Chunk ids follow target order.
+    """
+    cid, names = 0, []
+    for t in targets:
+        t = t.strip()
+        if not t:
+            continue
+        if "/" not in t:
+            names.append(t)
+            if len(names) >= chunk_size:
+                yield (cid, 0, names, len(names))
+                cid, names = cid + 1, []
+            continue
+        if names:
+            yield (cid, 0, names, len(names))
+            cid, names = cid + 1, []
+        net = ipaddress.ip_network(t, strict=False)
+        first, last = icmp._host_range(net)
+        lo = first
+        while lo <= last:
+            hi = min(last, (lo // chunk_size + 1) * chunk_size - 1)
+            yield (cid, net.version, lo, hi - lo + 1)
+            cid, lo = cid + 1, hi + 1
+    if names:
+        yield (cid, 0, names, len(names))
+
+def _hosts(version: int, first, count: int):
+    if version == 0:
+        return iter(first)
+    if version == 4:
+        return (socket.inet_ntoa(_PACK_V4(i)) for i in range(first, first + count))
+    return (str(ipaddress.IPv6Address(i)) for i in range(first, first + count))
+
+def _worker(conn, timeout: float, max_in_flight: int, ordered: bool, native, max_workers: int,
+            rate: float, subnet_rate: float, batch: int):
+    """Shard process: sweeps each chunk it is sent with its own event loop (or thread pool) and streams records back."""
+    limiter = RateLimiter(rate, subnet_rate) if rate or subnet_rate else None
+    rec = _REC.pack
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        cid, version, first, count = job
+        try:
+            t0 = time.perf_counter()
+            hosts = _hosts(version, first, count)
+            buf, up, last_flush = bytearray(_HDR.pack(cid, _DATA)), 0, time.monotonic()
+            for i, r in icmp._sweep_indexed(hosts, timeout, max_in_flight, ordered, native, max_workers, limiter):
+                if r["up"]:
+                    up += 1
+                    buf += rec(i, -1.0 if r["rtt_ms"] is None else r["rtt_ms"])
+                else:
+                    buf += rec(i, math.nan)
+                if len(buf) >= batch * _REC.size or time.monotonic() - last_flush >= 0.1:
+                    conn.send_bytes(buf)
+                    buf, last_flush = bytearray(_HDR.pack(cid, _DATA)), time.monotonic()
+            if len(buf) > _HDR.size:
+                conn.send_bytes(buf)
+            conn.send_bytes(_HDR.pack(cid, _DONE) + _DONE_BODY.pack(count, up, time.perf_counter() - t0))
+        except Exception as e:
+            conn.send_bytes(_HDR.pack(cid, _ERROR) + f"{type(e).__name__}: {e}".encode())
+
+class ShardedSweep:
+    """
+    Ping sweep spread over worker processes. The targets are cut into integer chunks that are
+    handed out to the shards as they free up; each shard sweeps its chunk with the native
+    engine (or the subprocess thread pool) on its own event loop and streams results back in
+    binary batches of 8 bytes per host. Iterating yields {"host","up","rtt_ms"} dicts; with
+    ordered=True (the default) chunks are merged back into target order, and at most
+    2 * workers chunks are dispatched ahead of the one being yielded, bounding the buffering.
+    A global rate is split evenly between the shards that get work (at most one per chunk); the
+    per-subnet rate is not, since with a chunk_size that is a multiple of 256 (the default is)
+    a /24 lies within one chunk and so is probed by one shard at a time. That does not hold for
+    other chunk sizes, or for hosts listed one by one (names and single addresses are batched
+    in target order), where a subnet can be probed by several shards each at the full rate. progress(yielded, total) is called at most every 0.2 s; setting the CancelToken ends the iteration within 0.1 s and
+    terminates the shard processes, as does closing the iterator early.
+
+        sweep = ShardedSweep(["10.0.0.0/16"], workers=4)
+        for r in sweep: ...
+        sweep.shard_stats  # per-shard chunks, hosts, up, busy seconds and hosts/s
+    """
+
+    def __init__(self, targets: list[str], workers: int | None = None, chunk_size: int = 4096,
+                 timeout: float = 1.0, max_in_flight: int = 1024, ordered: bool = True,
+                 native: bool | None = None, max_workers: int = 64, rate: float = 0, subnet_rate: float = 0,
+                 batch: int = 1024, progress=None, cancel=None):
+        self.targets = list(targets)
+        self.progress = throttle(progress)
+        self.cancel = cancel
+        self.cancelled = False
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+        self.ordered = ordered
+        try:
+            busy = sum(1 for _ in itertools.islice(_chunks(self.targets, self.chunk_size), self.workers))
+        except ValueError:
+            busy = self.workers  # the bad target is reported when iterating
+        self._args = (timeout, max_in_flight, ordered, native, max_workers,
+                      rate / max(1, busy), subnet_rate, batch)
+        self._procs: list = []
+        self._conns: list = []
+        self._stats = [{"shard": i, "pid": None, "chunks": 0, "hosts": 0, "up": 0, "seconds": 0.0}
+                       for i in range(self.workers)]
+        self.seconds = 0.0
+
+    @property
+    def shard_stats(self) -> list[dict]:
+        return [dict(s, pps=s["hosts"] / s["seconds"] if s["seconds"] else 0.0) for s in self._stats]
+
+    def _start(self):
+        # spawn, not fork: the parent may be a GUI with threads of its own
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(self.workers):
+            parent, child = ctx.Pipe()
+            p = ctx.Process(target=_worker, args=(child,) + self._args, daemon=True, name=f"netops-shard-{i}")
+            p.start()
+            child.close()
+            self._procs.append(p)
+            self._conns.append(parent)
+            self._stats[i]["pid"] = p.pid
+
+    def close(self, graceful: bool = True):
+        """Stops the shards: idle ones are told to exit, busy ones (or all, graceful=False) are terminated."""
+        if graceful:
+            for conn in self._conns:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+        for p in self._procs:
+            if graceful:
+                p.join(timeout=1.0)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        for conn in self._conns:
+            conn.close()
+        self._procs, self._conns = [], []
+
+    def __iter__(self):
+        t0 = time.perf_counter()
+        self._start()
+        jobs = _chunks(self.targets, self.chunk_size)
+        chunks: dict[int, tuple] = {}            # id -> job, for the chunks in flight
+        pending: dict[int, list] = {}            # id -> decoded results not yet yielded (ordered mode)
+        finished: set[int] = set()
+        queued = [0] * self.workers              # chunks sent to each shard and not done
+        shard_of = {}
+        next_cid = 0                             # ordered mode: chunk being yielded
+        exhausted = complete = False
+        total = icmp.count_targets(self.targets) if self.progress is not None else 0
+        yielded = 0
+
+        def dispatch():
+            nonlocal exhausted
+            for i, conn in enumerate(self._conns):
+                while queued[i] < 2 and not exhausted:
+                    if self.ordered and chunks and min(chunks) + 2 * self.workers <= max(chunks):
+                        return
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        return
+                    chunks[job[0]] = job
+                    shard_of[job[0]] = i
+                    queued[i] += 1
+                    conn.send(job)
+
+        def decode(job, payload):
+            _, version, first, _ = job
+            out = []
+            for offset, rtt in _REC.iter_unpack(payload):
+                if version == 0:
+                    host = first[offset]
+                elif version == 4:
+                    host = socket.inet_ntoa(_PACK_V4(first + offset))
+                else:
+                    host = str(ipaddress.IPv6Address(first + offset))
+                if rtt != rtt:
+                    out.append({"host": host, "up": False, "rtt_ms": None})
+                else:
+                    out.append({"host": host, "up": True, "rtt_ms": None if rtt < 0 else rtt})
+            return out
+
+        try:
+            dispatch()
+            while chunks:
+                if self.cancel is not None and self.cancel.is_cancelled():
+                    self.cancelled = True
+                    return
+                for conn in wait(self._conns, timeout=0.1):
+                    try:
+                        msg = conn.recv_bytes()
+                    except EOFError:
+                        raise RuntimeError(f"Shard {self._conns.index(conn)} exited unexpectedly")
+                    cid, kind = _HDR.unpack_from(msg)
+                    if kind == _ERROR:
+                        raise RuntimeError(f"Shard {shard_of[cid]}: {msg[_HDR.size:].decode(errors='replace')}")
+                    if kind == _DATA:
+                        results = decode(chunks[cid], memoryview(msg)[_HDR.size:])
+                        if not self.ordered:
+                            yield from results
+                            yielded += len(results)
+                            if self.progress is not None:
+                                self.progress(yielded, max(total, yielded))
+                        else:
+                            pending.setdefault(cid, []).extend(results)
+                        continue
+                    hosts, up, busy = _DONE_BODY.unpack_from(msg, _HDR.size)
+                    st = self._stats[shard_of[cid]]
+                    st["chunks"] += 1
+                    st["hosts"] += hosts
+                    st["up"] += up
+                    st["seconds"] += busy
+                    queued[shard_of[cid]] -= 1
+                    finished.add(cid)
+                    if not self.ordered:
+                        del chunks[cid]
+                if self.ordered:
+                    while next_cid in chunks:
+                        results = pending.pop(next_cid, [])
+                        yield from results
+                        yielded += len(results)
+                        if results and self.progress is not None:
+                            self.progress(yielded, max(total, yielded))
+                        if next_cid not in finished:
+                            break
+                        del chunks[next_cid]
+                        finished.discard(next_cid)
+                        next_cid += 1
+                dispatch()
+            complete = True
+        finally:
+            self.seconds = time.perf_counter() - t0
+            self.close(graceful=complete)
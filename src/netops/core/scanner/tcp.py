@@ -0,0 +1,319 @@
+import asyncio
+import errno
+import ipaddress
+import socket
+import struct
+import time
+from time import perf_counter
+
+from ...utils.threads import throttle
+from .icmp import count_targets, iter_targets
+
+try:
+    import resource
+    HAVE_RESOURCE = True
+except Exception:  # Windows
+    HAVE_RESOURCE = False
+
+# nmap's 100 most frequently open TCP ports (nmap -F / --top-ports 100), most common first
+TOP_PORTS = [
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995, 993, 5900,
+    1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554,
+    26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800, 106,
+    2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144, 7, 389, 8009, 3128, 444, 9999, 5009,
+    7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37,
+]
+
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, "WSAEWOULDBLOCK", -1)}
+_LINGER_RST = struct.pack("ii", 1, 0)
+
+def _port(text: str) -> int:
+    if text.isdigit():
+        p = int(text)
+        if 0 <= p <= 65535:
+            return p
+        raise ValueError(f"Port out of range: {text}")
+    try:
+        return socket.getservbyname(text, "tcp")
+    except OSError:
+        raise ValueError(f"Unknown port or service name: '{text}'")
+
+def parse_ports(spec: str | None, top_ports: int | None = None) -> list[int]:
+    """
+    TCP ports from an nmap -p expression: "22,80,443", "1-1024", "-" (1-65535), "-1024",
+    "60000-", service names ("ssh,http") and protocol prefixes ("T:80,U:53"; only T: ports
+    are kept). Without a spec, the first top_ports of TOP_PORTS (all 100 when None). Raises ValueError.
+    """
+    if not spec or not spec.strip():
+        return sorted(TOP_PORTS[:top_ports] if top_ports else TOP_PORTS)
+    ports = set()
+    proto = "T"
+    for item in spec.replace(" ", "").split(","):
+        if not item:
+            continue
+        if len(item) > 1 and item[1] == ":":
+            proto, item = item[0].upper(), item[2:]
+            if proto not in "TUSP":
+                raise ValueError(f"Unknown protocol prefix in '{item}'")
+        if proto != "T":
+            continue
+        if "-" in item:
+            lo, hi = item.split("-", 1)
+            lo, hi = (_port(lo) if lo else 1), (_port(hi) if hi else 65535)
+            if lo > hi:
+                raise ValueError(f"Reversed port range: {item}")
+            ports.update(range(lo, hi + 1))
+        else:
+            ports.add(_port(item))
+    if not ports:
+        raise ValueError(f"No TCP ports in '{spec}'")
+    return sorted(ports)
+
+class _Host:
+    __slots__ = ("ip", "hostname", "addr", "srtt", "rttvar", "open", "responded", "left")
+
+    def __init__(self, target: str, addr: tuple, probes: int):
+        self.ip = addr[1]
+        self.hostname = target if target != addr[1] else None
+        self.addr = addr
+        self.srtt = self.rttvar = None
+        self.open: list[int] = []
+        self.responded = False
+        self.left = probes
+
+    def sample(self, rtt: float):
+        # RFC 6298 smoothing, as nmap does for its per-host timeouts
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def timeout(self, lo: float, hi: float) -> float:
+        if self.srtt is None:
+            return hi
+        return min(hi, max(lo, self.srtt + 4 * self.rttvar))
+
+_services: dict[int, str | None] = {}
+
+def _service_name(port: int) -> str | None:
+    if port not in _services:
+        try:
+            _services[port] = socket.getservbyport(port, "tcp")
+        except OSError:
+            _services[port] = None
+    return _services[port]
+
+def _fd_budget(concurrency: int) -> int:
+    # every probe holds a socket; stay clear of the open-file limit
+    if not HAVE_RESOURCE:
+        return concurrency
+    soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    if soft == resource.RLIM_INFINITY:
+        return concurrency
+    return max(1, min(concurrency, soft - 64))
+
+class ConnectScanner:
+    """
+    TCP connect() scanner on asyncio. Up to `concurrency` connection attempts are pending at
+    once; each host gets a timeout derived from the RTTs of its earlier answers (connected or
+    refused), starting from `timeout` and never going below `min_timeout`. Hosts are taken in
+    groups and probed port by port across the group, so no single host sees the whole burst.
+    Sockets are closed with an RST rather than lingering in TIME_WAIT.
+    """
+
+    def __init__(self, concurrency: int = 1000, timeout: float = 1.0, min_timeout: float = 0.1,
+                 host_group: int = 64, limiter=None):
+        self.concurrency = _fd_budget(concurrency)
+        self.timeout = timeout
+        self.min_timeout = min(min_timeout, timeout)
+        self.host_group = max(1, host_group)
+        self.limiter = limiter
+        self.probes = self.open = self.closed = self.filtered = 0
+
+    @staticmethod
+    def result(host: _Host) -> dict:
+        """A host in the shape parse_nmap_xml produces."""
+        return {"ip": host.ip, "mac": None, "hostname": host.hostname, "status": "up" if host.responded else "down", "os": None,
+                "services": [{"port": p, "proto": "tcp", "state": "open", "name": _service_name(p),
+                              "product": None, "version": None} for p in sorted(host.open)]}
+
+    async def _resolve(self, target: str) -> tuple | None:
+        try:
+            ip = ipaddress.ip_address(target)
+            return (socket.AF_INET if ip.version == 4 else socket.AF_INET6), str(ip)
+        except ValueError:
+            pass
+        try:
+            infos = await self._loop.getaddrinfo(target, None, type=socket.SOCK_STREAM)
+        except OSError:
+            return None
+        return (infos[0][0], infos[0][4][0]) if infos else None
+
+    def _start(self, host: _Host, port: int):
+        # plain callbacks rather than a task per probe: asyncio's per-task cost dominates a connect scan
+        sock = socket.socket(host.addr[0], socket.SOCK_STREAM)
+        sock.setblocking(False)
+        t0 = perf_counter()
+        err = sock.connect_ex((host.ip, port))
+        if err in _IN_PROGRESS:
+            fd = sock.fileno()
+            timer = self._loop.call_later(host.timeout(self.min_timeout, self.timeout), self._timed_out, fd, host, port, sock)
+            self._loop.add_writer(fd, self._connected, fd, host, port, sock, t0, timer)
+            self._live[fd] = (sock, timer)
+        else:  # loopback and local errors answer straight away
+            self._done(host, port, sock, err, perf_counter() - t0)
+
+    def _connected(self, fd: int, host: _Host, port: int, sock: socket.socket, t0: float, timer):
+        timer.cancel()
+        self._loop.remove_writer(fd)
+        del self._live[fd]
+        self._done(host, port, sock, sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR), perf_counter() - t0)
+
+    def _timed_out(self, fd: int, host: _Host, port: int, sock: socket.socket):
+        self._loop.remove_writer(fd)
+        del self._live[fd]
+        self._done(host, port, sock, None, None)
+
+    def _done(self, host: _Host, port: int, sock: socket.socket, err: int | None, rtt: float | None):
+        if err == 0:
+            host.sample(rtt)
+            host.open.append(port)
+            host.responded = True
+            self.open += 1
+        elif err == errno.ECONNREFUSED:
+            host.sample(rtt)
+            host.responded = True
+            self.closed += 1
+        else:  # no answer, unreachable, ...: nmap calls these filtered
+            self.filtered += 1
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+        sock.close()
+        self.probes += 1
+        if self._progress is not None:
+            self._progress(self.probes, max(self._total, self.probes))
+        self._slots.release()
+        host.left -= 1
+        if not host.left:
+            self._emit(self.result(host))
+        self._in_flight -= 1
+        if not self._in_flight and self._sending_done:
+            self._idle.set()
+
+    def abort(self):
+        """Drops every pending connection attempt (closing its socket) and ends scan()."""
+        self.cancelled = True
+        for fd, (sock, timer) in self._live.items():
+            timer.cancel()
+            self._loop.remove_writer(fd)
+            sock.close()
+            self._slots.release()  # wakes a producer waiting for a slot
+        self._live.clear()
+        self._idle.set()
+
+    async def _watch(self, cancel):
+        while not cancel.is_cancelled():
+            await asyncio.sleep(0.1)
+        self.abort()
+
+    async def scan(self, targets, ports: list[int], emit, progress=None, cancel=None, total: int = 0):
+        """
+        Scans every target (host strings) on every port, calling emit(host_dict) as each host
+        finishes and progress(probes_done, total) after each probe. Setting the CancelToken
+        aborts the scan within 0.1 s; hosts still in progress are not emitted.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._idle = asyncio.Event()
+        self._in_flight = 0
+        self._sending_done = False
+        self._emit = emit
+        self._progress, self._total = progress, total
+        self._live: dict[int, tuple] = {}
+        self.cancelled = False
+        watcher = self._loop.create_task(self._watch(cancel)) if cancel is not None else None
+        try:
+            await self._produce(targets, ports, emit)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    async def _produce(self, targets, ports: list[int], emit):
+        group: list[str] = []
+        targets = iter(targets)
+        while True:
+            group.clear()
+            for t in targets:
+                group.append(t)
+                if len(group) >= self.host_group:
+                    break
+            if not group:
+                break
+            hosts = []
+            for t in group:
+                addr = await self._resolve(t)
+                if addr is None:
+                    emit({"ip": t, "mac": None, "hostname": t, "status": "down", "os": None, "services": []})
+                else:
+                    hosts.append(_Host(t, addr, len(ports)))
+            for port in ports:
+                for host in hosts:
+                    await self._slots.acquire()
+                    if self.limiter is not None:
+                        await self.limiter.acquire_async(host.ip)
+                    if self.cancelled:
+                        return
+                    self._in_flight += 1
+                    self._start(host, port)
+                # answers only arrive once the loop runs again
+                await asyncio.sleep(0)
+            if self.cancelled:
+                return
+        self._sending_done = True
+        if self._in_flight:
+            await self._idle.wait()
+
+def tcp_scan(targets: list[str], ports: str | None = None, top_ports: int | None = None, concurrency: int = 1000,
+             timeout: float = 1.0, limiter=None, on_host=None, progress=None, cancel=None) -> dict:
+    """
+    Pure-Python TCP connect scan.
+    Returns {"ok": bool, "error": str|None, "cancelled": bool, "hosts": [...], "stats": {...}} with
+    hosts shaped like parse_nmap_xml (open ports only, hosts that answered on no port left out)
+    and sorted by IP. on_host(host_dict) is called from the scanning thread as each host
+    finishes, progress(probes_done, probes_total) at most every 0.2 s. A set CancelToken closes
+    every pending connection within 0.1 s and returns the hosts finished so far.
+    """
+    try:
+        port_list = parse_ports(ports, top_ports)
+        hosts = []
+
+        def collect(h):
+            if h["status"] == "up":
+                hosts.append(h)
+                if on_host is not None:
+                    on_host(h)
+
+        scanner = ConnectScanner(concurrency, timeout, limiter=limiter)
+        t0 = time.perf_counter()
+        loop = asyncio.SelectorEventLoop()  # add_writer is not available on the Windows proactor loop
+        try:
+            total = count_targets(targets) * len(port_list) if progress is not None else 0
+            loop.run_until_complete(scanner.scan(iter_targets(targets), port_list, collect,
+                                                 throttle(progress), cancel, total))
+        finally:
+            loop.close()
+        seconds = time.perf_counter() - t0
+    except Exception as e:
+        return {"ok": False, "error": str(e), "cancelled": False, "hosts": [], "stats": {}}
+
+    def ip_key(h):
+        try:
+            ip = ipaddress.ip_address(h["ip"])
+            return ip.version, int(ip)
+        except ValueError:
+            return 0, 0
+    hosts.sort(key=ip_key)
+    stats = {"ports": len(port_list), "probes": scanner.probes, "open": scanner.open, "closed": scanner.closed,
+             "filtered": scanner.filtered, "seconds": seconds,
+             "pps": scanner.probes / seconds if seconds > 0 else 0.0, "concurrency": scanner.concurrency}
+    return {"ok": True, "error": None, "cancelled": scanner.cancelled, "hosts": hosts, "stats": stats}
@@ -1,38 +1,301 @@
-from ipaddress import ip_interface, ip_network
+from ipaddress import ip_interface, IPv6Address
+from socket import inet_ntoa, inet_ntop, inet_pton, AF_INET, AF_INET6
+
+try:
+    import numpy as np  # type: ignore
+    HAVE_NUMPY = True
+except Exception:
+    HAVE_NUMPY = False
+
+_BITS = {4: 32, 6: 128}
+
+def int_to_addr(value: int, version: int = 4) -> str:
+    if version == 4:
+        return inet_ntoa(value.to_bytes(4, "big"))
+    if (value >> 32) in (0, 0xFFFF):
+        # inet_ntop renders ::a.b.c.d / ::ffff:a.b.c.d forms; keep ipaddress' spelling
+        return str(IPv6Address(value))
+    return inet_ntop(AF_INET6, value.to_bytes(16, "big"))
+
+def host_bounds(network: int, prefixlen: int, bits: int = 32) -> tuple[int, int]:
+    """
+    First and last usable host as integers, following the rules of ipaddress hosts():
+    IPv4 drops network/broadcast, IPv6 drops the subnet-router anycast address,
+    and the last two prefix lengths (/31 /32, /127 /128) keep every address.
+    """
+    last = network | ((1 << (bits - prefixlen)) - 1)
+    if prefixlen >= bits - 1:
+        return network, last
+    if bits == 32:
+        return network + 1, last - 1
+    return network + 1, last
+
+_OCTETS = tuple(str(i) for i in range(256))
+
+def format_v4_run(start: int, count: int) -> list[str]:
+    """Dotted-quad strings for 'count' consecutive IPv4 addresses, built one /24 at a time."""
+    out: list[str] = []
+    end = start + count
+    while start < end:
+        stop = min(end, (start | 0xFF) + 1)
+        head = f"{start >> 24}.{(start >> 16) & 255}.{(start >> 8) & 255}."
+        out += [head + o for o in _OCTETS[start & 0xFF:((stop - 1) & 0xFF) + 1]]
+        start = stop
+    return out
+
+class HostRange:
+    """
+    Lazy sequence of usable host addresses backed by an integer range.
+    Supports len(), O(1) (negative) indexing, slicing, 'in' and batched iteration;
+    items are address strings. Nothing is enumerated until it is asked for. len() is capped
+    at sys.maxsize (2**63 - 1) and raises OverflowError beyond it, e.g. for an IPv6 /64;
+    .size gives the exact count for any range.
+    """
+    __slots__ = ("version", "_range")
+
+    def __init__(self, ints: range, version: int = 4):
+        self.version = version
+        self._range = ints
+
+    @classmethod
+    def from_network(cls, network: int, prefixlen: int, version: int = 4) -> "HostRange":
+        first, last = host_bounds(network, prefixlen, _BITS[version])
+        return cls(range(first, last + 1), version)
+
+    @classmethod
+    def from_cidr(cls, cidr: str) -> "HostRange":
+        version, value, prefix = parse_cidr_int(cidr)
+        bits = _BITS[version]
+        network = value & (((1 << bits) - 1) ^ ((1 << (bits - prefix)) - 1))
+        return cls.from_network(network, prefix, version)
+
+    @property
+    def size(self) -> int:
+        """Number of hosts as an exact int; unlike len(), never overflows."""
+        r = self._range
+        try:
+            return len(r)
+        except OverflowError:
+            # len() is limited to sys.maxsize; IPv6 ranges can be far larger.
+            if r.step > 0:
+                return max(0, (r.stop - r.start + r.step - 1) // r.step)
+            return max(0, (r.start - r.stop - r.step - 1) // -r.step)
+
+    @property
+    def first(self) -> str | None:
+        return self[0] if self._range else None
+
+    @property
+    def last(self) -> str | None:
+        return self[-1] if self._range else None
+
+    def int_at(self, index: int) -> int:
+        return self._range[index]
+
+    def __len__(self) -> int:
+        # OverflowError past sys.maxsize; see .size
+        return len(self._range)
+
+    def __bool__(self) -> bool:
+        return bool(self._range)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return HostRange(self._range[index], self.version)
+        return int_to_addr(self._range[index], self.version)
+
+    def __contains__(self, item) -> bool:
+        if not isinstance(item, int):
+            try:
+                version, value, prefix = parse_cidr_int(str(item))
+            except ValueError:
+                return False
+            if version != self.version or prefix != _BITS[version]:
+                return False
+            item = value
+        return item in self._range
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            yield from batch
+
+    def __repr__(self) -> str:
+        return f"HostRange({self.first!r}..{self.last!r}, size={self.size})"
+
+    def iter_batches(self, size: int = 4096):
+        """Yield lists of up to 'size' address strings."""
+        r = self._range
+        fast = self.version == 4 and r.step == 1
+        for i in range(0, self.size, size):
+            chunk = r[i:i + size]
+            if fast:
+                yield format_v4_run(chunk.start, len(chunk))
+            else:
+                yield [int_to_addr(v, self.version) for v in chunk]
+
+def interval_to_cidrs(first: int, last: int, bits: int = 32) -> list[tuple[int, int]]:
+    """Smallest list of aligned (base, prefixlen) blocks exactly covering [first, last]."""
+    out = []
+    while first <= last:
+        # largest block that is aligned at 'first' and does not run past 'last'
+        size = 1 << ((last - first + 1).bit_length() - 1)
+        if first:
+            size = min(size, first & -first)
+        out.append((first, bits - size.bit_length() + 1))
+        first += size
+    return out
 
 def describe_cidr(cidr: str) -> dict:
     iface = ip_interface(cidr)
-    net = iface.network
-    is_31 = net.prefixlen == 31
-    is_32 = net.prefixlen == 32
-
-    netmask = str(net.netmask)
-    wildcard = str(net.hostmask)  # wildcard/hostmask
-    broadcast = None if is_32 else str(net.broadcast_address)
-    usable_hosts = 0
-    first_usable = last_usable = None
-    if is_32:
-        usable_hosts = 1
-        first_usable = last_usable = str(net.network_address)
-    elif is_31:
-        usable_hosts = 2  # point-to-point
-        addrs = list(net.hosts())
-        first_usable = str(addrs[0])
-        last_usable = str(addrs[1])
-    else:
-        hosts = list(net.hosts())
-        usable_hosts = len(hosts)
-        first_usable = str(hosts[0]) if hosts else None
-        last_usable = str(hosts[-1]) if hosts else None
+    version = iface.version
+    bits = _BITS[version]
+    prefix = iface.network.prefixlen
+    # Everything below is plain integer arithmetic: O(1) for any prefix length.
+    hostmask = (1 << (bits - prefix)) - 1
+    mask = ((1 << bits) - 1) ^ hostmask
+    network = int(iface.ip) & mask
+    broadcast = network | hostmask
+    is_31 = prefix == bits - 1  # point-to-point (/31, /127)
+    is_32 = prefix == bits      # host-only (/32, /128)
+
+    hosts = HostRange.from_network(network, prefix, version)
 
     return {
-        "network": str(net.network_address) + f"/{net.prefixlen}",
-        "netmask": netmask,
-        "wildcard": wildcard,
-        "broadcast": broadcast,
-        "usable_hosts": usable_hosts,
-        "first_usable": first_usable,
-        "last_usable": last_usable,
+        "network": int_to_addr(network, version) + f"/{prefix}",
+        "netmask": int_to_addr(mask, version),
+        "wildcard": int_to_addr(hostmask, version),  # wildcard/hostmask
+        "broadcast": None if is_32 else int_to_addr(broadcast, version),
+        "usable_hosts": hosts.size,
+        "first_usable": hosts.first,
+        "last_usable": hosts.last,
         "is_31": is_31,
         "is_32": is_32,
     }
+
+COLUMNS = ("version", "prefixlen", "network", "netmask", "wildcard", "broadcast",
+           "usable_hosts", "first_usable", "last_usable")
+
+def parse_cidr_int(cidr: str) -> tuple[int, int, int]:
+    """Parse 'addr[/prefix|/netmask]' into (version, address int, prefixlen). Raises ValueError."""
+    text = cidr.strip()
+    addr, sep, plen = text.partition("/")
+    family, version = (AF_INET6, 6) if ":" in addr else (AF_INET, 4)
+    bits = _BITS[version]
+    try:
+        value = int.from_bytes(inet_pton(family, addr), "big")
+    except (OSError, ValueError):
+        value = None
+    if value is not None and (not sep or (plen.isascii() and plen.isdigit())):
+        prefix = int(plen) if sep else bits
+        if prefix <= bits:
+            return version, value, prefix
+        raise ValueError(f"Invalid prefix length in {cidr!r}")
+    # Scoped IPv6, netmask notation and anything unusual: let ipaddress decide.
+    iface = ip_interface(text)
+    return iface.version, int(iface.ip), iface.network.prefixlen
+
+def _describe_many_python(parsed: list) -> dict:
+    cols = {c: [] for c in COLUMNS}
+    errors = []
+    for row in parsed:
+        if row is None:
+            errors.append(True)
+            for c in COLUMNS:
+                cols[c].append(0)
+            continue
+        version, value, prefix = row
+        bits = _BITS[version]
+        hostmask = (1 << (bits - prefix)) - 1
+        mask = ((1 << bits) - 1) ^ hostmask
+        network = value & mask
+        first, last = host_bounds(network, prefix, bits)
+        errors.append(False)
+        cols["version"].append(version)
+        cols["prefixlen"].append(prefix)
+        cols["network"].append(network)
+        cols["netmask"].append(mask)
+        cols["wildcard"].append(hostmask)
+        cols["broadcast"].append(network | hostmask)
+        cols["usable_hosts"].append(last - first + 1)
+        cols["first_usable"].append(first)
+        cols["last_usable"].append(last)
+    cols["error"] = errors
+    return cols
+
+def _describe_many_numpy(parsed: list) -> dict:
+    n = len(parsed)
+    error = np.fromiter((row is None for row in parsed), dtype=bool, count=n)
+    rows = [row or (4, 0, 32) for row in parsed]
+    version = np.fromiter((r[0] for r in rows), dtype=np.uint8, count=n)
+    prefix = np.fromiter((r[2] for r in rows), dtype=np.uint8, count=n)
+    is_v6 = version == 6
+    # 128-bit values do not fit a machine integer; fall back to object arrays
+    # (still vectorised, numpy dispatches to Python ints element-wise).
+    dtype = object if is_v6.any() else np.uint64
+    value = np.array([r[1] for r in rows], dtype=dtype)
+    bits = np.where(is_v6, 128, 32).astype(dtype)
+    one = dtype(1) if dtype is np.uint64 else 1
+    hostmask = (one << (bits - prefix.astype(dtype))) - one
+    mask = ((one << bits) - one) ^ hostmask
+    network = value & mask
+    broadcast = network | hostmask
+    full = prefix.astype(np.int16) >= bits.astype(np.int16) - 1
+    first = np.where(full, network, network + one)
+    last = np.where(full | is_v6, broadcast, broadcast - one)
+    return {
+        "version": version,
+        "prefixlen": prefix,
+        "network": network,
+        "netmask": mask,
+        "wildcard": hostmask,
+        "broadcast": broadcast,
+        "usable_hosts": last - first + one,
+        "first_usable": first,
+        "last_usable": last,
+        "error": error,
+    }
+
+def describe_many(cidrs, backend: str | None = None) -> dict:
+    """
+    Describe many CIDRs at once. Returns columns keyed like describe_cidr (integer values,
+    NumPy arrays or lists depending on backend) plus an "error" mask for unparsable rows.
+    backend: None (NumPy when available), "numpy" or "python".
+    """
+    if backend is None:
+        backend = "numpy" if HAVE_NUMPY else "python"
+    if backend == "numpy" and not HAVE_NUMPY:
+        raise ValueError("NumPy backend requested but numpy is not installed")
+    if backend not in ("numpy", "python"):
+        raise ValueError(f"Unknown backend {backend!r}")
+    parsed = []
+    for c in cidrs:
+        try:
+            parsed.append(parse_cidr_int(c))
+        except ValueError:
+            parsed.append(None)
+    cols = _describe_many_numpy(parsed) if backend == "numpy" else _describe_many_python(parsed)
+    cols["backend"] = backend
+    cols["count"] = len(parsed)
+    return cols
+
+def iter_rows(result: dict):
+    """Yield describe_cidr-shaped dicts from a describe_many result (None for error rows)."""
+    for i in range(result["count"]):
+        if result["error"][i]:
+            yield None
+            continue
+        version = int(result["version"][i])
+        prefix = int(result["prefixlen"][i])
+        bits = _BITS[version]
+        fmt = lambda col: int_to_addr(int(result[col][i]), version)
+        yield {
+            "network": fmt("network") + f"/{prefix}",
+            "netmask": fmt("netmask"),
+            "wildcard": fmt("wildcard"),
+            "broadcast": None if prefix == bits else fmt("broadcast"),
+            "usable_hosts": int(result["usable_hosts"][i]),
+            "first_usable": fmt("first_usable"),
+            "last_usable": fmt("last_usable"),
+            "is_31": prefix == bits - 1,
+            "is_32": prefix == bits,
+        }
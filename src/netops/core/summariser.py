@@ -1,6 +1,209 @@
-from ipaddress import ip_network, collapse_addresses
+import heapq
+from bisect import bisect_left
+from .subnetting import int_to_addr, interval_to_cidrs, parse_cidr_int
 
-def summarise(cidrs: list[str]) -> list[str]:
-    nets = [ip_network(c, strict=False) for c in cidrs]
-    collapsed = collapse_addresses(nets)
-    return [str(n) for n in collapsed]
+_BITS = {4: 32, 6: 128}
+_EXAMPLES = 50  # examples kept per problem category in reports
+
+def _fmt(version: int, start: int, end: int) -> str:
+    bits = _BITS[version]
+    return f"{int_to_addr(start, version)}/{bits - (end - start + 1).bit_length() + 1}"
+
+def iter_prefix_file(path: str):
+    """Yield the first token of every non-empty, non-comment line (routing-table dumps etc.)."""
+    with open(path, "r", encoding="utf-8", errors="replace", buffering=1 << 20) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line.split(None, 1)[0]
+
+def _sweep(cidrs) -> dict:
+    """Parse into per-family integer intervals sorted by (start, widest first) and merge them."""
+    keyed = {4: [], 6: []}
+    invalid, invalid_examples, count = 0, [], 0
+    for c in cidrs:
+        count += 1
+        try:
+            # str() lets ipaddress network and address objects through as well as strings
+            version, value, prefix = parse_cidr_int(str(c))
+        except (ValueError, AttributeError):
+            invalid += 1
+            if len(invalid_examples) < _EXAMPLES:
+                invalid_examples.append(c)
+            continue
+        bits = _BITS[version]
+        hostmask = (1 << (bits - prefix)) - 1
+        start = value & ~hostmask
+        # one int per prefix: start in the high bits, (all-ones - end) below so wider blocks sort first
+        keyed[version].append((start << bits) | (((1 << bits) - 1) - (start | hostmask)))
+
+    runs = {4: [], 6: []}
+    dups = overlaps = 0
+    dup_examples, overlap_examples = [], []
+    for version, keys in keyed.items():
+        bits = _BITS[version]
+        low = (1 << bits) - 1
+        keys.sort()
+        cur_start = cur_end = None       # merged run being built
+        cov_start = cov_end = -1         # widest prefix seen that covers the current position
+        prev_key = None
+        out = runs[version]
+        for key in keys:
+            start = key >> bits
+            end = low - (key & low)
+            if key == prev_key:
+                dups += 1
+                if len(dup_examples) < _EXAMPLES:
+                    dup_examples.append(_fmt(version, start, end))
+                continue
+            prev_key = key
+            if end <= cov_end:
+                # CIDRs are either nested or disjoint: this one sits inside an earlier prefix
+                overlaps += 1
+                if len(overlap_examples) < _EXAMPLES:
+                    overlap_examples.append({"prefix": _fmt(version, start, end),
+                                             "covered_by": _fmt(version, cov_start, cov_end)})
+                continue
+            cov_start, cov_end = start, end
+            if cur_end is not None and start <= cur_end + 1:
+                cur_end = end
+            else:
+                if cur_end is not None:
+                    out.append((cur_start, cur_end))
+                cur_start, cur_end = start, end
+        if cur_end is not None:
+            out.append((cur_start, cur_end))
+    return {
+        "runs": runs,
+        "input": count,
+        "invalid": invalid,
+        "invalid_examples": invalid_examples,
+        "duplicates": dups,
+        "duplicate_examples": dup_examples,
+        "overlaps": overlaps,
+        "overlap_examples": overlap_examples,
+    }
+
+def _collapsed(runs: dict) -> list[tuple[int, int, int]]:
+    """(version, start, end) of the minimal exact CIDR cover, IPv4 first."""
+    out = []
+    for version in (4, 6):
+        bits = _BITS[version]
+        for first, last in runs[version]:
+            for base, prefix in interval_to_cidrs(first, last, bits):
+                out.append((version, base, base + (1 << (bits - prefix)) - 1))
+    return out
+
+def aggregate(blocks: list[tuple[int, int, int]], max_prefixes: int, max_extra: int | None = None) -> dict:
+    """
+    Reduce sorted (version, start, end) CIDR blocks to at most max_prefixes supernets.
+    The blocks are the leaves of a Patricia trie whose branch nodes are the smallest
+    prefixes holding two subtrees. A branch's uncovered space contains that of every branch
+    below it, so the cheapest merge is always a branch whose two children are already single
+    prefixes: those are taken from a heap, fewest added addresses first. Stops early if the
+    next merge would push over-coverage past max_extra.
+    """
+    n = len(blocks)
+    fam = [b[0] for b in blocks]
+    lo = [b[1] for b in blocks]
+    hi = [b[2] for b in blocks]
+    children: list[list[int] | None] = [None] * n
+    parent = [-1] * n
+    roots = []
+
+    def entry(node: int) -> tuple:
+        left, right = children[node]
+        cost = (hi[node] - lo[node]) - (hi[left] - lo[left]) - (hi[right] - lo[right]) - 1
+        return (cost, node)
+
+    # build top-down: every slice of sorted blocks splits at its supernet's middle bit
+    i = 0
+    while i < n:
+        j = i
+        while j < n and fam[j] == fam[i]:
+            j += 1
+        starts = lo[i:j]
+        stack = [(i, j, -1, 0)]
+        while stack:
+            a, b, up, side = stack.pop()
+            if b - a == 1:
+                node = a
+            else:
+                span = (lo[a] ^ hi[b - 1]).bit_length()
+                node = len(fam)
+                fam.append(fam[a])
+                lo.append(lo[a] >> span << span)
+                hi.append(lo[-1] | ((1 << span) - 1))
+                mid = bisect_left(starts, lo[-1] | (1 << (span - 1)), a - i, b - i) + i
+                children.append([-1, -1])
+                parent.append(up)
+                stack.append((mid, b, node, 1))
+                stack.append((a, mid, node, 0))
+            if up < 0:
+                roots.append(node)
+            else:
+                parent[node] = up
+                children[up][side] = node
+        i = j
+    merged = [False] * len(fam)
+    waiting = [0] * len(fam)
+    heap = []
+    for node in range(n, len(fam)):
+        left, right = children[node]
+        waiting[node] = (left >= n) + (right >= n)
+        if not waiting[node]:
+            heap.append(entry(node))
+    heapq.heapify(heap)
+
+    count, extra = n, 0
+    while count > max_prefixes and heap:
+        cost = heap[0][0]
+        if max_extra is not None and extra + cost > max_extra:
+            break
+        node = heapq.heappop(heap)[-1]
+        merged[node] = True
+        count -= 1
+        extra += cost
+        up = parent[node]
+        if up >= 0:
+            waiting[up] -= 1
+            if not waiting[up]:
+                heapq.heappush(heap, entry(up))
+
+    out = []
+    stack = roots[::-1]
+    while stack:
+        node = stack.pop()
+        if node < n or merged[node]:
+            out.append(_fmt(fam[node], lo[node], hi[node]))
+        else:
+            stack.extend(children[node][::-1])
+    return {"prefixes": out, "extra_addresses": extra, "target_met": count <= max_prefixes}
+
+def summarise(cidrs) -> list[str]:
+    """Collapse CIDRs (any iterable, IPv4 and IPv6 mixed) into the minimal exact prefix list."""
+    sweep = _sweep(cidrs)
+    if sweep["invalid"]:
+        raise ValueError(f"Invalid prefix: {sweep['invalid_examples'][0]!r}")
+    return [_fmt(v, s, e) for v, s, e in _collapsed(sweep["runs"])]
+
+def summarise_report(cidrs, max_prefixes: int | None = None, max_extra: int | None = None) -> dict:
+    """
+    Summarise with diagnostics: the exact collapsed summary plus duplicate, overlap and
+    invalid-input counts (with examples). With max_prefixes, also an aggregate of at most
+    that many prefixes that may over-cover by up to max_extra addresses.
+    """
+    sweep = _sweep(cidrs)
+    blocks = _collapsed(sweep.pop("runs"))
+    report = {"ok": True, "error": None, "summary": [_fmt(v, s, e) for v, s, e in blocks]}
+    report.update(sweep)
+    if max_prefixes is not None:
+        report["aggregate"] = aggregate(blocks, max_prefixes, max_extra)
+    return report
+
+def summarise_file(path: str, **kwargs) -> dict:
+    """summarise_report over a prefix-per-line file, streamed."""
+    try:
+        return summarise_report(iter_prefix_file(path), **kwargs)
+    except OSError as e:
+        return {"ok": False, "error": str(e), "summary": []}
@@ -1,76 +1,270 @@
-from ipaddress import ip_network, ip_address, IPv4Network
-
-def hosts_to_prefix(hosts: int) -> int:
-    # required addresses include network+broadcast (except /31)
-    needed = hosts + 2 if hosts > 0 else 0
-    prefix = 32
-    size = 1
-    while size < needed and prefix > 0:
-        size <<= 1
-        prefix -= 1
-    # cap at /30 to keep >0 usable; /31 reserved for ptp (not auto here)
-    if prefix > 30:
-        prefix = 30
+import heapq
+import json
+from ipaddress import ip_network
+from .subnetting import host_bounds, int_to_addr, interval_to_cidrs
+
+def hosts_to_prefix(hosts: int, bits: int = 32) -> int:
+    # required addresses include network+broadcast on IPv4, the subnet-router anycast on IPv6
+    reserved = 2 if bits == 32 else 1
+    needed = hosts + reserved if hosts > 0 else 0
+    # smallest power of two >= needed, expressed as a prefix length
+    prefix = max(bits - (max(needed, 1) - 1).bit_length(), 0)
+    # cap at /30 (/126) to keep >0 usable; /31 reserved for ptp (not auto here)
+    if prefix > bits - 2:
+        prefix = bits - 2
     return prefix
 
-def split_until(block: IPv4Network, want_prefix: int) -> tuple[IPv4Network, list[IPv4Network]]:
-    """Split 'block' until we obtain one subnet at want_prefix. Return (allocated, leftovers)."""
-    leftovers = []
-    curr = block
-    while curr.prefixlen < want_prefix:
-        left, right = list(curr.subnets(prefixlen_diff=1))
-        # allocate from left; keep right as free; but we also continue splitting the left
-        leftovers.append(right)
-        curr = left
-    return curr, leftovers
-
-def carve(free_list: list[IPv4Network], want_prefix: int) -> tuple[IPv4Network | None, list[IPv4Network]]:
-    """Take first block that can fit want_prefix; return (allocated, new_free_list)."""
-    new_free = free_list.copy()
-    for i, blk in enumerate(free_list):
-        if blk.prefixlen > want_prefix:
-            # too small, continue
-            continue
-        # blk is bigger or equal
-        alloc, remainers = split_until(blk, want_prefix)
-        # replace original with remainers (and keep any unused part before/after)
-        new_free.pop(i)
-        # Remaining space inside 'blk' is the collected 'remainers'
-        new_free[i:i] = remainers  # insert at same position
-        return alloc, new_free
-    return None, free_list
+def demand_prefix(demand: dict, bits: int = 32) -> int:
+    """Prefix length for a demand given as {"hosts": n} or an explicit {"prefix": p}."""
+    if demand.get("prefix") is not None:
+        prefix = int(demand["prefix"])
+        if not 0 <= prefix <= bits:
+            raise ValueError(f"Invalid prefix /{prefix} for {demand.get('name')}")
+        return prefix
+    return hosts_to_prefix(demand["hosts"], bits)
+
+def free_runs(blocks: list[tuple[int, int]], bits: int = 32) -> list[tuple[int, int]]:
+    """Merge address-sorted (base, prefix) blocks into contiguous (first, last) intervals."""
+    runs: list[tuple[int, int]] = []
+    for base, prefix in blocks:
+        last = base + (1 << (bits - prefix)) - 1
+        if runs and base == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], last)
+        else:
+            runs.append((base, last))
+    return runs
+
+class BuddyAllocator:
+    """
+    Buddy-system free list: one bucket of integer base addresses per prefix length.
+    Allocation takes the highest-addressed free block that fits (the order the old
+    linear free list produced) and splits it; freed blocks merge with free buddies.
+    """
+
+    def __init__(self, bits: int = 32):
+        self.bits = bits
+        self._free: list[set[int]] = [set() for _ in range(bits + 1)]
+        self._heap: list[list[int]] = [[] for _ in range(bits + 1)]  # max-heaps (negated bases)
+        self._tops: list[int] = [-1] * (bits + 1)  # cached highest base per bucket, -1 when empty
+
+    def _push(self, base: int, prefix: int):
+        self._free[prefix].add(base)
+        heapq.heappush(self._heap[prefix], -base)
+        if base > self._tops[prefix]:
+            self._tops[prefix] = base
+
+    def _remove(self, base: int, prefix: int):
+        self._free[prefix].discard(base)
+        if base == self._tops[prefix]:
+            # Drop heap entries made stale by removals before re-reading the top.
+            heap, live = self._heap[prefix], self._free[prefix]
+            while heap and -heap[0] not in live:
+                heapq.heappop(heap)
+            self._tops[prefix] = -heap[0] if heap else -1
+
+    def add_free(self, base: int, prefix: int):
+        """Return a block to the pool, merging with its buddy while both halves are free."""
+        while prefix > 0:
+            buddy = base ^ (1 << (self.bits - prefix))
+            if buddy not in self._free[prefix]:
+                break
+            self._remove(buddy, prefix)
+            base &= buddy
+            prefix -= 1
+        self._push(base, prefix)
+
+    def _split(self, base: int, prefix: int, target: int, want: int):
+        """Take free block base/prefix and split it down to target/want, freeing the other halves."""
+        self._remove(base, prefix)
+        for p in range(prefix + 1, want + 1):
+            half = 1 << (self.bits - p)
+            if target & half:
+                self._push(base, p)
+                base += half
+            else:
+                self._push(base + half, p)
+
+    def allocate(self, want: int, best_fit: bool = False) -> int | None:
+        """
+        Carve one block of /want; returns its base address or None when nothing fits.
+        best_fit takes the smallest fitting block instead of the highest-addressed one.
+        """
+        fits = self._tops[:want + 1]
+        if best_fit:
+            best_prefix = next((p for p in range(want, -1, -1) if fits[p] >= 0), None)
+            if best_prefix is None:
+                return None
+            best = fits[best_prefix]
+        else:
+            best = max(fits)
+            if best < 0:
+                return None
+            # Free blocks are disjoint, so a base address identifies its bucket.
+            best_prefix = fits.index(best)
+        # Keep the lowest part; the upper halves become free blocks.
+        self._split(best, best_prefix, best, want)
+        return best
+
+    def candidates(self, want: int) -> list[tuple[int, int]]:
+        """Highest free block of every bucket that can hold a /want, as (base, prefix)."""
+        return [(top, p) for p, top in enumerate(self._tops[:want + 1]) if top >= 0]
+
+    def reserve(self, base: int, prefix: int) -> bool:
+        """Claim the specific block base/prefix if it lies entirely in free space."""
+        for p in range(prefix, -1, -1):
+            block = base & ~((1 << (self.bits - p)) - 1)
+            if block in self._free[p]:
+                self._split(block, p, base, prefix)
+                return True
+        return False
+
+    def free_blocks(self) -> list[tuple[int, int]]:
+        """All free (base, prefix) pairs in address order."""
+        return sorted((b, p) for p, bucket in enumerate(self._free) for b in bucket)
+
+def block_info(name: str, addr: int, prefix: int, version: int) -> dict:
+    first, last = host_bounds(addr, prefix, 32 if version == 4 else 128)
+    return {
+        "name": name,
+        "cidr": f"{int_to_addr(addr, version)}/{prefix}",
+        "usable_hosts": last - first + 1,
+        "gateway": int_to_addr(first, version),
+    }
+
+def gap_info(free_blocks: list[tuple[int, int]], version: int) -> tuple[list[str], list[str]]:
+    """(collapsed CIDR gaps, "first - last" gap ranges) for address-sorted free blocks."""
+    bits = 32 if version == 4 else 128
+    runs = free_runs(free_blocks, bits)
+    gaps = [f"{int_to_addr(b, version)}/{p}" for first, last in runs for b, p in interval_to_cidrs(first, last, bits)]
+    gap_ranges = [f"{int_to_addr(first, version)} - {int_to_addr(last, version)}" for first, last in runs]
+    return gaps, gap_ranges
 
 def allocate_vlsm(base_cidr: str, demands: list[dict]) -> dict:
     """
-    demands: list of {"name": str, "hosts": int}
-    Greedy largest-first allocation with a proper free-list to reduce fragmentation.
+    demands: list of {"name": str, "hosts": int} or {"name": str, "prefix": int}
+    Greedy largest-first allocation on a buddy-system free list to reduce fragmentation.
+    Works for IPv4 and IPv6 base networks. "gaps" lists the free space as collapsed CIDRs,
+    "gap_ranges" as one "first - last" entry per contiguous run.
+    """
+    base = ip_network(base_cidr, strict=True)
+    version = base.version
+    bits = base.max_prefixlen
+    try:
+        wants = [demand_prefix(d, bits) for d in demands]
+    except ValueError as e:
+        return {"ok": False, "error": str(e), "blocks": [], "gaps": [], "gap_ranges": []}
+    # largest block first; equal sizes keep the larger host count (then input order) first
+    order = sorted(range(len(demands)), key=lambda i: (wants[i], -demands[i].get("hosts", 0)))
+
+    pool = BuddyAllocator(bits)
+    pool.add_free(int(base.network_address), base.prefixlen)
+    placed: list[tuple[int, dict, int]] = []
+
+    for i in order:
+        d, want = demands[i], wants[i]
+        if want < base.prefixlen:
+            return {"ok": False, "error": f"No space for {d['name']} (/{want})", "blocks": [], "gaps": [], "gap_ranges": []}
+        addr = pool.allocate(want)
+        if addr is None:
+            return {"ok": False, "error": f"No space for {d['name']} (/{want})", "blocks": [], "gaps": [], "gap_ranges": []}
+        placed.append((addr, d, want))
+
+    # Remaining free blocks are gaps: collapsed CIDRs plus one range per contiguous run
+    gaps, gap_ranges = gap_info(pool.free_blocks(), version)
+
+    blocks = [block_info(d["name"], addr, prefix, version) for addr, d, prefix in sorted(placed, key=lambda x: x[0])]
+
+    return {"ok": True, "error": None, "blocks": blocks, "gaps": gaps, "gap_ranges": gap_ranges}
+
+class VlsmPlan:
+    """
+    Persistent, incrementally edited VLSM plan. Each allocate()/release() only touches its
+    own block: existing assignments never move and released space merges back into the pool.
+    Subnets are placed best-fit to keep large free blocks intact.
     """
-    base: IPv4Network = ip_network(base_cidr, strict=True)
-    reqs = sorted(demands, key=lambda d: d["hosts"], reverse=True)
-
-    free = [base]
-    placed: list[tuple[dict, IPv4Network]] = []
-
-    for d in reqs:
-        want = hosts_to_prefix(d["hosts"])
-        alloc, free = carve(free, want)
-        if alloc is None:
-            return {"ok": False, "error": f"No space for {d['name']} (/{want})", "blocks": [], "gaps": []}
-        placed.append((d, alloc))
-
-    # Remaining free list are gaps
-    gaps = [str(n) for n in sorted(free, key=lambda n: int(ip_address(str(n.network_address))))]
-
-    blocks = []
-    for d, net in sorted(placed, key=lambda x: int(ip_address(str(x[1].network_address)))):
-        total = net.num_addresses
-        usable = max(total - 2, 0) if net.prefixlen < 31 else (2 if net.prefixlen == 31 else 1)
-        gw = f"{list(net.hosts())[0]}" if usable > 0 else str(net.network_address)
-        blocks.append({
-            "name": d["name"],
-            "cidr": f"{net.network_address}/{net.prefixlen}",
-            "usable_hosts": usable,
-            "gateway": gw,
-        })
-
-    return {"ok": True, "error": None, "blocks": blocks, "gaps": gaps}
+
+    def __init__(self, base_cidr: str):
+        base = ip_network(base_cidr, strict=True)
+        self.base_cidr = str(base)
+        self.version = base.version
+        self._pool = BuddyAllocator(base.max_prefixlen)
+        self._pool.add_free(int(base.network_address), base.prefixlen)
+        self._base_prefix = base.prefixlen
+        self._blocks: dict[str, tuple[int, int, dict]] = {}  # name -> (addr, prefix, demand)
+
+    @classmethod
+    def from_demands(cls, base_cidr: str, demands: list[dict]) -> "VlsmPlan":
+        """Start a plan by placing demands largest-first (raises ValueError if one does not fit)."""
+        plan = cls(base_cidr)
+        bits = plan._pool.bits
+        for d in sorted(demands, key=lambda d: (demand_prefix(d, bits), -d.get("hosts", 0))):
+            res = plan.allocate(d["name"], hosts=d.get("hosts"), prefix=d.get("prefix"))
+            if not res["ok"]:
+                raise ValueError(res["error"])
+        return plan
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._blocks
+
+    def allocate(self, name: str, hosts: int | None = None, prefix: int | None = None) -> dict:
+        """Place one subnet. Returns {"ok", "error", "block"}."""
+        if name in self._blocks:
+            return {"ok": False, "error": f"{name} is already allocated", "block": None}
+        if hosts is None and prefix is None:
+            return {"ok": False, "error": "hosts or prefix required", "block": None}
+        demand = {"name": name, "hosts": hosts, "prefix": prefix}
+        try:
+            want = demand_prefix(demand, self._pool.bits)
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": f"Invalid demand for {name}: {e}", "block": None}
+        addr = self._pool.allocate(want, best_fit=True) if want >= self._base_prefix else None
+        if addr is None:
+            return {"ok": False, "error": f"No space for {name} (/{want})", "block": None}
+        self._blocks[name] = (addr, want, {k: v for k, v in demand.items() if v is not None})
+        return {"ok": True, "error": None, "block": block_info(name, addr, want, self.version)}
+
+    def release(self, name: str) -> bool:
+        """Return a subnet to the free pool; False if the name is unknown."""
+        entry = self._blocks.pop(name, None)
+        if entry is None:
+            return False
+        self._pool.add_free(entry[0], entry[1])
+        return True
+
+    def blocks(self) -> list[dict]:
+        return [block_info(name, addr, prefix, self.version)
+                for name, (addr, prefix, _) in sorted(self._blocks.items(), key=lambda kv: kv[1][0])]
+
+    def result(self) -> dict:
+        """Plan in the same shape allocate_vlsm returns."""
+        gaps, gap_ranges = gap_info(self._pool.free_blocks(), self.version)
+        return {"ok": True, "error": None, "blocks": self.blocks(), "gaps": gaps, "gap_ranges": gap_ranges}
+
+    def to_dict(self) -> dict:
+        return {
+            "base": self.base_cidr,
+            "blocks": [dict(demand, cidr=f"{int_to_addr(addr, self.version)}/{prefix}")
+                       for addr, prefix, demand in sorted(self._blocks.values(), key=lambda e: e[0])],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VlsmPlan":
+        plan = cls(data["base"])
+        for entry in data["blocks"]:
+            net = ip_network(entry["cidr"], strict=True)
+            addr = int(net.network_address)
+            if entry["name"] in plan._blocks or not plan._pool.reserve(addr, net.prefixlen):
+                raise ValueError(f"Overlapping or out-of-range block {entry['name']} {entry['cidr']}")
+            demand = {k: v for k, v in entry.items() if k != "cidr"}
+            plan._blocks[entry["name"]] = (addr, net.prefixlen, demand)
+        return plan
+
+    @classmethod
+    def from_json(cls, text: str) -> "VlsmPlan":
+        return cls.from_dict(json.loads(text))
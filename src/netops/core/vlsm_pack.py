@@ -0,0 +1,206 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from ipaddress import ip_network
+
+from .vlsm import BuddyAllocator, block_info, demand_prefix, free_runs, gap_info
+
+STRATEGIES = ("highest", "best-fit", "small-pools-first", "large-pools-first")
+
+def _parse_pools(pools: list[str]) -> tuple[int, list[tuple[int, int]]]:
+    nets = sorted((ip_network(p, strict=True) for p in pools), key=lambda n: int(n.network_address))
+    if not nets:
+        raise ValueError("At least one base pool is required")
+    if len({n.version for n in nets}) != 1:
+        raise ValueError("Pools must be all IPv4 or all IPv6")
+    for a, b in zip(nets, nets[1:]):
+        if int(b.network_address) <= int(a.broadcast_address):
+            raise ValueError(f"Pools {a} and {b} overlap")
+    return nets[0].version, [(int(n.network_address), n.prefixlen) for n in nets]
+
+def _run_strategy(strategy: str, version: int, pools: list, wants: list[int], order: list[int], deadline: float) -> dict:
+    """Pack demands (indices in 'order') with one strategy. Module level so worker processes can run it."""
+    bits = 32 if version == 4 else 128
+    if strategy in ("small-pools-first", "large-pools-first"):
+        # one allocator per pool, visited smallest (longest prefix) or largest first
+        allocs = []
+        for base, prefix in sorted(pools, key=lambda bp: bp[1], reverse=strategy == "small-pools-first"):
+            a = BuddyAllocator(bits)
+            a.add_free(base, prefix)
+            allocs.append(a)
+    else:
+        a = BuddyAllocator(bits)
+        for base, prefix in pools:
+            a.add_free(base, prefix)
+        allocs = [a]
+    rnd = random.Random(int(strategy.split(":", 1)[1])) if strategy.startswith("random:") else None
+    placed, unplaced = [], []
+    for i in order:
+        if time.time() > deadline:
+            return {"strategy": strategy, "timeout": True}
+        want, addr = wants[i], None
+        for a in allocs:
+            if rnd is not None:
+                cands = a.candidates(want)
+                if cands:
+                    addr = rnd.choice(cands)[0]
+                    a.reserve(addr, want)
+            else:
+                addr = a.allocate(want, best_fit=strategy != "highest")
+            if addr is not None:
+                break
+        if addr is None:
+            unplaced.append(i)
+        else:
+            placed.append((addr, i, want))
+    free = sorted(b for a in allocs for b in a.free_blocks())
+    return {"strategy": strategy, "timeout": False, "placed": placed, "unplaced": unplaced, "free": free}
+
+def _metrics(res: dict, wants: list[int], bits: int) -> dict:
+    runs = free_runs(res["free"], bits)
+    sizes = [last - first + 1 for first, last in runs]
+    total_free = sum(sizes)
+    largest = max(sizes, default=0)
+    allocated = sum(1 << (bits - w) for _, _, w in res["placed"])
+    unplaced_addrs = sum(1 << (bits - wants[i]) for i in res["unplaced"])
+    return {
+        "allocated_addresses": allocated,
+        "free_addresses": total_free,
+        "free_runs": len(runs),
+        "free_blocks": len(res["free"]),
+        "largest_free": largest,
+        # 0.0 means all free space is one contiguous run
+        "fragmentation": round(1 - largest / total_free, 6) if total_free else 0.0,
+        "utilisation": round(allocated / (allocated + total_free), 6) if allocated + total_free else 0.0,
+        "unplaced": len(res["unplaced"]),
+        "unplaced_addresses": unplaced_addrs,
+    }
+
+def _score(m: dict) -> tuple:
+    return (m["unplaced_addresses"], m["unplaced"], m["fragmentation"], m["free_blocks"])
+
+def _best_subset(pools: list, wants: list[int], order: list[int], bits: int,
+                 node_limit: int, deadline: float) -> list[int]:
+    """
+    Bounded branch and bound over which demands to keep when not everything fits.
+    Uses free-block counts per prefix: with power-of-two blocks, any fitting placement of
+    a largest-first sequence keeps the same feasibility, so addresses are not needed here.
+    Returns the indices (in 'order') of the subset with the most placed addresses.
+    """
+    seed = BuddyAllocator(bits)
+    for base, prefix in pools:
+        seed.add_free(base, prefix)
+    counts = [0] * (bits + 1)
+    for _, p in seed.free_blocks():
+        counts[p] += 1
+    sizes = [1 << (bits - wants[i]) for i in order]
+    suffix = [0] * (len(order) + 1)
+    for k in range(len(order) - 1, -1, -1):
+        suffix[k] = suffix[k + 1] + sizes[k]
+
+    best_size, best_keep = -1, []
+    keep: list[int] = []
+    undo: list[tuple[int, int]] = []
+    nodes = 0
+    # Iterative DFS; phase 0 = visit (include branch first), 2 = undo include, 1 = exclude branch.
+    stack = [(0, 0, 0)]
+    while stack:
+        k, size, phase = stack.pop()
+        if phase == 2:
+            p, want = undo.pop()
+            for q in range(p + 1, want + 1):
+                counts[q] -= 1
+            counts[p] += 1
+            keep.pop()
+            continue
+        if phase == 1:
+            stack.append((k + 1, size, 0))
+            continue
+        nodes += 1
+        if size > best_size:
+            best_size, best_keep = size, keep.copy()
+        if k == len(order) or size + suffix[k] <= best_size or nodes > node_limit:
+            continue
+        if nodes % 1024 == 0 and time.time() > deadline:
+            break
+        stack.append((k, size, 1))
+        want = wants[order[k]]
+        p = next((q for q in range(want, -1, -1) if counts[q]), None)
+        if p is not None:
+            counts[p] -= 1
+            for q in range(p + 1, want + 1):
+                counts[q] += 1
+            keep.append(order[k])
+            undo.append((p, want))
+            stack.append((k, size, 2))
+            stack.append((k + 1, size + sizes[k], 0))
+    return best_keep
+
+def plan_pools(pools: list[str], demands: list[dict], time_budget: float = 2.0, workers: int | None = None,
+               random_seeds: int = 4, node_limit: int = 200_000) -> dict:
+    """
+    Pack demands ({"name", "hosts"} or {"name", "prefix"}) into a set of base pools.
+    Several greedy strategies run in a process pool (workers=0 runs them in-process) until
+    time_budget seconds pass; if none places everything, a bounded search picks the largest
+    subset that fits. The least fragmented plan wins and is returned with its waste metrics.
+    """
+    try:
+        version, parsed = _parse_pools(pools)
+        bits = 32 if version == 4 else 128
+        wants = [demand_prefix(d, bits) for d in demands]
+    except ValueError as e:
+        return {"ok": False, "error": str(e), "blocks": [], "gaps": [], "gap_ranges": [], "unplaced": [], "metrics": {}}
+    deadline = time.time() + time_budget
+    order = sorted(range(len(demands)), key=lambda i: (wants[i], -(demands[i].get("hosts") or 0)))
+    strategies = list(STRATEGIES) + [f"random:{s}" for s in range(random_seeds)]
+
+    results = []
+    if workers == 0:
+        for s in strategies:
+            if time.time() > deadline and results:
+                break
+            results.append(_run_strategy(s, version, parsed, wants, order, deadline))
+    else:
+        ex = ProcessPoolExecutor(max_workers=workers or min(len(strategies), os.cpu_count() or 1))
+        try:
+            futs = [ex.submit(_run_strategy, s, version, parsed, wants, order, deadline) for s in strategies]
+            done, _ = wait(futs, timeout=max(0.0, deadline - time.time()))
+            results = [f.result() for f in done if f.exception() is None]
+        finally:
+            ex.shutdown(wait=False, cancel_futures=True)
+    results = [r for r in results if not r["timeout"]]
+    if not results:
+        # budget too small for any worker to finish: fall back to the cheapest strategy
+        results = [_run_strategy("highest", version, parsed, wants, order, float("inf"))]
+
+    tried = {r["strategy"]: _metrics(r, wants, bits) for r in results}
+    best = min(results, key=lambda r: (_score(tried[r["strategy"]]), r["strategy"]))
+    searched = False
+    if best["unplaced"]:
+        keep = set(_best_subset(parsed, wants, order, bits, node_limit, deadline))
+        sub_order = [i for i in order if i in keep]
+        for s in STRATEGIES:
+            r = _run_strategy(s, version, parsed, wants, sub_order, float("inf"))
+            r["unplaced"] = [i for i in order if i not in keep]
+            r["strategy"] = f"search+{s}"
+            tried[r["strategy"]] = _metrics(r, wants, bits)
+            if _score(tried[r["strategy"]]) < _score(tried[best["strategy"]]):
+                best = r
+        searched = True
+
+    gaps, gap_ranges = gap_info(best["free"], version)
+    blocks = [block_info(demands[i]["name"], addr, want, version) for addr, i, want in sorted(best["placed"])]
+    unplaced = [demands[i]["name"] for i in best["unplaced"]]
+    return {
+        "ok": not unplaced,
+        "error": f"No space for {', '.join(unplaced)}" if unplaced else None,
+        "strategy": best["strategy"],
+        "searched": searched,
+        "blocks": blocks,
+        "gaps": gaps,
+        "gap_ranges": gap_ranges,
+        "unplaced": unplaced,
+        "metrics": tried[best["strategy"]],
+        "tried": tried,
+    }
@@ -1,33 +1,52 @@
 import wx
 import wx.grid as gridlib
-from ..core.firewall import Rule, Engine, Packet
+from ..core.firewall import Rule, Engine, Packet, CLASSIFIERS, ANALYSIS_KINDS, analyze_rules, replay_pcap
+from ..core.iosparse import parse_acl_file
 from ..utils.tablestyle import style_grid
 from ..utils import validators
+from ..utils.threads import run_in_thread, throttle, CancelToken
+
+def _parse_port(text: str):
+    """None for "any"/empty, an int, or a (first, last) tuple for "first-last". Raises ValueError."""
+    text = text.strip().lower()
+    if not text or text == "any":
+        return None
+    if "-" in text:
+        lo, hi = text.split("-", 1)
+        return int(lo), int(hi)
+    return int(text)
+
+_GRID_IMPORT_LIMIT = 1000  # larger imported ACLs go to the engine only
+_REPLAY_RULE_LINES = 200   # per-rule hit lines listed after a replay
 
 class FirewallPanel(wx.Panel):
     def __init__(self, parent):
         super().__init__(parent)
         self.engine = Engine()
+        self.replay_cancel = None # CancelToken of a running PCAP replay
+        self.grid_stale = False   # an import too large for the grid went to the engine only
         self._build()
 
     def _build(self):
         root = wx.BoxSizer(wx.VERTICAL)
 
         self.grid = gridlib.Grid(self)
-        self.grid.CreateGrid(6, 6)
+        self.grid.CreateGrid(6, 7)
         style_grid(self.grid, row_h=30, def_col_w=150, header_h=26, rowlabel_w=30)
         self.grid.SetColSize(0, 160)
         self.grid.SetColSize(1, 160)
         self.grid.SetColSize(2, 160)
         self.grid.SetColSize(3, 120)
         self.grid.SetColSize(4, 100)
-        self.grid.SetColSize(5, 200)
+        self.grid.SetColSize(5, 120)
+        self.grid.SetColSize(6, 200)
         self.grid.SetColLabelValue(0, "Action (allow/deny)")
         self.grid.SetColLabelValue(1, "Src CIDR")
         self.grid.SetColLabelValue(2, "Dst CIDR")
-        self.grid.SetColLabelValue(3, "Proto (tcp/udp/any)")
-        self.grid.SetColLabelValue(4, "Port (int/any)")
-        self.grid.SetColLabelValue(5, "Comment")
+        self.grid.SetColLabelValue(3, "Proto (tcp,udp/any)")
+        self.grid.SetColLabelValue(4, "Dst port (n/n-m/any)")
+        self.grid.SetColLabelValue(5, "Src port (n/n-m/any)")
+        self.grid.SetColLabelValue(6, "Comment")
         root.Add(self.grid, 1, wx.ALL | wx.EXPAND, 12)
 
         row = wx.BoxSizer(wx.HORIZONTAL)
@@ -35,6 +54,7 @@ class FirewallPanel(wx.Panel):
         self.txt_dst = wx.TextCtrl(self, value="10.0.1.20")
         self.txt_proto = wx.TextCtrl(self, value="tcp")
         self.txt_port = wx.TextCtrl(self, value="22")
+        self.txt_sport = wx.TextCtrl(self, value="40000")
         btn_test = wx.Button(self, label="Test Packet")
         btn_test.Bind(wx.EVT_BUTTON, self.on_test)
         row.Add(wx.StaticText(self, label="Test src:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
@@ -45,6 +65,8 @@ class FirewallPanel(wx.Panel):
         row.Add(self.txt_proto, 0, wx.RIGHT, 8)
         row.Add(wx.StaticText(self, label="port:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
         row.Add(self.txt_port, 0, wx.RIGHT, 8)
+        row.Add(wx.StaticText(self, label="src port:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
+        row.Add(self.txt_sport, 0, wx.RIGHT, 8)
         row.Add(btn_test, 0)
         root.Add(row, 0, wx.LEFT | wx.RIGHT | wx.BOTTOM, 12)
 
@@ -52,24 +74,44 @@ class FirewallPanel(wx.Panel):
         root.Add(self.out, 1, wx.LEFT | wx.RIGHT | wx.BOTTOM | wx.EXPAND, 12)
 
         row2 = wx.BoxSizer(wx.HORIZONTAL)
-        btn_apply = wx.Button(self, label="Apply Rules")
-        btn_reset = wx.Button(self, label="Reset Rules")
-        btn_apply.Bind(wx.EVT_BUTTON, self.on_apply)
-        btn_reset.Bind(wx.EVT_BUTTON, self.on_reset)
-        row2.Add(btn_apply, 0, wx.RIGHT, 8)
-        row2.Add(btn_reset, 0)
+        self.btn_apply = wx.Button(self, label="Apply Rules")
+        self.btn_reset = wx.Button(self, label="Reset Rules")
+        self.btn_analyze = wx.Button(self, label="Analyze Rules")
+        self.btn_apply.Bind(wx.EVT_BUTTON, self.on_apply)
+        self.btn_reset.Bind(wx.EVT_BUTTON, self.on_reset)
+        self.btn_analyze.Bind(wx.EVT_BUTTON, self.on_analyze)
+        self.btn_replay = wx.Button(self, label="Replay PCAP...")
+        self.btn_replay.Bind(wx.EVT_BUTTON, self.on_replay)
+        self.btn_import = wx.Button(self, label="Import ACL...")
+        self.btn_import.Bind(wx.EVT_BUTTON, self.on_import)
+        self.cmb_classifier = wx.Choice(self, choices=list(CLASSIFIERS))
+        self.cmb_classifier.SetSelection(0)
+        self.spin_cache = wx.SpinCtrl(self, min=0, max=10_000_000, initial=65536)
+        self.chk_stateful = wx.CheckBox(self, label="Stateful")
+        self.spin_conntrack = wx.SpinCtrl(self, min=1, max=10_000_000, initial=65536)
+        row2.Add(self.btn_apply, 0, wx.RIGHT, 8)
+        row2.Add(self.btn_reset, 0, wx.RIGHT, 8)
+        row2.Add(self.btn_analyze, 0, wx.RIGHT, 8)
+        row2.Add(self.btn_replay, 0, wx.RIGHT, 8)
+        row2.Add(self.btn_import, 0, wx.RIGHT, 16)
+        row2.Add(wx.StaticText(self, label="Classifier:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
+        row2.Add(self.cmb_classifier, 0, wx.RIGHT, 16)
+        row2.Add(wx.StaticText(self, label="Verdict cache:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
+        row2.Add(self.spin_cache, 0, wx.RIGHT, 16)
+        row2.Add(self.chk_stateful, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
+        row2.Add(wx.StaticText(self, label="Conn table:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
+        row2.Add(self.spin_conntrack, 0)
         root.Add(row2, 0, wx.LEFT | wx.RIGHT | wx.BOTTOM, 12)
 
         self.SetSizer(root)
 
-    def on_apply(self, evt):
+    def _grid_rules(self) -> list[Rule]:
         rules = []
         for r in range(self.grid.GetNumberRows()):
             action = self.grid.GetCellValue(r, 0).strip().lower()
             src = self.grid.GetCellValue(r, 1).strip()
             dst = self.grid.GetCellValue(r, 2).strip()
             proto = self.grid.GetCellValue(r, 3).strip().lower() or "any"
-            port = self.grid.GetCellValue(r, 4).strip().lower() or "any"
             if not action:
                 continue
             if action not in ("allow", "deny"):
@@ -77,35 +119,225 @@ class FirewallPanel(wx.Panel):
             if not src or not dst:
                 continue
             try:
-                port_val = None if port == "any" else int(port)
+                port_val = _parse_port(self.grid.GetCellValue(r, 4))
+                sport_val = _parse_port(self.grid.GetCellValue(r, 5))
             except Exception:
                 continue
             try:
-                rules.append(Rule(action=action, src=src, dst=dst, proto=proto, port=port_val, comment=self.grid.GetCellValue(r, 5)))
+                rules.append(Rule(action=action, src=src, dst=dst, proto=proto, port=port_val,
+                                  comment=self.grid.GetCellValue(r, 6), sport=sport_val))
             except Exception:
                 continue
-        self.engine.set_rules(rules)
-        self.out.SetValue(f"Applied {len(rules)} rules.")
+        return rules
+
+    def on_apply(self, evt):
+        rules = self._grid_rules()
+        # set_rules first: if it rejects a rule the engine keeps its classifier, cache and flows
+        try:
+            self.engine.set_rules(rules)
+            self._set_classifier()
+            self.engine.set_cache(self.spin_cache.GetValue())
+            self.engine.set_conntrack(self.spin_conntrack.GetValue() if self.chk_stateful.GetValue() else 0)
+        except ValueError as e:
+            self.out.SetValue(f"Invalid rule: {e}")
+            return
+        self.grid_stale = False
+        st = self.engine.classifier_stats
+        self.out.SetValue(f"Applied {len(rules)} rules ({st['classifier']}, built in {st['build_seconds'] * 1000:.1f} ms, "
+                          f"~{st['memory_bytes'] / 1024:.0f} KiB, verdict cache {self.engine.cache_size:,} entries"
+                          + (f", stateful with {self.engine.conntrack.max_size:,} flows)." if self.engine.conntrack else ")."))
+
+    def _set_classifier(self):
+        classifier = self.cmb_classifier.GetStringSelection() or "linear"
+        if classifier != self.engine.classifier:  # set_rules already built the current one
+            self.engine.set_classifier(classifier)
+
+    def on_analyze(self, evt):
+        # after an import that bypassed the grid, the grid no longer shows the engine's rules
+        rules = self.engine.rules if self.grid_stale else self._grid_rules()
+        self.btn_analyze.Disable()
+        self.out.SetValue(f"Analyzing {len(rules):,} rules...")
+        run_in_thread(lambda: wx.CallAfter(self._analyze_done, analyze_rules(rules)))
+
+    def _analyze_done(self, res):
+        self.btn_analyze.Enable()
+        if not res["ok"]:
+            self.out.SetValue(f"Invalid rule: {res['error']}")
+            return
+        lines = [f"Analyzed {res['rules']} rules in {res['seconds'] * 1000:.1f} ms."]
+        for kind in ANALYSIS_KINDS:
+            for f in res[kind]:
+                more = f" (+{f['count'] - 1} more)" if f["count"] > 1 else ""
+                lines.append(f"Rule {f['rule']}: {kind}, earlier rule {f['earlier']}{more}")
+        if len(lines) == 1:
+            lines.append("No shadowed, redundant, generalized or correlated rules.")
+        self.out.SetValue("\n".join(lines))
+
+    def on_import(self, evt):
+        with wx.FileDialog(self, "Import Cisco ACLs", wildcard="Config files (*.cfg;*.conf;*.txt)|*.cfg;*.conf;*.txt|All files (*.*)|*.*",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dlg:
+            if dlg.ShowModal() != wx.ID_OK:
+                return
+            path = dlg.GetPath()
+        self.btn_import.Disable()
+        self.btn_replay.Disable()  # the import replaces the engine's rules when it finishes
+        self.out.SetValue(f"Parsing {path}...")
+        run_in_thread(lambda: wx.CallAfter(self._import_done, parse_acl_file(path), path))
+
+    def _import_done(self, res, path):
+        self.btn_import.Enable()
+        self.btn_replay.Enable()
+        if not res["ok"]:
+            self.out.SetValue(f"Import failed: {res['error']}")
+            return
+        names = [n for n, rules in res["acls"].items() if rules]
+        if not names:
+            self.out.SetValue(f"No access lists found in {path}.")
+            return
+        name = names[0]
+        if len(names) > 1:
+            choices = [f"{n} ({res['types'][n]}, {len(res['acls'][n]):,} rules)" for n in names]
+            with wx.SingleChoiceDialog(self, "Access list to load:", "Import ACL", choices) as dlg:
+                if dlg.ShowModal() != wx.ID_OK:
+                    return
+                name = names[dlg.GetSelection()]
+        rules = res["acls"][name]
+        try:
+            self.engine.set_rules(rules)
+            self._set_classifier()
+        except ValueError as e:
+            self.out.SetValue(f"Invalid rule: {e}")
+            return
+        lines = [f"Loaded ACL {name}: {len(rules):,} rules from {res['entries']:,} entries "
+                 f"({res['lines']:,} lines parsed in {res['seconds']:.2f}s)."]
+        self.grid_stale = len(rules) > _GRID_IMPORT_LIMIT
+        if not self.grid_stale:
+            self._fill_grid(rules)
+        else:
+            lines.append("Too many rules for the grid; they are loaded into the engine only (Apply Rules would replace them).")
+        if res["invalid"]:
+            lines.append(f"{res['invalid']:,} lines could not be parsed:")
+            lines += [f"  line {e['line']}: {e['text']} ({e['error']})" for e in res["invalid_examples"]]
+        self.out.SetValue("\n".join(lines))
+
+    def _fill_grid(self, rules: list[Rule]):
+        self.grid.ClearGrid()
+        missing = len(rules) - self.grid.GetNumberRows()
+        if missing > 0:
+            self.grid.AppendRows(missing)
+        for row, r in enumerate(rules):
+            proto = r.proto if isinstance(r.proto, str) else ",".join(r.proto)
+            for col, value in enumerate((r.action, r.src, r.dst, proto, self._port_text(r.port),
+                                         self._port_text(r.sport), r.comment)):
+                self.grid.SetCellValue(row, col, value)
+
+    def on_replay(self, evt):
+        if self.replay_cancel is not None:
+            self.replay_cancel.cancel()
+            return
+        with wx.FileDialog(self, "Replay capture", wildcard="Capture files (*.pcap;*.pcapng;*.cap)|*.pcap;*.pcapng;*.cap|All files (*.*)|*.*",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dlg:
+            if dlg.ShowModal() != wx.ID_OK:
+                return
+            path = dlg.GetPath()
+        self.replay_cancel = CancelToken()
+        self.btn_replay.SetLabel("Cancel replay")
+        # the replay reads the engine from its thread; keep the rules fixed until it finishes
+        for btn in (self.btn_apply, self.btn_reset, self.btn_import):
+            btn.Disable()
+        self.out.SetValue(f"Replaying {path}...")
+        run_in_thread(self._do_replay, path, self.replay_cancel)
+
+    def _do_replay(self, path, token):
+        rules = self.engine.rules
+        def progress(done, total):
+            pct = done * 100 // total if total else 100
+            wx.CallAfter(self.out.SetValue, f"Replaying {path}... {pct}%")
+        res = {"ok": False, "error": "Replay failed"}
+        try:
+            res = replay_pcap(self.engine, path, progress=throttle(progress), cancel=token)
+        except Exception as e:
+            res = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            wx.CallAfter(self._replay_done, res, path, rules)
+
+    def _replay_done(self, res, path, rules):
+        self.replay_cancel = None
+        self.btn_replay.SetLabel("Replay PCAP...")
+        for btn in (self.btn_apply, self.btn_reset, self.btn_import):
+            btn.Enable()
+        if "packets" not in res:
+            self.out.SetValue(f"Replay failed: {res['error']}")
+            return
+        lines = []
+        if not res["ok"]:
+            lines.append(f"Replay stopped: {res['error']}")
+        lines.append(f"{path}: {res['packets']:,} packets ({res['bytes']:,} bytes) in {res['seconds']:.2f}s, "
+                     f"{res['pps']:,.0f} pps")
+        lines.append(f"Evaluated {res['evaluated']:,}, skipped {res['skipped']:,} non-IP; "
+                     f"allowed {res['allowed']:,}, denied {res['denied']:,}")
+        lines.append(f"Implicit deny: {res['implicit_deny']:,} packets, {res['implicit_deny_bytes']:,} bytes")
+        lines.append(self._cache_line(res["cache"]))
+        lines.append(self._conntrack_line(res["conntrack"]))
+        # only rules that matched something; imported ACLs can have hundreds of thousands
+        hit = [idx for idx, hits in enumerate(res["hits"]) if hits]
+        lines.append(f"{len(hit):,} of {len(rules):,} rules matched packets:")
+        for idx in hit[:_REPLAY_RULE_LINES]:
+            r = rules[idx]
+            lines.append(f"Rule {idx} {r.action} {r.src} -> {r.dst} {r.proto} dport {self._port_text(r.port)} "
+                         f"sport {self._port_text(r.sport)}: {res['hits'][idx]:,} packets, {res['hit_bytes'][idx]:,} bytes")
+        if len(hit) > _REPLAY_RULE_LINES:
+            lines.append(f"... {len(hit) - _REPLAY_RULE_LINES:,} more rules with hits not listed")
+        self.out.SetValue("\n".join(lines))
 
     def on_reset(self, evt):
         self.engine.set_rules([])
+        self.grid_stale = False
         self.out.SetValue("Rules cleared.")
 
     def on_test(self, evt):
         src = self.txt_src.GetValue().strip()
         dst = self.txt_dst.GetValue().strip()
         proto = self.txt_proto.GetValue().strip().lower() or "any"
-        port_txt = self.txt_port.GetValue().strip().lower() or "any"
         try:
-            p = None if port_txt == "any" else int(port_txt)
+            p = _parse_port(self.txt_port.GetValue())
+            sp = _parse_port(self.txt_sport.GetValue())
+            if isinstance(p, tuple) or isinstance(sp, tuple):
+                raise ValueError
         except Exception:
             self.out.SetValue("Invalid port.")
             return
-        pkt = Packet(src=src, dst=dst, proto=proto, port=p)
-        verdict, matched = self.engine.evaluate(pkt)
+        pkt = Packet(src=src, dst=dst, proto=proto, port=p, sport=sp)
+        try:
+            verdict, matched = self.engine.evaluate(pkt)
+        except ValueError as e:
+            self.out.SetValue(f"Invalid packet: {e}")
+            return
         lines = [f"Verdict: {verdict}"]
         if matched is not None:
             lines.append(f"Matched rule index: {matched}")
         else:
             lines.append("Matched rule: <implicit deny>")
+        lines.append(self._cache_line(self.engine.cache_stats))
+        lines.append(self._conntrack_line(self.engine.conntrack_stats))
         self.out.SetValue("\n".join(lines))
+
+    @staticmethod
+    def _port_text(port) -> str:
+        if port is None:
+            return "any"
+        return f"{port[0]}-{port[1]}" if isinstance(port, tuple) else str(port)
+
+    @staticmethod
+    def _conntrack_line(st: dict) -> str:
+        if not st["max_size"]:
+            return "Connection tracking: off"
+        return (f"Connection tracking: {st['size']:,}/{st['max_size']:,} flows, {st['hits']:,} established, "
+                f"{st['evictions']:,} evicted, {st['expired']:,} expired, lookup {st['lookup_ns_avg']:,.0f} ns avg")
+
+    @staticmethod
+    def _cache_line(st: dict) -> str:
+        if not st["capacity"]:
+            return "Verdict cache: off"
+        return (f"Verdict cache: {st['hits']:,} hits, {st['misses']:,} misses ({st['hit_rate']:.1%}), "
+                f"{st['size']:,}/{st['capacity']:,} entries")
@@ -1,10 +1,17 @@
+import os
 import wx
 import wx.dataview as dv
-from ..utils.threads import run_in_thread, CancelToken
+from ..utils.threads import run_in_thread, throttle, CancelToken
 from ..core.scanner import icmp as icmp_scan
 from ..core.scanner import arp as arp_scan
 from ..core.scanner import nmap as nmap_scan
+from ..core.scanner import tcp as tcp_scan
+from ..core.scanner import shard as shard_scan
 from ..utils.auto_dv import AutoSizeDVColsMixin
+from ..utils.ratelimit import RateLimiter
+
+# ICMP sweeps this large are spread over one worker process per core
+_SHARD_MIN_HOSTS = 65536
 
 class ScannerPanel(wx.Panel, AutoSizeDVColsMixin):
     def __init__(self, parent):
@@ -28,11 +35,13 @@ class ScannerPanel(wx.Panel, AutoSizeDVColsMixin):
         self.ck_arp = wx.CheckBox(self, label="ARP (LAN)")
         self.ck_icmp = wx.CheckBox(self, label="ICMP Ping")
         self.ck_nmap = wx.CheckBox(self, label="Nmap")
+        self.ck_tcp = wx.CheckBox(self, label="TCP Connect (built-in)")
         self.ck_arp.SetValue(True)
         self.ck_icmp.SetValue(True)
         row2.Add(self.ck_arp, 0, wx.RIGHT, 12)
         row2.Add(self.ck_icmp, 0, wx.RIGHT, 12)
         row2.Add(self.ck_nmap, 0, wx.RIGHT, 12)
+        row2.Add(self.ck_tcp, 0, wx.RIGHT, 12)
         box.Add(row2, 0, wx.LEFT | wx.RIGHT | wx.BOTTOM, 8)
 
         # Nmap options sub-box
@@ -108,59 +117,134 @@ class ScannerPanel(wx.Panel, AutoSizeDVColsMixin):
 
     # Thread-safe log
     def log(self, msg):
-        wx.CallAfter(self.out.AppendText, msg + "\\n")
+        wx.CallAfter(self.out.AppendText, msg + "\n")
 
     def set_progress(self, pct):
         wx.CallAfter(self.g_progress.SetValue, max(0, min(100, int(pct))))
 
+    def _make_limiter(self) -> RateLimiter:
+        # budgets come from the Settings page; without one (e.g. panel used standalone) nothing is limited
+        settings = getattr(self.GetTopLevelParent(), "pages", {}).get("Settings")
+        rate, subnet_rate = settings.rate_limits() if settings is not None else (0.0, 0.0)
+        return RateLimiter(rate, subnet_rate)
+
+    def _rate_line(self, what: str, limiter: RateLimiter) -> str:
+        s = limiter.stats
+        limits = ", ".join(f"{name} {v:g} pps" for name, v in (("global", limiter.rate), ("per subnet", limiter.subnet_rate)) if v)
+        return (f"{what}: {s['sent']:,} probes, {s['pps']:,.1f} pps achieved "
+                f"(limit {limits or 'none'}), queueing delay avg {s['wait_avg_ms']:.1f} ms / max {s['wait_max_ms']:.1f} ms")
+
+    def _host_row(self, src: str, host: dict) -> list[str]:
+        meta = host.get("os") or ""
+        services = ", ".join([f"{s['proto']}/{s['port']} {s['name'] or ''} {s['product'] or ''} {s['version'] or ''}".strip() for s in host.get("services", []) if s.get("state") == "open"])
+        return [src, host.get("ip") or "", meta, services]
+
+    def _port_options(self):
+        ports = self.txt_ports.GetValue().strip() or None
+        try:
+            top_ports = int(self.txt_top.GetValue().strip() or "0") or None
+        except Exception:
+            top_ports = 200
+        return ports, top_ports
+
+    def _append_rows(self, rows):
+        for row in rows:
+            self.dv.AppendItem(row)
+
     def on_run(self, evt):
         targets = [t.strip() for t in self.txt_targets.GetValue().split(",") if t.strip()]
         if not targets:
             self.log("No targets provided.")
             return
+        try:
+            limiter = self._make_limiter()
+        except ValueError as e:
+            self.log(f"Invalid rate limit: {e}")
+            return
         self.dv.DeleteAllItems()
         self.cancel = CancelToken()
         self.btn_run.Disable()
         self.btn_stop.Enable()
         self.set_progress(0)
         self.log("Starting scans...")
-        run_in_thread(self._do_scan, targets, self.cancel)
+        run_in_thread(self._do_scan, targets, self.cancel, limiter)
 
     def on_stop(self, evt):
         if self.cancel:
             self.cancel.cancel()
             self.log("Cancelling...")
 
-    def _do_scan(self, targets, token):
+    def _do_scan(self, targets, token, limiter):
         import wx
         total_steps = 0
         steps_done = 0
 
-        icmp_ips = icmp_scan.expand_targets(targets) if self.ck_icmp.IsChecked() else []
-        total_steps += len(icmp_ips)
+        try:
+            icmp_count = icmp_scan.count_targets(targets) if self.ck_icmp.IsChecked() else 0
+            total_steps += icmp_count
+        except ValueError as e:
+            self.log(f"Invalid target: {e}")
+            wx.CallAfter(self.btn_run.Enable)
+            wx.CallAfter(self.btn_stop.Disable)
+            return
         total_steps += len(targets) if self.ck_arp.IsChecked() else 0
         total_steps += 1 if self.ck_nmap.IsChecked() else 0
+        total_steps += 1 if self.ck_tcp.IsChecked() else 0
         total_steps = max(total_steps, 1)
 
+        def phase_progress(done, total):
+            # the engines report within their phase; each phase fills its share of the gauge
+            self.set_progress((steps_done + (done / total if total else 0)) * 100 / total_steps)
+
         # ICMP
         if self.ck_icmp.IsChecked():
             self.log("ICMP sweep running...")
-            res = icmp_scan.ping_sweep(targets, timeout=1.0, max_workers=64)
-            for r in res:
-                if token.is_cancelled(): break
-                src = "ICMP"
-                ip = r["host"]
-                meta = f"UP rtt={r['rtt_ms']:.2f}ms" if r["up"] and r["rtt_ms"] is not None else ("UP" if r["up"] else "down")
-                wx.CallAfter(self.dv.AppendItem, [src, ip, meta, ""])
-                steps_done += 1
-                self.set_progress(steps_done * 100 / total_steps)
+            # rows reach the UI in batches, at most every 0.2 s, as the sweep streams them in
+            sharded = None
+            if icmp_count >= _SHARD_MIN_HOSTS and (os.cpu_count() or 1) > 1:
+                sharded = shard_scan.ShardedSweep(targets, timeout=1.0, rate=limiter.rate, subnet_rate=limiter.subnet_rate,
+                                                  progress=lambda d, t: self.set_progress(d * 100 / total_steps), cancel=token)
+                self.log(f"Sharding {icmp_count:,} hosts over {sharded.workers} worker processes")
+                sweep = iter(sharded)
+            else:
+                sweep = icmp_scan.iter_ping_sweep(targets, timeout=1.0, max_workers=64, limiter=limiter,
+                                                  progress=lambda d, t: self.set_progress(d * 100 / total_steps), cancel=token)
+            rows = []
+            def flush(done, total):
+                batch = rows[:]
+                rows.clear()
+                wx.CallAfter(self._append_rows, batch)
+            send_rows = throttle(flush)
+            try:
+                for n, r in enumerate(sweep, 1):
+                    if token.is_cancelled(): break
+                    src = "ICMP"
+                    ip = r["host"]
+                    meta = f"UP rtt={r['rtt_ms']:.2f}ms" if r["up"] and r["rtt_ms"] is not None else ("UP" if r["up"] else "down")
+                    rows.append([src, ip, meta, ""])
+                    steps_done += 1
+                    send_rows(n, icmp_count)
+            except Exception as e:
+                self.log(f"ICMP error: {e}")
+            finally:
+                sweep.close()
+            wx.CallAfter(self._append_rows, rows)
+            self.set_progress(steps_done * 100 / total_steps)
+            if sharded is None:
+                self.log(self._rate_line("ICMP", limiter))
+            else:
+                for st in sharded.shard_stats:
+                    self.log(f"ICMP shard {st['shard']} (pid {st['pid']}): {st['chunks']} chunks, {st['hosts']:,} hosts, "
+                             f"{st['up']:,} up, {st['seconds']:.1f}s busy ({st['pps']:,.0f} hosts/s)")
+                self.log(f"ICMP: {steps_done:,} hosts in {sharded.seconds:.1f}s")
 
         # ARP
         if self.ck_arp.IsChecked():
             self.log("ARP scans running...")
+            limiter.reset_stats()
             for t in targets:
                 if token.is_cancelled(): break
-                r = arp_scan.arp_scan(t, timeout=2.0)
+                r = arp_scan.arp_scan(t, timeout=2.0, limiter=limiter, progress=phase_progress, cancel=token)
                 if not r["ok"]:
                     self.log(f"ARP error for {t}: {r['error']}")
                 else:
@@ -169,18 +253,15 @@ class ScannerPanel(wx.Panel, AutoSizeDVColsMixin):
                         wx.CallAfter(self.dv.AppendItem, ["ARP", h["ip"], h["mac"], ""])
                 steps_done += 1
                 self.set_progress(steps_done * 100 / total_steps)
+            self.log(self._rate_line("ARP", limiter))
 
         # Nmap
-        if self.ck_nmap.IsChecked():
+        if self.ck_nmap.IsChecked() and not token.is_cancelled():
             if not nmap_scan.has_nmap():
                 self.log("Nmap not found in PATH. Skipping.")
             else:
                 stype = {0:"syn",1:"connect",2:"udp"}.get(self.cmb_type.GetSelection(), "syn")
-                ports = self.txt_ports.GetValue().strip() or None
-                try:
-                    top_ports = int(self.txt_top.GetValue().strip() or "0") or None
-                except Exception:
-                    top_ports = 200
+                ports, top_ports = self._port_options()
                 r = nmap_scan.run_nmap_xml(
                     targets,
                     scan_type=stype,
@@ -190,19 +271,41 @@ class ScannerPanel(wx.Panel, AutoSizeDVColsMixin):
                     top_ports=top_ports,
                     ports=ports,
                     timing=self.cmb_T.GetValue() or "T3",
+                    max_rate=limiter.rate or None,  # nmap paces itself; it has no per-subnet budget
+                    progress=phase_progress,
+                    cancel=token,
                 )
                 self.log("Nmap cmd: " + r.get("cmd",""))
                 if not r["ok"]:
                     self.log(f"Nmap error: {r['error']}")
                 else:
                     for host in r["hosts"]:
-                        meta = host.get("os") or ""
-                        services = ", ".join([f"{s['proto']}/{s['port']} {s['name'] or ''} {s['product'] or ''} {s['version'] or ''}".strip() for s in host.get("services", []) if s.get("state") == "open"])
-                        wx.CallAfter(self.dv.AppendItem, ["Nmap", host.get("ip") or "", meta, services])
+                        wx.CallAfter(self.dv.AppendItem, self._host_row("Nmap", host))
                 steps_done += 1
                 self.set_progress(steps_done * 100 / total_steps)
 
+        # TCP connect scan without nmap; its hosts have the same shape as nmap's
+        if self.ck_tcp.IsChecked() and not token.is_cancelled():
+            self.log("TCP connect scan running...")
+            limiter.reset_stats()
+            ports, top_ports = self._port_options()
+            r = tcp_scan.tcp_scan(targets, ports=ports, top_ports=top_ports, limiter=limiter,
+                                  on_host=lambda host: wx.CallAfter(self.dv.AppendItem, self._host_row("TCP", host)),
+                                  progress=phase_progress, cancel=token)
+            if not r["ok"]:
+                self.log(f"TCP scan error: {r['error']}")
+            else:
+                st = r["stats"]
+                self.log(f"TCP: {st['probes']:,} probes on {st['ports']:,} ports, {st['open']:,} open, "
+                         f"{st['closed']:,} closed, {st['filtered']:,} filtered in {st['seconds']:.1f}s ({st['pps']:,.0f}/s)")
+                self.log(self._rate_line("TCP", limiter))
+            steps_done += 1
+            self.set_progress(steps_done * 100 / total_steps)
+
         wx.CallAfter(self.btn_run.Enable)
         wx.CallAfter(self.btn_stop.Disable)
-        self.set_progress(100)
-        self.log("Scans finished.")
+        if token.is_cancelled():
+            self.log("Scans cancelled.")
+        else:
+            self.set_progress(100)
+            self.log("Scans finished.")
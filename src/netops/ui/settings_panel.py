@@ -23,7 +23,26 @@ class SettingsPanel(wx.Panel):
         self.txt_rate = wx.TextCtrl(self, value="100")
         f.Add(self.txt_rate, 0, wx.EXPAND)
 
+        f.Add(wx.StaticText(self, label="Per-Subnet Rate Limit (pps, /24 or /64):"), 0)
+        self.txt_subnet_rate = wx.TextCtrl(self, value="")
+        self.txt_subnet_rate.SetHint("unlimited")
+        f.Add(self.txt_subnet_rate, 0, wx.EXPAND)
+
         s.Add(f, 0, wx.ALL | wx.EXPAND, 12)
 
         s.Add(wx.StaticText(self, label="Settings are persisted in a simple config file (to be added)."), 0, wx.LEFT | wx.RIGHT | wx.BOTTOM, 12)
         self.SetSizer(s)
+
+    def rate_limits(self) -> tuple[float, float]:
+        """(global pps, per-subnet pps); blank or 0 means unlimited. Raises ValueError on bad input."""
+        limits = []
+        for label, ctrl in (("Rate Limit", self.txt_rate), ("Per-Subnet Rate Limit", self.txt_subnet_rate)):
+            text = ctrl.GetValue().strip()
+            try:
+                value = float(text) if text else 0.0
+            except ValueError:
+                raise ValueError(f"{label} must be a number of packets per second, got '{text}'")
+            if value < 0:
+                raise ValueError(f"{label} must be >= 0")
+            limits.append(value)
+        return limits[0], limits[1]
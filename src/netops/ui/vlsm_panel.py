@@ -1,13 +1,74 @@
 import wx
 import wx.grid as gridlib
 from ..core import vlsm
-from ..utils import validators
+from ..core import subnetting
+from ..core.subnetting import HostRange
+from ..utils import validators, exporters
 from ..utils.tablestyle import style_grid
+from ..utils.threads import run_in_thread, CancelToken, throttle
 from ipaddress import ip_network
 
+class HostRangeTable(gridlib.GridTableBase):
+    """
+    Virtual table over a HostRange: each cell is computed from its row index on demand,
+    so any subnet size costs the same. wx keeps row counts and scroll extents in C ints,
+    so at most MAX_ROWS rows are exposed at once, starting at 'offset'.
+    """
+    MAX_ROWS = (2**31 - 1) // 32
+
+    def __init__(self):
+        super().__init__()
+        self.hosts = HostRange(range(0), 4)
+        self.gateway = ""
+        self.offset = 0
+        self._rows = 0
+
+    def set_hosts(self, hosts: HostRange, gateway: str = "", offset: int = 0):
+        old = self._rows
+        self.hosts, self.gateway = hosts, gateway
+        self.offset = max(0, min(offset, hosts.size - 1)) if hosts.size else 0
+        self._rows = min(hosts.size - self.offset, self.MAX_ROWS)
+        grid = self.GetView()
+        if grid is None:
+            return
+        grid.BeginBatch()
+        if self._rows < old:
+            grid.ProcessTableMessage(gridlib.GridTableMessage(self, gridlib.GRIDTABLE_NOTIFY_ROWS_DELETED, self._rows, old - self._rows))
+        elif self._rows > old:
+            grid.ProcessTableMessage(gridlib.GridTableMessage(self, gridlib.GRIDTABLE_NOTIFY_ROWS_APPENDED, self._rows - old))
+        grid.EndBatch()
+        grid.ForceRefresh()
+
+    def GetNumberRows(self):
+        return self._rows
+
+    def GetNumberCols(self):
+        return 2
+
+    def GetColLabelValue(self, col):
+        return ("IP", "Flags")[col]
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetValue(self, row, col):
+        if row >= self._rows:
+            return ""
+        ip = self.hosts[self.offset + row]
+        if col == 0:
+            return ip
+        return "gateway" if ip == self.gateway else ""
+
+    def SetValue(self, row, col, value):
+        pass  # read-only
+
+
 class VLSMPanel(wx.Panel):
     def __init__(self, parent):
         super().__init__(parent)
+        self.plan = None          # vlsm.VlsmPlan kept between "Allocate" clicks
+        self.plan_demands = {}    # name -> demand currently placed in self.plan
+        self.export_cancel = None # CancelToken of a running export
         self._build()
 
     def _build(self):
@@ -21,12 +82,15 @@ class VLSMPanel(wx.Panel):
         btn_add = wx.Button(self, label="Add Row")
         btn_del = wx.Button(self, label="Remove Selected")
         btn_calc = wx.Button(self, label="Allocate")
+        btn_reset = wx.Button(self, label="Re-plan")
         btn_add.Bind(wx.EVT_BUTTON, self.on_add)
         btn_del.Bind(wx.EVT_BUTTON, self.on_del)
         btn_calc.Bind(wx.EVT_BUTTON, self.on_calc)
+        btn_reset.Bind(wx.EVT_BUTTON, self.on_replan)
         top.Add(btn_add, 0, wx.RIGHT, 8)
         top.Add(btn_del, 0, wx.RIGHT, 8)
-        top.Add(btn_calc, 0)
+        top.Add(btn_calc, 0, wx.RIGHT, 8)
+        top.Add(btn_reset, 0)
         root.Add(top, 0, wx.ALL, 12)
 
         # Demand grid (input)
@@ -34,7 +98,7 @@ class VLSMPanel(wx.Panel):
         self.grid.CreateGrid(5, 2)
         style_grid(self.grid, row_h=32, def_col_w=160, header_h=28, rowlabel_w=30)
         self.grid.SetColLabelValue(0, "Subnet Name")
-        self.grid.SetColLabelValue(1, "Required Hosts")
+        self.grid.SetColLabelValue(1, "Hosts or /prefix")
         self.grid.SetColSize(0, 220)
         self.grid.SetColSize(1, 140)
         for r in range(5):
@@ -70,18 +134,22 @@ class VLSMPanel(wx.Panel):
         # IPs grid + controls
         s2 = wx.BoxSizer(wx.VERTICAL)
         bar = wx.BoxSizer(wx.HORIZONTAL)
-        bar.Add(wx.StaticText(p2, label="Max IPs to display:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
-        self.spin_max = wx.SpinCtrl(p2, min=1, max=200000, initial=4096)
-        bar.Add(self.spin_max, 0, wx.RIGHT, 12)
+        bar.Add(wx.StaticText(p2, label="Go to IP:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 6)
+        self.txt_goto = wx.TextCtrl(p2, size=(220, -1), style=wx.TE_PROCESS_ENTER)
+        bar.Add(self.txt_goto, 0, wx.RIGHT, 12)
+        self.lbl_count = wx.StaticText(p2, label="")
+        bar.Add(self.lbl_count, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 12)
         self.btn_export = wx.Button(p2, label="Export CSV (selected subnet)")
-        bar.Add(self.btn_export, 0)
+        bar.Add(self.btn_export, 0, wx.RIGHT, 8)
+        self.btn_export_plan = wx.Button(p2, label="Export plan")
+        bar.Add(self.btn_export_plan, 0)
         s2.Add(bar, 0, wx.ALL, 8)
 
         self.grid_ips = gridlib.Grid(p2)
-        self.grid_ips.CreateGrid(0, 2)
+        self.ips_table = HostRangeTable()
+        self.grid_ips.SetTable(self.ips_table, True)
+        self.grid_ips.EnableEditing(False)
         style_grid(self.grid_ips, row_h=26, def_col_w=180, header_h=26, rowlabel_w=0)
-        self.grid_ips.SetColLabelValue(0, "IP")
-        self.grid_ips.SetColLabelValue(1, "Flags")
         self.grid_ips.SetColSize(0, 220)
         self.grid_ips.SetColSize(1, 120)
         s2.Add(self.grid_ips, 1, wx.ALL | wx.EXPAND, 8)
@@ -100,6 +168,8 @@ class VLSMPanel(wx.Panel):
         # Events
         self.grid_alloc.Bind(gridlib.EVT_GRID_SELECT_CELL, self.on_select_alloc)
         self.btn_export.Bind(wx.EVT_BUTTON, self.on_export)
+        self.btn_export_plan.Bind(wx.EVT_BUTTON, self.on_export_plan)
+        self.txt_goto.Bind(wx.EVT_TEXT_ENTER, self.on_goto)
 
     def on_add(self, evt):
         self.grid.AppendRows(1)
@@ -118,23 +188,31 @@ class VLSMPanel(wx.Panel):
     def on_calc(self, evt):
         base = self.txt_base.GetValue().strip()
         if not validators.is_network_cidr(base):
-            self.out.SetValue("Invalid base network CIDR. Example: 10.20.0.0/20")
+            self.out.SetValue("Invalid base network CIDR. Example: 10.20.0.0/20 or 2001:db8::/48")
             return
         demands = []
         for r in range(self.grid.GetNumberRows()):
             name = self.grid.GetCellValue(r, 0).strip() or f"net{r+1}"
+            want = self.grid.GetCellValue(r, 1).strip()
+            if want.startswith("/"):
+                # explicit prefix length, e.g. /64
+                try:
+                    demands.append({"name": name, "prefix": int(want[1:])})
+                except ValueError:
+                    pass
+                continue
             try:
-                hosts = int(self.grid.GetCellValue(r, 1).strip())
+                hosts = int(want)
             except ValueError:
                 continue
             if hosts <= 0:
                 continue
             demands.append({"name": name, "hosts": hosts})
         if not demands:
-            self.out.SetValue("Please add at least one subnet row with hosts > 0.")
+            self.out.SetValue("Please add at least one subnet row with hosts > 0 or a /prefix.")
             return
 
-        plan = vlsm.allocate_vlsm(base, demands)
+        plan = self._update_plan(base, demands)
         if not plan["ok"]:
             self.out.SetValue("Allocation failed: " + plan["error"])
             return
@@ -146,8 +224,7 @@ class VLSMPanel(wx.Panel):
             self.grid_alloc.DeleteRows(0, self.grid_alloc.GetNumberRows())
         self.alloc_blocks = plan["blocks"]
         for blk in self.alloc_blocks:
-            n = ip_network(blk["cidr"], strict=True)
-            first, last = self._first_last(n)
+            first, last = self._first_last(blk["cidr"])
             r = self.grid_alloc.GetNumberRows()
             self.grid_alloc.AppendRows(1)
             self.grid_alloc.SetCellValue(r, 0, blk["name"])
@@ -162,8 +239,8 @@ class VLSMPanel(wx.Panel):
         for blk in plan["blocks"]:
             lines.append(f" - {blk['name']:<10} {blk['cidr']:<18} hosts≈{blk['usable_hosts']} gw={blk['gateway']}")
         if plan["gaps"]:
-            lines.append("Gaps:")
-            for g in plan["gaps"]:
+            lines.append(f"Gaps ({len(plan['gaps'])} free blocks):")
+            for g in plan["gap_ranges"]:
                 lines.append(f"   {g}")
         self.out.SetValue("\\n".join(lines))
 
@@ -172,19 +249,48 @@ class VLSMPanel(wx.Panel):
             self.grid_alloc.SetGridCursor(0,0)
             self.on_select_alloc(None)
 
-    def _first_last(self, net):
-        # Determine first/last usable depending on prefix
-        if net.prefixlen == 32:
-            ip = str(net.network_address)
-            return ip, ip
-        elif net.prefixlen == 31:
-            hosts = list(net.hosts())
-            return str(hosts[0]), str(hosts[1])
-        else:
-            hosts = list(net.hosts())
-            if not hosts:
-                return None, None
-            return str(hosts[0]), str(hosts[-1])
+    def on_replan(self, evt):
+        # Forget the current plan so the next Allocate packs everything from scratch.
+        self.plan = None
+        self.plan_demands = {}
+        self.on_calc(evt)
+
+    def _update_plan(self, base, demands):
+        """Apply the grid to the kept plan: only new, changed or removed rows are touched."""
+        if self.plan is None or self.plan.base_cidr != str(ip_network(base, strict=True)):
+            try:
+                self.plan = vlsm.VlsmPlan.from_demands(base, demands)
+            except ValueError as e:
+                self.plan = None
+                self.plan_demands = {}
+                return {"ok": False, "error": str(e)}
+            self.plan_demands = {d["name"]: d for d in demands}
+            return self.plan.result()
+        wanted = {d["name"]: d for d in demands}
+        for name, d in list(self.plan_demands.items()):
+            if wanted.get(name) != d:
+                self.plan.release(name)
+                del self.plan_demands[name]
+        errors = []
+        bits = 32 if self.plan.version == 4 else 128
+        todo = [d for name, d in wanted.items() if name not in self.plan_demands]
+        try:
+            todo.sort(key=lambda d: (vlsm.demand_prefix(d, bits), -d.get("hosts", 0)))
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        for d in todo:
+            res = self.plan.allocate(d["name"], hosts=d.get("hosts"), prefix=d.get("prefix"))
+            if res["ok"]:
+                self.plan_demands[d["name"]] = d
+            else:
+                errors.append(res["error"])
+        if errors:
+            return {"ok": False, "error": "; ".join(errors)}
+        return self.plan.result()
+
+    def _first_last(self, cidr):
+        hosts = HostRange.from_cidr(cidr)
+        return hosts.first, hosts.last
 
     def on_select_alloc(self, evt):
         row = self.grid_alloc.GetGridCursorRow()
@@ -194,68 +300,83 @@ class VLSMPanel(wx.Panel):
         gw = self.grid_alloc.GetCellValue(row, 3)
         self.load_ips_for_subnet(cidr, gw)
 
-    def load_ips_for_subnet(self, cidr: str, gateway: str):
-        n = ip_network(cidr, strict=True)
-        # Compute generator of usable IPs
-        def gen_hosts():
-            if n.prefixlen == 32:
-                yield n.network_address
-            elif n.prefixlen == 31:
-                for h in n.hosts():
-                    yield h
-            else:
-                for h in n.hosts():
-                    yield h
-
-        limit = int(self.spin_max.GetValue() or 4096)
-        # reset grid
-        if self.grid_ips.GetNumberRows():
-            self.grid_ips.DeleteRows(0, self.grid_ips.GetNumberRows())
-        count = 0
-        for ip in gen_hosts():
-            flag = "gateway" if str(ip) == gateway else ""
-            r = self.grid_ips.GetNumberRows()
-            self.grid_ips.AppendRows(1)
-            self.grid_ips.SetCellValue(r, 0, str(ip))
-            self.grid_ips.SetCellValue(r, 1, flag)
-            count += 1
-            if count >= limit:
-                break
-        if count >= limit:
-            # add a note row
-            r = self.grid_ips.GetNumberRows()
-            self.grid_ips.AppendRows(1)
-            self.grid_ips.SetCellValue(r, 0, f"... ({n.num_addresses} total addresses; showing first {limit} usable entries)")
-            self.grid_ips.SetCellValue(r, 1, "")
+    def load_ips_for_subnet(self, cidr: str, gateway: str, offset: int = 0):
+        hosts = HostRange.from_cidr(cidr)
+        self.ips_table.set_hosts(hosts, gateway, offset)
+        shown = self.ips_table.GetNumberRows()
+        if shown < hosts.size:
+            self.lbl_count.SetLabel(f"{hosts.size} usable; rows {self.ips_table.offset + 1}-{self.ips_table.offset + shown}")
+        else:
+            self.lbl_count.SetLabel(f"{hosts.size} usable")
+
+    def on_goto(self, evt):
+        row = self.grid_alloc.GetGridCursorRow()
+        if row < 0 or row >= self.grid_alloc.GetNumberRows():
+            return
+        cidr = self.grid_alloc.GetCellValue(row, 1)
+        hosts = HostRange.from_cidr(cidr)
+        target = self.txt_goto.GetValue().strip()
+        if target not in hosts:
+            self.lbl_count.SetLabel(f"{target} is not a usable address of {cidr}")
+            return
+        index = subnetting.parse_cidr_int(target)[1] - hosts.int_at(0)
+        table = self.ips_table
+        if not table.offset <= index < table.offset + table.GetNumberRows():
+            # outside the exposed window: re-base it so the address is near the top
+            self.load_ips_for_subnet(cidr, self.grid_alloc.GetCellValue(row, 3), max(0, index - 1000))
+        r = index - table.offset
+        self.grid_ips.MakeCellVisible(r, 0)
+        self.grid_ips.SetGridCursor(r, 0)
 
     def on_export(self, evt):
+        if self.export_cancel is not None:
+            self.export_cancel.cancel()
+            return
         row = self.grid_alloc.GetGridCursorRow()
         if row < 0 or row >= self.grid_alloc.GetNumberRows():
             return
         cidr = self.grid_alloc.GetCellValue(row, 1)
         gw = self.grid_alloc.GetCellValue(row, 3)
-        with wx.FileDialog(self, "Export IPs to CSV", wildcard="CSV files (*.csv)|*.csv",
+        self._start_export([{"cidr": cidr, "gateway": gw}])
+
+    def on_export_plan(self, evt):
+        if self.export_cancel is not None:
+            self.export_cancel.cancel()
+            return
+        if not getattr(self, "alloc_blocks", None):
+            return
+        self._start_export(self.alloc_blocks)
+
+    def _start_export(self, blocks):
+        with wx.FileDialog(self, "Export IPs", wildcard="CSV files (*.csv)|*.csv|JSON Lines (*.jsonl)|*.jsonl",
                            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dlg:
             if dlg.ShowModal() != wx.ID_OK:
                 return
             path = dlg.GetPath()
-        # create CSV
-        import csv
-        n = ip_network(cidr, strict=True)
-        limit = int(self.spin_max.GetValue() or 4096)
-        with open(path, "w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["ip", "flags"])
-            count = 0
-            if n.prefixlen == 32:
-                w.writerow([str(n.network_address), "gateway" if str(n.network_address)==gw else ""])
-            elif n.prefixlen == 31:
-                for h in n.hosts():
-                    if count >= limit: break
-                    w.writerow([str(h), "gateway" if str(h)==gw else ""])
-                    count += 1
-            else:
-                for h in n.hosts():
-                    if count >= limit: break
-                    w.writerow([str(h), "gateway" if str(h)==gw else ""])
-                    count += 1
+        fmt = "jsonl" if path.lower().endswith(".jsonl") else "csv"
+        self.export_cancel = CancelToken()
+        self.btn_export.SetLabel("Cancel export")
+        self.btn_export_plan.SetLabel("Cancel export")
+        run_in_thread(self._do_export, path, blocks, fmt, self.export_cancel)
+
+    def _do_export(self, path, blocks, fmt, token):
+        def progress(done, total):
+            pct = done * 100 // total if total else 100
+            wx.CallAfter(self.lbl_count.SetLabel, f"Exporting... {done:,} rows ({pct}%)")
+        res = {"ok": False, "error": "Export failed", "rows": 0}
+        try:
+            res = exporters.export_hosts(path, blocks, fmt=fmt, progress=throttle(progress), cancel=token)
+        except Exception as e:
+            res = {"ok": False, "error": f"{type(e).__name__}: {e}", "rows": 0}
+        finally:
+            # always hand the buttons back, whatever happened to the export
+            wx.CallAfter(self._export_done, res, path)
+
+    def _export_done(self, res, path):
+        self.export_cancel = None
+        self.btn_export.SetLabel("Export CSV (selected subnet)")
+        self.btn_export_plan.SetLabel("Export plan")
+        if res["ok"]:
+            self.lbl_count.SetLabel(f"Exported {res['rows']:,} rows to {path} in {res['seconds']:.1f}s")
+        else:
+            self.lbl_count.SetLabel(f"Export stopped after {res['rows']:,} rows: {res['error']}")
@@ -1,5 +1,6 @@
-import json, csv
+import json, csv, time
 from pathlib import Path
+from ..core.subnetting import HostRange, parse_cidr_int
 
 def to_json(path: str, data):
     Path(path).write_text(json.dumps(data, indent=2))
@@ -14,3 +15,78 @@ def to_csv(path: str, rows: list[dict]):
         w.writeheader()
         for r in rows:
             w.writerow(r)
+
+def _csv_field(text: str) -> str:
+    if any(c in text for c in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+def _write_rows(f, ips: list[str], head: str, tail: str):
+    if ips:
+        f.write(head + (tail + head).join(ips) + tail)
+
+def export_hosts(path: str, blocks: list[dict], fmt: str = "csv", batch: int = 65536,
+                 progress=None, cancel=None, limit: int | None = None) -> dict:
+    """
+    Stream every usable address of the given blocks ({"cidr", optional "name"/"gateway"},
+    e.g. allocate_vlsm()["blocks"]) to CSV or JSONL. Addresses are formatted in integer
+    batches and written through a large buffer. progress(done, total) is called once per
+    batch; a CancelToken stops the export between batches. File errors are returned, not raised.
+    Returns {"ok", "error", "rows", "cancelled", "seconds"}.
+    """
+    if fmt not in ("csv", "jsonl"):
+        return {"ok": False, "error": f"Unknown format {fmt!r}", "rows": 0, "cancelled": False, "seconds": 0.0}
+    t0 = time.perf_counter()
+    named = len(blocks) != 1 or "name" in blocks[0]
+    try:
+        ranges = [HostRange.from_cidr(b["cidr"]) for b in blocks]
+    except ValueError as e:
+        return {"ok": False, "error": str(e), "rows": 0, "cancelled": False, "seconds": 0.0}
+    total = sum(r.size for r in ranges)
+    if limit is not None:
+        total = min(total, limit)
+    done = 0
+    try:
+        with open(path, "w", buffering=1 << 20, newline="") as f:
+            if fmt == "csv":
+                f.write("subnet,ip,flags\n" if named else "ip,flags\n")
+            for blk, hosts in zip(blocks, ranges):
+                gw_txt = blk.get("gateway") or ""
+                try:
+                    gw = parse_cidr_int(gw_txt)[1] if gw_txt else None
+                except ValueError:
+                    gw = None
+                name = blk.get("name") or blk["cidr"]
+                if fmt == "csv":
+                    head = _csv_field(name) + "," if named else ""
+                    tail, gw_tail = ",\n", ",gateway\n"
+                else:
+                    head = '{"subnet": ' + json.dumps(name) + ', "ip": "' if named else '{"ip": "'
+                    tail, gw_tail = '", "flags": ""}\n', '", "flags": "gateway"}\n'
+                start = 0
+                for chunk in hosts.iter_batches(batch):
+                    if cancel is not None and cancel.is_cancelled():
+                        return {"ok": False, "error": "Cancelled", "rows": done, "cancelled": True,
+                                "seconds": time.perf_counter() - t0}
+                    if limit is not None and done + len(chunk) > limit:
+                        chunk = chunk[:limit - done]
+                    # the gateway is at most one row per block; find it by index, not by comparing strings
+                    idx = gw - hosts.int_at(0) - start if gw is not None else -1
+                    if 0 <= idx < len(chunk):
+                        _write_rows(f, chunk[:idx], head, tail)
+                        f.write(head + chunk[idx] + gw_tail)
+                        _write_rows(f, chunk[idx + 1:], head, tail)
+                    else:
+                        _write_rows(f, chunk, head, tail)
+                    start += len(chunk)
+                    done += len(chunk)
+                    if progress is not None:
+                        progress(done, total)
+                    if limit is not None and done >= limit:
+                        break
+                if limit is not None and done >= limit:
+                    break
+    except OSError as e:  # bad path, permission denied, disk full
+        return {"ok": False, "error": str(e), "rows": done, "cancelled": False,
+                "seconds": time.perf_counter() - t0}
+    return {"ok": True, "error": None, "rows": done, "cancelled": False, "seconds": time.perf_counter() - t0}
@@ -0,0 +1,139 @@
+import asyncio
+import ipaddress
+import threading
+import time
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations: taking tokens always succeeds, may leave the
+    bucket in debt, and returns how long the caller has to wait before its packet may go.
+    Debt is paid back by the refill, so successive callers get evenly spaced send times.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float | None = None, now: float | None = None):
+        if rate <= 0:
+            raise ValueError("Rate must be > 0")
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate / 20)  # 50 ms worth of packets
+        self.tokens = self.burst
+        self.stamp = time.monotonic() if now is None else now
+
+    def reserve(self, n: float, now: float) -> float:
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= n
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def idle(self, now: float) -> bool:
+        return self.tokens + (now - self.stamp) * self.rate >= self.burst
+
+class RateLimiter:
+    """
+    Shared packets-per-second budget for the scanners: one global bucket plus one bucket per
+    target subnet (/24 for IPv4, /64 for IPv6 by default). A rate of 0 means no limit. Probes
+    from any number of threads call acquire(), coroutines await acquire_async(); both first wait
+    for the subnet's bucket and only then take global tokens, so probes held back by a slow
+    subnet do not use up the global budget meanwhile. Achieved rate and queueing delay are
+    kept in stats.
+    """
+
+    _PRUNE_AT = 4096
+
+    def __init__(self, rate: float = 0, subnet_rate: float = 0, burst: float | None = None,
+                 prefix_v4: int = 24, prefix_v6: int = 64):
+        self.rate = rate
+        self.subnet_rate = subnet_rate
+        self.burst = burst
+        self.shift = {4: 32 - prefix_v4, 6: 128 - prefix_v6}
+        self._lock = threading.Lock()
+        self._global = TokenBucket(rate, burst) if rate > 0 else None
+        self._subnets: dict[tuple[int, int], TokenBucket] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.sent = 0
+            self._wait_total = self._wait_max = 0.0
+            self._first = self._last = None
+
+    def _subnet(self, target: str, now: float) -> TokenBucket | None:
+        try:
+            ip = ipaddress.ip_address(target)
+        except ValueError:  # hostnames only count against the global budget
+            return None
+        key = (ip.version, int(ip) >> self.shift[ip.version])
+        bucket = self._subnets.get(key)
+        if bucket is None:
+            if len(self._subnets) >= self._PRUNE_AT:
+                self._subnets = {k: b for k, b in self._subnets.items() if not b.idle(now)}
+            bucket = self._subnets[key] = TokenBucket(self.subnet_rate, self.burst, now)
+        return bucket
+
+    def _sent(self, n: int, now: float, delay: float, waited: float):
+        self.sent += n
+        self._wait_total += (waited + delay) * n
+        self._wait_max = max(self._wait_max, waited + delay)
+        if self._first is None:
+            self._first = now + delay
+        self._last = max(self._last or 0.0, now + delay)
+
+    def reserve(self, target: str | None = None, n: int = 1, now: float | None = None) -> tuple[float, bool]:
+        """
+        Takes n tokens for a probe to target: (delay in seconds before sending it, done). When
+        done is False the probe's subnet holds it back and no global tokens were taken yet; call
+        reserve_global() once the delay has passed.
+        """
+        with self._lock:
+            now = time.monotonic() if now is None else now
+            if self.subnet_rate > 0 and target is not None:
+                bucket = self._subnet(target, now)
+                delay = bucket.reserve(n, now) if bucket is not None else 0.0
+                if delay > 0 and self._global is not None:
+                    return delay, False
+            else:
+                delay = 0.0
+            delay = max(delay, self._global.reserve(n, now) if self._global is not None else 0.0)
+            self._sent(n, now, delay, 0.0)
+            return delay, True
+
+    def reserve_global(self, n: int = 1, now: float | None = None, waited: float = 0.0) -> float:
+        """Second step after reserve() returned done=False: takes the global tokens, returns the further delay."""
+        with self._lock:
+            now = time.monotonic() if now is None else now
+            delay = self._global.reserve(n, now) if self._global is not None else 0.0
+            self._sent(n, now, delay, waited)
+            return delay
+
+    def acquire(self, target: str | None = None, n: int = 1) -> float:
+        """Blocks until a probe to target may be sent; returns the time waited."""
+        delay, done = self.reserve(target, n)
+        if delay > 0:
+            time.sleep(delay)
+        if not done:
+            more = self.reserve_global(n, waited=delay)
+            if more > 0:
+                time.sleep(more)
+            delay += more
+        return delay
+
+    async def acquire_async(self, target: str | None = None, n: int = 1) -> float:
+        delay, done = self.reserve(target, n)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not done:
+            more = self.reserve_global(n, waited=delay)
+            if more > 0:
+                await asyncio.sleep(more)
+            delay += more
+        return delay
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            span = (self._last - self._first) if self.sent > 1 else 0.0
+            return {"sent": self.sent, "seconds": span,
+                    "pps": (self.sent - 1) / span if span > 0 else 0.0,
+                    "wait_avg_ms": self._wait_total / self.sent * 1e3 if self.sent else 0.0,
+                    "wait_max_ms": self._wait_max * 1e3, "subnets": len(self._subnets)}
@@ -13,3 +13,20 @@ def run_in_thread(func, *args, **kwargs):
     t = threading.Thread(target=func, args=args, kwargs=kwargs, daemon=True)
     t.start()
     return t
+
+def throttle(progress, interval: float = 0.2):
+    """
+    Wraps a progress(done, total) callback so it fires at most once per interval seconds;
+    the final call (done >= total) always goes through. None stays None.
+    """
+    if progress is None:
+        return None
+    last = 0.0
+
+    def call(done, total):
+        nonlocal last
+        now = time.monotonic()
+        if done >= total or now - last >= interval:
+            last = now
+            progress(done, total)
+    return call
@@ -0,0 +1,38 @@
+from netops.utils.exporters import export_hosts
+
+def test_export_hosts(tmp_path):
+    path = tmp_path / "plan.csv"
+    blocks = [{"name": "a,b", "cidr": "10.0.0.0/30", "gateway": "10.0.0.1"}, {"name": "c", "cidr": "10.0.1.0/31"}]
+    res = export_hosts(str(path), blocks)
+    assert res["ok"] and res["rows"] == 4
+    assert path.read_text().splitlines() == ['subnet,ip,flags', '"a,b",10.0.0.1,gateway', '"a,b",10.0.0.2,',
+                                             'c,10.0.1.0,', 'c,10.0.1.1,']
+
+def test_export_hosts_jsonl(tmp_path):
+    import json
+    path = tmp_path / "subnet.jsonl"
+    res = export_hosts(str(path), [{"cidr": "192.168.5.0/29", "gateway": "192.168.5.6"}], fmt="jsonl")
+    assert res["ok"] and res["rows"] == 6
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert rows[0] == {"ip": "192.168.5.1", "flags": ""}
+    assert rows[-1] == {"ip": "192.168.5.6", "flags": "gateway"} and len(rows) == 6
+
+def test_export_hosts_progress_and_cancel(tmp_path):
+    from netops.utils.threads import CancelToken
+    token, calls = CancelToken(), []
+    def progress(done, total):
+        calls.append((done, total))
+        if done >= 200:
+            token.cancel()
+    res = export_hosts(str(tmp_path / "big.csv"), [{"cidr": "10.0.0.0/16"}], batch=100,
+                       progress=progress, cancel=token)
+    assert res["cancelled"] and not res["ok"] and res["rows"] == 200
+    assert calls == [(100, 65534), (200, 65534)]
+    calls = []
+    res = export_hosts(str(tmp_path / "small.csv"), [{"cidr": "10.0.0.0/24"}], batch=100,
+                       progress=lambda done, total: calls.append((done, total)))
+    assert res["ok"] and res["rows"] == 254 and calls[-1] == (254, 254)
+
+def test_export_hosts_file_error(tmp_path):
+    res = export_hosts(str(tmp_path / "missing" / "out.csv"), [{"cidr": "10.0.0.0/30"}])
+    assert not res["ok"] and not res["cancelled"] and res["error"]
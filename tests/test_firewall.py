@@ -0,0 +1,165 @@
+import pytest
+
+from netops.core.firewall import Engine, Packet, Rule
+
+def test_first_match_and_implicit_deny():
+    eng = Engine()
+    eng.set_rules([
+        Rule("deny", "10.0.0.0/24", "10.0.1.0/24", "tcp", 23),
+        Rule("allow", "10.0.0.0/16", "10.0.1.0/24", "tcp", None),
+        Rule("allow", "2001:db8::/32", "2001:db8::/32", "any", None),
+        Rule("allow", "0.0.0.0/0", "10.0.1.20/32", "udp", 53),
+    ])
+    assert eng.evaluate(Packet("10.0.0.10", "10.0.1.20", "tcp", 23)) == ("deny", 0)
+    assert eng.evaluate(Packet("10.0.0.10", "10.0.1.20", "tcp", 22)) == ("allow", 1)
+    assert eng.evaluate(Packet("10.0.0.10", "10.0.1.20", "udp", 53)) == ("allow", 3)
+    assert eng.evaluate(Packet("10.0.0.10", "10.0.1.20", "udp", None)) == ("deny", None)
+    assert eng.evaluate(Packet("2001:db8::1", "2001:db8::2", "icmp", None)) == ("allow", 2)
+    assert eng.evaluate(Packet("192.168.0.1", "10.0.1.20", "tcp", 22)) == ("deny", None)
+
+def test_invalid_rule_rejected_at_set_rules():
+    eng = Engine()
+    with pytest.raises(ValueError):
+        eng.set_rules([Rule("allow", "10.0.0.0/33", "any", "tcp", None)])
+
+def test_evaluate_many_matches_evaluate():
+    eng = Engine()
+    eng.set_rules([
+        Rule("deny", "10.0.0.0/24", "10.0.1.0/24", "tcp", 23),
+        Rule("allow", "10.0.0.0/16", "10.0.1.0/24", "tcp", None),
+        Rule("allow", "2001:db8::/32", "2001:db8::/32", "any", None),
+        Rule("allow", "0.0.0.0/0", "10.0.1.20/32", "udp", 53),
+    ])
+    packets = [("10.0.0.10", "10.0.1.20", "tcp", 23), ("10.0.0.10", "10.0.1.20", "tcp", 22),
+               ("10.0.0.10", "10.0.1.20", "udp", 53), ("10.0.0.10", "10.0.1.20", "udp", None),
+               ("2001:db8::1", "2001:db8::2", "icmp", None), ("192.168.0.1", "10.0.1.20", "tcp", 22)]
+    expected = [eng.evaluate(Packet(*p)) for p in packets]
+    verdicts, matched = eng.evaluate_many(*zip(*packets))
+    assert [(v, None if m < 0 else m) for v, m in zip(list(verdicts), list(matched))] == expected
+    chunks = list(eng.evaluate_stream(iter(packets), chunk=4))
+    assert [int(m) for _, ms in chunks for m in ms] == [int(m) for m in matched]
+
+def test_tree_classifier_matches_linear():
+    rules = [Rule("deny", f"10.{i % 7}.{i}.0/24", f"172.16.{i % 5}.0/24", ("tcp", "udp", "any")[i % 3],
+                  (22, 80, None)[i % 3]) for i in range(60)]
+    rules += [Rule("allow", "0.0.0.0/0", "172.16.0.0/16", "tcp", 443), Rule("deny", "2001:db8::/32", "0.0.0.0/0", "any", None)]
+    linear, tree = Engine(), Engine(classifier="tree")
+    linear.set_rules(rules)
+    tree.set_rules(rules)
+    assert tree.classifier_stats["classifier"] == "tree" and tree.classifier_stats["leaves"] > 1
+    packets = [Packet(f"10.{i % 7}.{i}.9", f"172.16.{i % 5}.1", ("tcp", "udp")[i % 2], (22, 80, 443)[i % 3])
+               for i in range(70)] + [Packet("2001:db8::1", "10.0.0.1", "udp", 53)]
+    assert [tree.evaluate(p) for p in packets] == [linear.evaluate(p) for p in packets]
+    tree.set_classifier("linear")
+    assert tree.classifier_stats["classifier"] == "linear"
+
+def test_analyze_rules():
+    from netops.core.firewall import analyze_rules
+    rules = [
+        Rule("allow", "10.0.0.0/16", "0.0.0.0/0", "tcp", None),
+        Rule("deny", "10.0.1.0/24", "172.16.0.0/24", "tcp", 22),    # shadowed by 0
+        Rule("allow", "10.0.2.0/24", "172.16.0.0/24", "tcp", 80),   # redundant with 0
+        Rule("deny", "10.1.0.0/24", "172.16.0.0/24", "udp", 53),
+        Rule("allow", "10.1.0.0/16", "172.16.0.0/16", "any", None),  # generalizes 3
+        Rule("deny", "10.0.0.0/8", "172.16.0.0/24", "any", 443),    # correlated with 0 and 4
+    ]
+    res = analyze_rules(rules)
+    assert res["ok"]
+    assert res["shadowed"] == [{"rule": 1, "earlier": 0, "count": 1}]
+    assert res["redundant"] == [{"rule": 2, "earlier": 0, "count": 1}]
+    assert res["generalized"] == [{"rule": 4, "earlier": 3, "count": 1}]
+    assert res["correlated"] == [{"rule": 5, "earlier": 0, "count": 2}]
+
+def test_verdict_cache():
+    rules = [Rule("deny", "10.0.0.0/24", "10.0.1.0/24", "tcp", 23), Rule("allow", "10.0.0.0/16", "0.0.0.0/0", "any", None)]
+    eng = Engine(cache_size=2)
+    eng.set_rules(rules)
+    pkts = [Packet("10.0.0.1", "10.0.1.1", "tcp", 23), Packet("10.0.5.1", "10.0.1.1", "udp", 53),
+            Packet("10.0.0.1", "10.0.1.1", "tcp", 23), Packet("10.0.9.1", "10.0.1.1", "tcp", 23)]
+    assert [eng.evaluate(p) for p in pkts] == [("deny", 0), ("allow", 1), ("deny", 0), ("allow", 1)]
+    st = eng.cache_stats
+    assert (st["hits"], st["misses"], st["size"], st["capacity"]) == (1, 3, 2, 2)
+    verdicts, matched = eng.evaluate_many(*zip(*((p.src, p.dst, p.proto, p.port) for p in pkts)))
+    assert [int(m) for m in matched] == [0, 1, 0, 1]
+    eng.set_rules(rules[1:])  # new policy: stale verdicts must not survive
+    assert eng.cache_stats["size"] == 0
+    assert eng.evaluate(pkts[0]) == ("allow", 0)
+    assert Engine().cache_stats["capacity"] == 0
+
+def test_evaluate_many_keeps_batch_path_with_cache():
+    import random
+    from netops.core import firewall
+    rnd = random.Random(3)
+    rules = [Rule(rnd.choice(("allow", "deny")), f"10.{rnd.randrange(4)}.0.0/16", f"172.16.{rnd.randrange(8)}.0/24",
+                  rnd.choice(("tcp", "udp", "any")), rnd.choice((None, 22, 80))) for _ in range(200)]
+    rules.append(Rule("allow", "2001:db8::/32", "::/0", "any", None))
+    src = [f"10.{rnd.randrange(4)}.{rnd.randrange(256)}.1" for _ in range(5000)] + ["2001:db8::1"] * 3
+    dst = [f"172.16.{rnd.randrange(8)}.9" for _ in range(5000)] + ["2001:db8::2"] * 3
+    proto = [rnd.choice(("tcp", "udp")) for _ in range(5000)] + ["udp"] * 3
+    port = [rnd.choice((22, 80, 443)) for _ in range(5000)] + [53] * 3
+    plain, cached = Engine(), Engine(cache_size=65536)
+    plain.set_rules(rules)
+    cached.set_rules(rules)
+    assert [int(m) for m in cached.evaluate_many(src, dst, proto, port)[1]] == \
+        [int(m) for m in plain.evaluate_many(src, dst, proto, port)[1]]
+    if firewall.HAVE_NUMPY:
+        # IPv4 rows take the vectorised path; only the IPv6 rows go through the cache
+        st = cached.cache_stats
+        assert (st["hits"], st["misses"]) == (2, 1)
+
+def test_port_ranges_and_protocol_sets():
+    rules = [
+        Rule("deny", "0.0.0.0/0", "10.0.1.0/24", "tcp,udp", (6000, 6100)),
+        Rule("allow", "10.0.0.0/16", "10.0.1.0/24", ["tcp", "sctp"], None, sport=(1024, 65535)),
+        Rule("allow", "0.0.0.0/0", "0.0.0.0/0", "udp", 53, sport=53),
+    ]
+    packets = [("10.0.0.1", "10.0.1.1", "udp", 6050, 5000), ("10.0.0.1", "10.0.1.1", "tcp", 22, 40000),
+               ("10.0.0.1", "10.0.1.1", "tcp", 22, 80), ("10.0.0.1", "10.0.1.1", "sctp", 6050, 2000),
+               ("10.9.0.1", "10.0.1.1", "udp", 53, 53), ("10.9.0.1", "10.0.1.1", "udp", 53, None),
+               ("10.0.0.1", "10.0.1.1", "icmp", None, None)]
+    expected = [("deny", 0), ("allow", 1), ("deny", None), ("allow", 1), ("allow", 2), ("deny", None), ("deny", None)]
+    for classifier in ("linear", "tree"):
+        eng = Engine(classifier=classifier)
+        eng.set_rules(rules)
+        assert [eng.evaluate(Packet(*p)) for p in packets] == expected
+    eng = Engine()
+    eng.set_rules(rules)
+    _, matched = eng.evaluate_many(*zip(*packets))
+    assert [int(m) for m in matched] == [0, 1, -1, 1, 2, -1, -1]
+    with pytest.raises(ValueError):
+        eng.set_rules([Rule("allow", "0.0.0.0/0", "0.0.0.0/0", "tcp", (80, 70))])
+
+def test_stateful_conntrack():
+    eng = Engine(conntrack_size=2)
+    eng.set_rules([Rule("allow", "10.0.0.0/24", "0.0.0.0/0", "tcp", 443)])
+    out = Packet("10.0.0.5", "192.0.2.1", "tcp", 443, 40000)
+    reply = Packet("192.0.2.1", "10.0.0.5", "tcp", 40000, 443)
+    assert eng.evaluate(reply, now=0.0) == ("deny", None)   # no flow yet
+    assert eng.evaluate(out, now=1.0) == ("allow", 0)
+    assert eng.evaluate(reply, now=2.0) == ("allow", 0)     # established reply skips the rules
+    assert eng.evaluate(reply, now=2.0 + 3601) == ("deny", None)  # idle past the tcp timeout
+    for i in range(3):
+        eng.evaluate(Packet("10.0.0.5", "192.0.2.1", "tcp", 443, 50000 + i), now=5000.0)
+    st = eng.conntrack_stats
+    assert (st["size"], st["max_size"], st["hits"], st["expired"], st["evictions"]) == (2, 2, 1, 1, 1)
+    assert st["lookup_ns_avg"] > 0
+    eng.set_rules(eng.rules)
+    assert eng.conntrack_stats["size"] == 0
+    eng.set_conntrack(0)
+    assert eng.evaluate(reply) == ("deny", None) and eng.conntrack_stats["max_size"] == 0
+
+def test_stateful_flows_keep_their_protocol():
+    # an "any" rule gives every protocol the same rule-set bit; flows must still be told apart
+    eng = Engine(conntrack_size=16)
+    eng.set_rules([Rule("allow", "10.0.0.0/24", "0.0.0.0/0", "any", 53)])
+    assert eng.evaluate(Packet("10.0.0.5", "192.0.2.1", "tcp", 53, 40000), now=0.0) == ("allow", 0)
+    for proto in ("udp", "gre", "tcp"):
+        reply = Packet("192.0.2.1", "10.0.0.5", proto, 40000, 53)
+        assert eng.evaluate(reply, now=700.0) == (("allow", 0) if proto == "tcp" else ("deny", None))
+    # tcp flows under the "any" rule get the tcp timeout, not the 600 s "other" one
+    assert eng.conntrack_stats["hits"] == 1
+    eng.set_rules(eng.rules)  # batches run on the real clock
+    eng.evaluate(Packet("10.0.0.5", "192.0.2.1", "tcp", 53, 40000))
+    verdicts, _ = eng.evaluate_many(["192.0.2.1", "192.0.2.1"], ["10.0.0.5", "10.0.0.5"], ["udp", "tcp"],
+                                    [40000, 40000], [53, 53])
+    assert [str(v) for v in verdicts] == ["deny", "allow"]
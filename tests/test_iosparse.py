@@ -0,0 +1,103 @@
+from netops.core.firewall import Engine, Packet, analyze_rules
+from netops.core.iosparse import parse_acls
+from netops.core.prefixtrie import PrefixTrie
+
+CONFIG = """!
+object-group network WEB
+ host 192.0.2.10
+ 192.0.2.64 255.255.255.192
+ range 192.0.2.200 192.0.2.203
+object-group service WEBPORTS
+ tcp eq www 443
+ udp range 8000 8010
+access-list 10 remark management
+access-list 10 permit 10.1.1.0 0.0.0.255
+access-list 10 deny 10.1.2.3
+access-list 101 permit tcp 10.0.0.0 0.255.255.255 host 192.0.2.1 eq 22 telnet
+access-list 101 deny tcp 10.0.0.0 0.0.255.0 any neq 80 log
+access-list 101 permit udp any gt 1023 any lt 1024
+access-list 101 permit udp any any eq bogus
+ip access-list extended EDGE
+ remark inbound web
+ 10 permit object-group WEBPORTS any object-group WEB
+ 20 deny ip any any log
+interface Gi0/0
+ ip access-group EDGE in
+ipv6 access-list V6
+ permit tcp 2001:db8::/32 host 2001:db8::1 eq 443 sequence 10
+"""
+
+def test_parse_acls():
+    res = parse_acls(CONFIG.splitlines())
+    assert res["ok"] and res["types"] == {"10": "standard", "101": "extended", "EDGE": "extended", "V6": "ipv6"}
+    assert res["invalid"] == 1 and res["invalid_examples"][0]["line"] == 15
+    std = res["acls"]["10"]
+    assert [(r.action, r.src, r.dst) for r in std] == [("allow", "10.1.1.0/24", "0.0.0.0/0"), ("deny", "10.1.2.3/32", "0.0.0.0/0")]
+    ext = res["acls"]["101"]
+    assert [(r.src, r.proto, r.port, r.sport) for r in ext] == [
+        ("10.0.0.0/8", "tcp", 22, None), ("10.0.0.0/8", "tcp", 23, None),
+        ("10.0.0.0 0.0.255.0", "tcp", (0, 79), None), ("10.0.0.0 0.0.255.0", "tcp", (81, 65535), None),
+        ("0.0.0.0/0", "udp", (0, 1023), (1024, 65535))]
+    edge = res["acls"]["EDGE"]
+    assert len(edge) == 3 * 3 + 1 and edge[-1].proto == "any"
+    assert {r.dst for r in edge[:-1]} == {"192.0.2.10/32", "192.0.2.64/26", "192.0.2.200/30"}
+    assert res["acls"]["V6"][0].src == "2001:db8::/32"
+
+def test_parsed_acl_in_engine():
+    res = parse_acls(CONFIG.splitlines())
+    eng = Engine()
+    eng.set_rules(res["acls"]["101"])
+    assert eng.evaluate(Packet("10.9.1.5", "192.0.2.1", "tcp", 23)) == ("allow", 1)
+    assert eng.evaluate(Packet("10.0.5.0", "8.8.8.8", "tcp", 81)) == ("deny", 3)   # non-contiguous wildcard
+    assert eng.evaluate(Packet("10.0.5.1", "8.8.8.8", "tcp", 81)) == ("deny", None)
+    tree = Engine(classifier="tree")
+    tree.set_rules(res["acls"]["EDGE"])
+    assert tree.evaluate(Packet("198.51.100.1", "192.0.2.66", "udp", 8005))[0] == "allow"
+    assert tree.evaluate(Packet("198.51.100.1", "192.0.2.66", "udp", 53)) == ("deny", 9)
+    assert analyze_rules(res["acls"]["101"])["correlated"] == [{"rule": 2, "earlier": 0, "count": 2}]
+
+def test_established_rejected():
+    res = parse_acls(["access-list 120 permit tcp any any established",
+                      "access-list 120 permit tcp any host 192.0.2.1 eq 22 log",
+                      "access-list 120 deny tcp any any match-any +syn +rst"])
+    assert [r.port for r in res["acls"]["120"]] == [22]
+    assert res["invalid"] == 2 and "established" in res["invalid_examples"][0]["error"]
+
+def _rejects(entry):
+    res = parse_acls(["access-list 130 permit ip any host 192.0.2.1", entry])
+    assert len(res["acls"]["130"]) == 1 and res["invalid"] == 1, entry
+
+def test_icmp_type_rejected():
+    _rejects("access-list 130 permit icmp any any echo-reply")
+    _rejects("access-list 130 permit icmp any any unreachable")
+
+def test_icmp_type_code_rejected():
+    _rejects("access-list 130 permit icmp any any 8 0")
+
+def test_qos_qualifiers_rejected():
+    for q in ("dscp ef", "precedence critical", "tos max-throughput"):
+        _rejects(f"access-list 130 permit ip any any {q}")
+
+def test_ttl_rejected():
+    _rejects("access-list 130 permit ip any any ttl eq 1")
+
+def test_time_range_rejected():
+    _rejects("access-list 130 permit tcp any any eq 22 time-range OFFICE")
+
+def test_service_group_qualifier_rejected():
+    res = parse_acls(["object-group service PING", " icmp echo", " tcp eq 22"])
+    assert res["invalid"] == 1
+
+def test_log_and_sequence_accepted():
+    res = parse_acls(["access-list 130 permit ip any any log-input",
+                      "ipv6 access-list V6",
+                      " permit tcp any any eq 22 log sequence 20"])
+    assert res["invalid"] == 0 and len(res["acls"]["V6"]) == 1
+
+def test_prefix_trie_from_parsed_acls():
+    res = parse_acls(CONFIG.splitlines())
+    trie = PrefixTrie.from_rules(res["acls"]["101"], field="src")
+    # the non-contiguous 10.0.0.0 0.0.255.0 is indexed under its leading prefix, 10.0.0.0/16
+    assert trie.get("10.0.0.0/8") == [0, 1] and trie.get("10.0.0.0/16") == [2, 3]
+    assert trie.lookup("10.0.7.0") == ("10.0.0.0/16", [2, 3])
+    assert PrefixTrie.from_rules(res["acls"]["EDGE"]).get("192.0.2.64/26") == [2, 3, 7]
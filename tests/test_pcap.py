@@ -0,0 +1,123 @@
+import io
+import struct
+from ipaddress import ip_address
+
+from netops.core.firewall import Engine, Rule, replay_pcap
+from netops.core.pcap import _iter_pcapng, five_tuple, iter_pcap
+
+def eth_ipv4(src, dst, proto, sport=0, dport=0, vlan=False):
+    l4 = struct.pack(">HH", sport, dport) + b"\0" * 16
+    ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(l4), 0, 0, 64, proto, 0,
+                     ip_address(src).packed, ip_address(dst).packed)
+    tag = struct.pack(">HH", 0x8100, 10) if vlan else b""
+    return b"\x02" * 12 + tag + b"\x08\x00" + ip + l4
+
+def eth_ipv6(src, dst, sport, dport):
+    # hop-by-hop options header in front of UDP
+    ext = bytes([17, 0]) + b"\0" * 6
+    ip = struct.pack(">IHBB", 6 << 28, 8 + 8, 0, 64) + ip_address(src).packed + ip_address(dst).packed
+    return b"\x02" * 12 + b"\x86\xdd" + ip + ext + struct.pack(">HH", sport, dport) + b"\0" * 4
+
+FRAMES = [
+    eth_ipv4("10.0.0.1", "10.0.1.20", 6, 40000, 22),
+    eth_ipv4("10.0.0.1", "10.0.1.20", 6, 40001, 23, vlan=True),
+    eth_ipv4("10.0.0.1", "10.0.1.20", 17, 5353, 53),
+    eth_ipv4("192.168.0.1", "10.0.1.20", 1),
+    eth_ipv6("2001:db8::1", "2001:db8::2", 1234, 443),
+    b"\x02" * 12 + b"\x08\x06" + b"\0" * 28,  # ARP
+]
+
+def write_pcap(path, frames, order="<"):
+    with open(path, "wb") as f:
+        f.write(struct.pack(order + "IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for i, fr in enumerate(frames):
+            f.write(struct.pack(order + "IIII", 1700000000 + i, 0, len(fr), len(fr)) + fr)
+
+def write_pcapng(path, frames):
+    def block(btype, body):
+        body += b"\0" * (-len(body) % 4)
+        return struct.pack("<II", btype, len(body) + 12) + body + struct.pack("<I", len(body) + 12)
+    with open(path, "wb") as f:
+        f.write(block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1)))
+        # if_tsresol = 10^-9
+        f.write(block(1, struct.pack("<HHI", 1, 0, 0) + struct.pack("<HHB3x", 9, 1, 9) + b"\0" * 4))
+        for fr in frames:
+            f.write(block(6, struct.pack("<IIIII", 0, 0, 1_000_000_000, len(fr), len(fr)) + fr))
+
+def test_five_tuple():
+    assert five_tuple(1, FRAMES[0]) == (4, int(ip_address("10.0.0.1")), int(ip_address("10.0.1.20")), 6, 40000, 22)
+    assert five_tuple(1, FRAMES[1])[3:] == (6, 40001, 23)
+    assert five_tuple(1, FRAMES[3])[3:] == (1, None, None)
+    assert five_tuple(1, FRAMES[4]) == (6, int(ip_address("2001:db8::1")), int(ip_address("2001:db8::2")), 17, 1234, 443)
+    assert five_tuple(1, FRAMES[5]) is None
+    assert five_tuple(1, FRAMES[0][:20]) is None
+    assert five_tuple(101, FRAMES[0][14:])[3:] == (6, 40000, 22)
+
+def test_iter_pcap_formats(tmp_path):
+    for name, writer in (("le.pcap", write_pcap), ("be.pcap", lambda p, f: write_pcap(p, f, ">")),
+                         ("x.pcapng", write_pcapng)):
+        path = tmp_path / name
+        writer(path, FRAMES)
+        recs = list(iter_pcap(str(path)))
+        assert [r[3] for r in recs] == FRAMES
+        assert all(r[2] == 1 for r in recs)
+    assert recs[0][0] == 1.0
+
+def test_replay_counts(tmp_path):
+    path = tmp_path / "cap.pcap"
+    write_pcap(path, FRAMES * 3)
+    eng = Engine()
+    eng.set_rules([
+        Rule("deny", "10.0.0.0/24", "10.0.1.0/24", "tcp", 23),
+        Rule("allow", "10.0.0.0/16", "10.0.1.0/24", "tcp", None),
+        Rule("allow", "2001:db8::/32", "2001:db8::/32", "udp", 443),
+        Rule("allow", "0.0.0.0/0", "10.0.1.20/32", "udp", 53),
+    ])
+    res = replay_pcap(eng, str(path), batch=4)
+    assert res["ok"] and res["packets"] == 18 and res["skipped"] == 3
+    assert res["hits"] == [3, 3, 3, 3]
+    assert res["hit_bytes"][0] == 3 * len(FRAMES[1])
+    assert res["implicit_deny"] == 3 and res["implicit_deny_bytes"] == 3 * len(FRAMES[3])
+    assert res["allowed"] == 9 and res["denied"] == 6
+    assert res["bytes"] == 3 * sum(map(len, FRAMES))
+
+def test_replay_malformed_pcapng(tmp_path):
+    path = tmp_path / "bad.pcapng"
+    write_pcapng(path, FRAMES[:2])
+    with open(path, "ab") as f:
+        # an enhanced packet block too short for its fixed fields
+        f.write(struct.pack("<II", 6, 20) + b"\0" * 8 + struct.pack("<I", 20))
+    eng = Engine()
+    eng.set_rules([Rule("allow", "0.0.0.0/0", "0.0.0.0/0", "any", None)])
+    res = replay_pcap(eng, str(path))
+    assert not res["ok"] and res["error"] and not res["cancelled"]
+    assert res["packets"] == 2 and res["hits"] == [2]
+
+def test_pcapng_corrupt_block_length(tmp_path):
+    path = tmp_path / "corrupt.pcapng"
+    write_pcapng(path, FRAMES[:2])
+    data = path.read_bytes()
+    reads = []
+    class Tracked(io.BytesIO):
+        def read(self, n=-1):
+            reads.append(n)
+            return super().read(n)
+    for blen in (4, 8, 22):
+        # a bad length must stop the stream without a negative (read-everything) read
+        reads.clear()
+        f = Tracked(data + struct.pack("<II", 6, blen) + b"\0" * 64 + data[-200:])
+        assert len(list(_iter_pcapng(f, None))) == 2
+        assert min(reads) >= 0, blen
+    path.write_bytes(data + struct.pack("<II", 6, 4) + b"\0" * 64)
+    assert len(list(iter_pcap(str(path)))) == 2
+
+def test_replay_stateful(tmp_path):
+    path = tmp_path / "flows.pcap"
+    request = eth_ipv4("10.0.0.1", "192.0.2.9", 6, 40000, 443)
+    reply = eth_ipv4("192.0.2.9", "10.0.0.1", 6, 443, 40000)
+    write_pcap(path, [reply, request, reply, reply])
+    eng = Engine(conntrack_size=16)
+    eng.set_rules([Rule("allow", "10.0.0.0/24", "0.0.0.0/0", "tcp", 443)])
+    res = replay_pcap(eng, str(path))
+    assert res["hits"] == [3] and res["implicit_deny"] == 1
+    assert res["conntrack"]["hits"] == 2 and res["conntrack"]["size"] == 1
@@ -0,0 +1,27 @@
+from netops.core.firewall import Rule
+from netops.core.prefixtrie import HAVE_NUMPY, PrefixTrie
+from netops.core.vlsm import allocate_vlsm
+
+def test_lookup_covering_covered():
+    t = PrefixTrie.from_prefixes(["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "10.2.0.0/16", "2001:db8::/32",
+                                  "2001:db8:1::/48"])
+    assert t.lookup("10.1.2.3") == ("10.1.2.0/24", "10.1.2.0/24")
+    assert t.lookup("10.3.0.1")[0] == "10.0.0.0/8"
+    assert t.lookup("11.0.0.1") is None
+    assert t.lookup("2001:db8:1::5")[0] == "2001:db8:1::/48"
+    assert [c for c, _ in t.covering("10.1.2.0/25")] == ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24"]
+    assert [c for c, _ in t.covered("10.0.0.0/14")] == ["10.1.0.0/16", "10.1.2.0/24", "10.2.0.0/16"]
+    assert t.covered("10.1.3.0/24") == []
+    assert "10.1.0.0/16" in t and "10.1.0.0/17" not in t and len(t) == 6
+
+def test_bulk_loaders_and_batch():
+    plan = allocate_vlsm("10.0.0.0/24", [{"name": "a", "hosts": 100}, {"name": "b", "hosts": 20}])
+    t = PrefixTrie.from_plan(plan)
+    assert t.lookup_many(["10.0.0.5", "10.0.0.200", "2001:db8::1"]) == [("10.0.0.0/25", "a"), None, None]
+    rules = [Rule("allow", "0.0.0.0/0", "10.0.0.0/24", "tcp", 22), Rule("deny", "0.0.0.0/0", "10.0.0.0/24", "any", None)]
+    assert PrefixTrie.from_rules(rules).get("10.0.0.0/24") == [0, 1]
+    idx = t.lookup_indices([0x0A000001, 0x0A000081, 0x0A0000FF])
+    assert [t.entries[i][1] if i >= 0 else None for i in idx] == ["a", "b", None]
+    if HAVE_NUMPY:
+        import numpy as np
+        assert t.lookup_indices(np.array([0x0A000001, 0x0A000081, 0x0A0000FF])).tolist() == idx
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from netops.utils.ratelimit import RateLimiter, TokenBucket
+
+def test_token_bucket_schedule():
+    b = TokenBucket(10, burst=2, now=0.0)
+    assert [b.reserve(1, 0.0) for _ in range(4)] == [0.0, 0.0, pytest.approx(0.1), pytest.approx(0.2)]
+    assert b.reserve(1, 1.0) == 0.0  # refilled, capped at burst
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+def test_global_and_subnet_budgets():
+    lim = RateLimiter(rate=100, subnet_rate=10, burst=1)
+    t = time.monotonic() + 10
+    assert lim.reserve("10.0.0.1", now=t) == (0.0, True)
+    delay, done = lim.reserve("10.0.0.2", now=t)  # same /24: held back by the subnet budget
+    assert delay == pytest.approx(0.1) and not done
+    assert lim.reserve("10.0.1.1", now=t)[0] == pytest.approx(0.01)  # other /24: only the global debt
+    assert lim.reserve("gw.example", now=t)[0] == pytest.approx(0.02)
+    assert lim.reserve_global(now=t + 0.1, waited=0.1) == 0.0  # global tokens only taken now
+    s = lim.stats
+    assert s["sent"] == 4 and s["subnets"] == 2 and s["wait_max_ms"] == pytest.approx(100)
+    assert RateLimiter().reserve("10.0.0.1") == (0.0, True)
+
+def test_throttled_subnet_keeps_global_spacing():
+    import heapq
+    lim = RateLimiter(rate=100, subnet_rate=10, burst=1)
+    t = time.monotonic() + 10
+    sends, waiting = [], []
+    for i in range(40):
+        # every other probe goes to one slow /24, the rest to fresh subnets
+        target = f"10.0.0.{i}" if i % 2 else f"10.{i}.1.1"
+        delay, done = lim.reserve(target, now=t)
+        if done:
+            sends.append(t + delay)
+        else:
+            heapq.heappush(waiting, (t + delay, delay))
+    while waiting:  # held-back probes come back in time order, as their sleeps end
+        at, waited = heapq.heappop(waiting)
+        sends.append(at + lim.reserve_global(now=at, waited=waited))
+    sends.sort()
+    assert len(sends) == 40 and lim.stats["sent"] == 40
+    assert min(b - a for a, b in zip(sends, sends[1:])) >= 0.01 - 1e-9
+    # the other subnets were not held up by the slow one
+    assert sum(s < t + 0.2 for s in sends) >= 19
+
+def test_threads_and_asyncio_share_budget():
+    lim = RateLimiter(rate=400, burst=1)
+    threads = [threading.Thread(target=lambda: [lim.acquire() for _ in range(20)]) for _ in range(3)]
+
+    async def probes():
+        for _ in range(20):
+            await lim.acquire_async("127.0.0.1")
+
+    t0 = time.perf_counter()
+    for th in threads:
+        th.start()
+    asyncio.run(probes())
+    for th in threads:
+        th.join()
+    assert time.perf_counter() - t0 >= 79 / 400 * 0.9
+    assert lim.stats["sent"] == 80 and lim.stats["pps"] == pytest.approx(400, rel=0.05)
@@ -0,0 +1,262 @@
+import socket
+
+import pytest
+
+from netops.core.scanner import icmp, tcp
+
+def test_echo_request_checksum():
+    assert icmp.checksum(bytes.fromhex("45000073000040004011b861c0a80001c0a800c7")) == 0
+    pkt = icmp.echo_request(4, 0x1234, 7, b"netops!")
+    assert pkt[0] == 8 and pkt[4:8] == bytes.fromhex("12340007")
+    assert icmp.checksum(pkt) == 0
+
+@pytest.mark.skipif(not icmp.native_available(), reason="ICMP sockets not permitted")
+def test_native_ping_loopback():
+    res = icmp.ping_sweep(["127.0.0.0/29", "localhost"], timeout=1.0, native=True)
+    assert [r["host"] for r in res[1:]] == [f"127.0.0.{i}" for i in range(1, 7)]
+    assert all(r["up"] and r["rtt_ms"] >= 0 for r in res)
+    stream = icmp.iter_ping_sweep(["127.0.0.0/8"], ordered=True, max_in_flight=64, native=True)
+    assert [next(stream)["host"] for _ in range(100)] == icmp.expand_targets(["127.0.0.0/25"])[:100]
+    stream.close()
+
+def test_subprocess_fallback(monkeypatch):
+    def denied(version=4):
+        raise PermissionError("operation not permitted")
+    monkeypatch.setattr(icmp, "open_icmp_socket", denied)
+    monkeypatch.setattr(icmp, "_ping_once", lambda host, timeout: {"host": host, "up": host.endswith("2"), "rtt_ms": None})
+    res = icmp.ping_sweep(["10.0.0.0/30"])
+    assert [(r["host"], r["up"]) for r in res] == [("10.0.0.1", False), ("10.0.0.2", True)]
+    with pytest.raises(PermissionError):
+        icmp.ping_sweep(["10.0.0.1"], native=True)
+
+def test_lazy_targets():
+    import ipaddress
+    for cidr in ("10.0.0.0/29", "10.0.0.0/31", "10.0.0.7/32", "2001:db8::/125", "2001:db8::/127"):
+        hosts = [str(h) for h in ipaddress.ip_network(cidr).hosts()]
+        assert list(icmp.iter_targets([cidr, " ", "gw.example"])) == hosts + ["gw.example"]
+        assert icmp.count_targets([cidr, "gw.example"]) == len(hosts) + 1
+    big = icmp.iter_targets(["10.0.0.0/8"])
+    assert next(big) == "10.0.0.1" and icmp.count_targets(["10.0.0.0/8"]) == 2 ** 24 - 2
+
+def test_streaming_order(monkeypatch):
+    import time
+    def slow_low(host, timeout):
+        last = int(host.rsplit(".", 1)[1])
+        time.sleep(0.05 if last < 3 else 0)
+        return {"host": host, "up": True, "rtt_ms": None}
+    monkeypatch.setattr(icmp, "_ping_once", slow_low)
+    hosts = [f"10.0.0.{i}" for i in range(1, 11)]
+    res = [r["host"] for r in icmp.iter_ping_sweep(["10.0.0.0/28"], native=False, max_in_flight=4, max_workers=4)]
+    assert sorted(res) == sorted(icmp.expand_targets(["10.0.0.0/28"])) and res[:2] != hosts[:2]
+    res = [r["host"] for r in icmp.iter_ping_sweep(["10.0.0.0/28"], native=False, ordered=True, max_in_flight=4)]
+    assert res == icmp.expand_targets(["10.0.0.0/28"])
+
+def test_parse_ports():
+    assert tcp.parse_ports("22,80-82, 443") == [22, 80, 81, 82, 443]
+    assert tcp.parse_ports("-3,65534-,ssh,T:8080,U:53,161") == [1, 2, 3, 22, 8080, 65534, 65535]
+    assert len(tcp.parse_ports("-")) == 65535
+    assert tcp.parse_ports(None, top_ports=3) == [23, 80, 443]
+    for bad in ("70000", "90-80", "nosuchservice", "U:53"):
+        with pytest.raises(ValueError):
+            tcp.parse_ports(bad)
+
+def test_adaptive_timeout():
+    h = tcp._Host("10.0.0.1", (socket.AF_INET, "10.0.0.1"), 1)
+    assert h.timeout(0.1, 1.0) == 1.0
+    for _ in range(20):
+        h.sample(0.01)
+    assert h.timeout(0.1, 1.0) == 0.1
+    h.sample(0.5)
+    assert 0.1 < h.timeout(0.1, 1.0) <= 1.0
+
+def test_tcp_connect_scan():
+    listeners = []
+    for _ in range(3):
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        s.listen()
+        listeners.append(s)
+    open_ports = sorted(s.getsockname()[1] for s in listeners)
+    # a listener whose accept queue is full drops SYNs, which looks like a filtered port
+    full = socket.socket()
+    full.bind(("127.0.0.1", 0))
+    full.listen(0)
+    fillers = [socket.socket() for _ in range(3)]
+    for c in fillers:
+        c.setblocking(False)
+        c.connect_ex(full.getsockname())
+    ports = ",".join(map(str, open_ports + [full.getsockname()[1]])) + ",1-200"
+    seen = []
+    try:
+        res = tcp.tcp_scan(["127.0.0.1", "127.0.0.2", "localhost"], ports=ports, timeout=0.3, on_host=seen.append)
+    finally:
+        for s in listeners + fillers + [full]:
+            s.close()
+    assert res["ok"], res["error"]
+    by_name = {(h["ip"], h["hostname"]): h for h in res["hosts"]}
+    host = by_name[("127.0.0.1", None)]
+    assert set(host) == {"ip", "mac", "hostname", "status", "os", "services"} and host["status"] == "up"
+    assert [s["port"] for s in host["services"]] == open_ports  # ephemeral ports, never inside 1-200
+    assert all(s["state"] == "open" and s["proto"] == "tcp" for s in host["services"])
+    assert by_name[("127.0.0.2", None)]["services"] == []
+    assert any(name == "localhost" for _, name in by_name) and len(seen) == 3
+    assert res["stats"]["filtered"] >= 1 and res["stats"]["open"] >= 3
+    assert not tcp.tcp_scan(["127.0.0.1"], ports="bogus")["ok"]
+
+def test_shard_chunks():
+    from netops.core.scanner.shard import _chunks
+    base = int(__import__("ipaddress").ip_address("10.0.0.0"))
+    assert list(_chunks(["10.0.0.0/29", "a", " ", "b", "10.0.1.0/31", "c"], 4)) == [
+        (0, 4, base + 1, 3), (1, 4, base + 4, 3), (2, 0, ["a", "b"], 2), (3, 4, base + 256, 2), (4, 0, ["c"], 1)]
+
+def test_shard_rates():
+    from netops.core.scanner.shard import ShardedSweep, _chunks
+    sweep = ShardedSweep(["10.0.0.0/16"], workers=4, rate=1000, subnet_rate=50)
+    assert sweep._args[5:7] == (250, 50)  # the global budget is shared, each subnet keeps its own
+    # a /18 is four chunks: only four shards get work, so they split the budget four ways
+    assert ShardedSweep(["10.0.0.0/18"], workers=8, rate=1000)._args[5] == 250
+    # aligned chunks: every /24 falls inside exactly one chunk
+    seen = set()
+    for _, _, first, count in _chunks(["10.0.0.0/15"], 4096):
+        subnets = set(range(first >> 8, ((first + count - 1) >> 8) + 1))
+        assert not subnets & seen
+        seen |= subnets
+    assert len(seen) == 512
+
+def test_sharded_sweep_merges_in_order():
+    from netops.core.scanner.shard import ShardedSweep
+    targets = ["127.0.0.0/27", "localhost", "127.0.1.0/30"]
+    # without ICMP sockets the shards use the ping subprocess; the merge is the same either way
+    sweep = ShardedSweep(targets, workers=2, chunk_size=8, timeout=0.5, native=None if icmp.native_available() else False)
+    res = list(sweep)
+    assert [r["host"] for r in res] == icmp.expand_targets(targets)
+    stats = sweep.shard_stats
+    assert sum(s["hosts"] for s in stats) == len(res) and sum(s["chunks"] for s in stats) == 6
+    assert all(s["pid"] for s in stats)
+    if icmp.native_available():
+        assert all(r["up"] for r in res) and sum(s["up"] for s in stats) == len(res)
+
+def test_sweep_indexed_duplicates(monkeypatch):
+    monkeypatch.setattr(icmp, "_ping_once", lambda host, timeout: {"host": host, "up": False, "rtt_ms": None})
+    hosts = ["a", "b", "a", "a"]
+    res = list(icmp._sweep_indexed(iter(hosts), 0.1, 4, False, False, 2, None))
+    assert sorted(i for i, _ in res) == [0, 1, 2, 3] and all(hosts[i] == r["host"] for i, r in res)
+
+def test_throttle_passes_final_call(monkeypatch):
+    from netops.utils import threads
+    clock = [100.0]
+    monkeypatch.setattr(threads.time, "monotonic", lambda: clock[0])
+    calls = []
+    report = threads.throttle(lambda d, t: calls.append(d))
+    for done in range(1, 11):
+        report(done, 10)
+        clock[0] += 0.125
+    assert calls == [1, 3, 5, 7, 9, 10] and threads.throttle(None) is None
+
+def test_ping_sweep_cancel(monkeypatch):
+    import time
+    from netops.utils.threads import CancelToken
+    token, seen = CancelToken(), []
+    def slow(host, timeout):
+        time.sleep(0.05)
+        return {"host": host, "up": False, "rtt_ms": None}
+    monkeypatch.setattr(icmp, "_ping_once", slow)
+    def progress(done, total):
+        seen.append((done, total))
+        if done >= 8:
+            token.cancel()
+    t0 = time.monotonic()
+    res = icmp.ping_sweep(["10.0.0.0/16"], native=False, max_workers=4, progress=progress, cancel=token)
+    assert time.monotonic() - t0 < 2.0 and 8 <= len(res) < 100
+    assert seen[0][1] == 65534 and all(a[0] < b[0] for a, b in zip(seen, seen[1:]))
+
+def test_tcp_scan_cancel():
+    import threading, time
+    from netops.utils.threads import CancelToken
+    full = socket.socket()
+    full.bind(("127.0.0.1", 0))
+    full.listen(0)
+    fillers = [socket.socket() for _ in range(3)]
+    for c in fillers:
+        c.setblocking(False)
+        c.connect_ex(full.getsockname())
+    token, seen = CancelToken(), []
+    threading.Timer(0.3, token.cancel).start()
+    t0 = time.monotonic()
+    try:
+        res = tcp.tcp_scan(["127.0.0.1"], ports=str(full.getsockname()[1]), concurrency=1, timeout=30,
+                           progress=lambda d, t: seen.append((d, t)), cancel=token)
+    finally:
+        for s in fillers + [full]:
+            s.close()
+    assert res["ok"] and res["cancelled"] and time.monotonic() - t0 < 1.5
+    assert all(t == 1 for _, t in seen)
+
+def test_nmap_run_cancel():
+    import sys, threading, time
+    from netops.core.scanner import nmap
+    from netops.utils.threads import CancelToken
+    # percent restarts with every task, and a second host group repeats the first task
+    script = ("import time\n"
+              "for task, p in (('SYN Stealth Scan', 10), ('SYN Stealth Scan', 55.5), ('Service scan', 20),\n"
+              "                ('SYN Stealth Scan', 5), ('Service scan', 90)):\n"
+              "    print(f'<taskprogress task=\"{task}\" time=\"1\" percent=\"{p}\" remaining=\"3\" />', flush=True)\n"
+              "time.sleep(30)\n")
+    token, seen = CancelToken(), []
+    threading.Timer(0.5, token.cancel).start()
+    t0 = time.monotonic()
+    code, out, _, cancelled = nmap._run([sys.executable, "-c", script], 60, lambda d, t: seen.append(d), token, 2)
+    assert cancelled and code != 0 and time.monotonic() - t0 < 5
+    assert seen == pytest.approx([5.0, 27.75, 60.0, 95.0]) and "taskprogress" in out
+
+def test_arp_scan_batches_and_cancel(monkeypatch):
+    import time
+    from types import SimpleNamespace
+    from netops.core.scanner import arp
+    from netops.utils.ratelimit import RateLimiter
+    from netops.utils.threads import CancelToken
+
+    class Layer:
+        def __init__(self, **kw):
+            self.kw = kw
+        def __truediv__(self, other):
+            return other
+
+    class Reply:
+        def __init__(self, ip):
+            self.op, self.psrc, self.hwsrc = 2, ip, "02:00:00:00:00:01"
+        def __getitem__(self, layer):
+            return self
+
+    class Sniffer:
+        def __init__(self, prn, **kw):
+            sniffers.append(self)
+            self.prn, self.running = prn, False
+        def start(self):
+            self.running = True
+        def stop(self):
+            self.running = False
+
+    token, sent, sniffers = CancelToken(), [], []
+    def sendp(pkt):
+        assert sniffers[-1].running
+        sent.append(pkt.kw["pdst"])
+        sniffers[-1].prn(Reply(pkt.kw["pdst"].split("/")[0]))
+        if len(sent) == 2:
+            token.cancel()
+    monkeypatch.setattr(arp, "HAVE_SCAPY", True)
+    for name, value in (("Ether", Layer), ("ARP", Layer), ("sendp", sendp), ("AsyncSniffer", Sniffer),
+                        ("conf", SimpleNamespace())):
+        monkeypatch.setattr(arp, name, value, raising=False)
+    # a limiter without a rate keeps the batched path
+    res = arp.arp_scan("10.0.0.0/18", limiter=RateLimiter(), cancel=token)
+    assert res["ok"] and res["cancelled"] and sent == ["10.0.0.0/20", "10.0.16.0/20"]
+    assert [h["ip"] for h in res["hosts"]] == ["10.0.0.0", "10.0.16.0"] and not sniffers[-1].running
+    sent.clear()
+    calls = []
+    # the reply timeout is waited once after the last batch, not once per batch
+    t0 = time.monotonic()
+    res = arp.arp_scan("10.0.0.0/18", timeout=0.3, progress=lambda d, t: calls.append((d, t)))
+    assert time.monotonic() - t0 < 0.6
+    assert res["ok"] and not res["cancelled"] and len(sent) == 4 and len(res["hosts"]) == 4
+    assert calls[-1] == (16384, 16384)
@@ -1,3 +1,5 @@
+import pytest
+
 from netops.core.subnetting import describe_cidr
 
 def test_basic():
@@ -5,3 +7,46 @@ def test_basic():
     assert info["netmask"] == "255.255.252.0"
     assert info["broadcast"] == "10.0.3.255"
     assert info["usable_hosts"] == 1022
+
+def test_special_prefixes():
+    p2p = describe_cidr("10.0.0.0/31")
+    assert p2p["is_31"] and p2p["usable_hosts"] == 2
+    assert (p2p["first_usable"], p2p["last_usable"]) == ("10.0.0.0", "10.0.0.1")
+    host = describe_cidr("10.0.0.7/32")
+    assert host["is_32"] and host["broadcast"] is None and host["first_usable"] == "10.0.0.7"
+
+def test_large_and_ipv6():
+    info = describe_cidr("10.1.2.3/8")
+    assert info["usable_hosts"] == 2**24 - 2
+    assert info["last_usable"] == "10.255.255.254"
+    v6 = describe_cidr("2001:db8::1/64")
+    assert v6["usable_hosts"] == 2**64 - 1
+    assert v6["first_usable"] == "2001:db8::1"
+    assert v6["last_usable"] == "2001:db8::ffff:ffff:ffff:ffff"
+
+def test_describe_many_matches_describe_cidr():
+    from netops.core.subnetting import describe_many, iter_rows, HAVE_NUMPY
+    cidrs = ["10.0.0.1/22", "bogus", "192.168.1.9/31", "10.0.0.7", "2001:db8::1/64", "1.2.3.4/33"]
+    expected = []
+    for c in cidrs:
+        try:
+            expected.append(describe_cidr(c))
+        except ValueError:
+            expected.append(None)
+    for backend in (["python", "numpy"] if HAVE_NUMPY else ["python"]):
+        res = describe_many(cidrs, backend=backend)
+        assert list(res["error"]) == [e is None for e in expected]
+        assert list(iter_rows(res)) == expected
+
+def test_host_range():
+    from netops.core.subnetting import HostRange
+    hosts = HostRange.from_cidr("10.0.0.0/22")
+    assert len(hosts) == 1022
+    assert hosts[0] == "10.0.0.1" and hosts[-1] == "10.0.3.254"
+    assert list(hosts[254:257]) == ["10.0.0.255", "10.0.1.0", "10.0.1.1"]
+    assert "10.0.2.7" in hosts and "10.0.0.0" not in hosts
+    assert [len(b) for b in hosts.iter_batches(500)] == [500, 500, 22]
+    big = HostRange.from_cidr("2001:db8::/64")
+    assert big.size == 2**64 - 1 and big and big.last == "2001:db8::ffff:ffff:ffff:ffff"
+    with pytest.raises(OverflowError):
+        len(big)  # beyond sys.maxsize; .size is exact
@@ -0,0 +1,30 @@
+from ipaddress import collapse_addresses, ip_network
+
+from netops.core.summariser import summarise, summarise_file, summarise_report
+
+def test_summarise_matches_ipaddress():
+    cidrs = ["10.0.0.0/24", "10.0.1.0/24", "10.0.2.0/25", "10.0.2.128/25", "10.0.3.7/32", "192.168.1.0/30"]
+    assert summarise(cidrs) == [str(n) for n in collapse_addresses(ip_network(c) for c in cidrs)]
+    assert summarise(["2001:db8::/33", "10.0.0.0/25", "2001:db8:8000::/33", "10.0.0.128/25"]) == \
+        ["10.0.0.0/24", "2001:db8::/32"]
+
+def test_report_and_aggregate():
+    rep = summarise_report(["10.0.0.0/24", "10.0.0.0/24", "10.0.0.0/25", "10.0.1.0/24", "bad", "10.0.3.0/24"],
+                           max_prefixes=1)
+    assert rep["summary"] == ["10.0.0.0/23", "10.0.3.0/24"]
+    assert (rep["duplicates"], rep["overlaps"], rep["invalid"]) == (1, 1, 1)
+    assert rep["overlap_examples"] == [{"prefix": "10.0.0.0/25", "covered_by": "10.0.0.0/24"}]
+    assert rep["aggregate"] == {"prefixes": ["10.0.0.0/22"], "extra_addresses": 256, "target_met": True}
+    capped = summarise_report(["10.0.0.0/24", "10.0.2.0/24", "10.0.8.0/24"], max_prefixes=1, max_extra=600)
+    assert capped["aggregate"] == {"prefixes": ["10.0.0.0/22", "10.0.8.0/24"], "extra_addresses": 512,
+                                   "target_met": False}
+
+def test_summarise_file(tmp_path):
+    path = tmp_path / "routes.txt"
+    path.write_text("# dump\n10.0.0.0/25 via 1.1.1.1\n\n10.0.0.128/25\n")
+    assert summarise_file(str(path))["summary"] == ["10.0.0.0/24"]
+    assert not summarise_file(str(tmp_path / "missing.txt"))["ok"]
+
+def test_summarise_network_objects():
+    nets = [ip_network("10.0.0.0/25"), ip_network("10.0.0.128/25"), ip_network("2001:db8::/32")]
+    assert summarise(nets) == ["10.0.0.0/24", "2001:db8::/32"]
@@ -6,3 +6,64 @@ def test_vlsm():
     plan = allocate_vlsm(base, demands)
     assert plan["ok"] is True
     assert len(plan["blocks"]) == 3
+
+def test_vlsm_placement_is_stable():
+    plan = allocate_vlsm("10.20.0.0/20", [{"name": "A", "hosts": 200}, {"name": "B", "hosts": 120}, {"name": "C", "hosts": 60}])
+    assert [b["cidr"] for b in plan["blocks"]] == ["10.20.0.0/24", "10.20.8.0/25", "10.20.12.0/26"]
+    assert plan["blocks"][0]["gateway"] == "10.20.0.1"
+    assert plan["gaps"][:3] == ["10.20.1.0/24", "10.20.2.0/23", "10.20.4.0/22"]
+
+def test_vlsm_no_space():
+    plan = allocate_vlsm("10.0.0.0/24", [{"name": "big", "hosts": 300}])
+    assert plan["ok"] is False and "big" in plan["error"] and plan["gap_ranges"] == []
+    assert allocate_vlsm("10.0.0.0/24", [{"name": "x", "prefix": 40}])["gap_ranges"] == []
+
+def test_buddy_merge():
+    from netops.core.vlsm import BuddyAllocator
+    pool = BuddyAllocator(32)
+    pool.add_free(0, 24)
+    bases = [pool.allocate(30) for _ in range(64)]
+    assert pool.allocate(30) is None
+    for b in reversed(bases):
+        pool.add_free(b, 30)
+    assert pool.free_blocks() == [(0, 24)]
+
+def test_vlsm_ipv6_prefix_demands():
+    demands = [{"name": "core", "prefix": 56}] + [{"name": f"lan{i}", "prefix": 64} for i in range(4)] + [{"name": "mgmt", "hosts": 100}]
+    plan = allocate_vlsm("2001:db8:abcd::/48", demands)
+    assert plan["ok"] is True
+    assert plan["blocks"][0] == {"name": "core", "cidr": "2001:db8:abcd::/56",
+                                 "usable_hosts": 2**72 - 1, "gateway": "2001:db8:abcd::1"}
+    assert [b["cidr"] for b in plan["blocks"] if b["name"] == "mgmt"] == ["2001:db8:abcd:f800::/121"]
+    assert len(plan["gap_ranges"]) == 6
+    full = allocate_vlsm("2001:db8::/56", [{"name": f"n{i}", "prefix": 64} for i in range(256)])
+    assert full["ok"] and len(full["blocks"]) == 256 and full["gaps"] == []
+
+def test_incremental_plan():
+    from netops.core.vlsm import VlsmPlan
+    plan = VlsmPlan.from_demands("10.0.0.0/22", [{"name": "A", "hosts": 200}, {"name": "B", "hosts": 50}])
+    before = {b["name"]: b["cidr"] for b in plan.blocks()}
+    assert plan.allocate("C", hosts=20)["ok"]
+    assert plan.allocate("C", hosts=20)["ok"] is False
+    assert plan.allocate("E") == {"ok": False, "error": "hosts or prefix required", "block": None}
+    assert plan.release("B") and not plan.release("B")
+    assert plan.allocate("D", prefix=24)["ok"]
+    after = {b["name"]: b["cidr"] for b in plan.blocks()}
+    assert after["A"] == before["A"]
+    restored = VlsmPlan.from_json(plan.to_json())
+    assert restored.result() == plan.result()
+    for name in ("A", "C", "D"):
+        restored.release(name)
+    assert restored.result()["gaps"] == ["10.0.0.0/22"]
+
+def test_multi_pool_packing():
+    from netops.core.vlsm_pack import plan_pools
+    pools = ["10.0.0.0/25", "10.0.1.0/24", "192.168.0.0/23"]
+    demands = [{"name": f"n{i}", "hosts": h} for i, h in enumerate([250, 200, 200, 120, 100, 60])]
+    plan = plan_pools(pools, demands, workers=0)
+    assert plan["ok"] is False and plan["searched"] is True
+    assert plan["metrics"]["utilisation"] == 1.0
+    placed = {b["name"] for b in plan["blocks"]}
+    assert placed | set(plan["unplaced"]) == {d["name"] for d in demands}
+    fits = plan_pools(pools, demands[:3], workers=0)
+    assert fits["ok"] and not fits["searched"] and len(fits["blocks"]) == 3